@@ -62,6 +62,11 @@ def create_lambda_layer():
                 print(f"❌ Errore installazione (retry): {result.stderr}")
                 sys.exit(1)
     
+    # Copia i moduli dell'SDK che usano solo la libreria standard
+    for module in ("verticals.py", "deadline.py"):
+        shutil.copy(script_dir.parent / "src" / module, python_dir / module)
+    print("✅ Registro dei vertical e scadenze copiati nel layer")
+    
     # Crea il file ZIP per il layer
     layer_zip = script_dir / "lambda_layer.zip"
     
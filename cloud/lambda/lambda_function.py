@@ -9,6 +9,10 @@ import requests
 import logging
 from typing import Dict, Any, Optional
 
+# Registro dei vertical e scadenze condivisi con l'SDK (copiati nel layer da create_layer.py)
+from deadline import Deadline
+from verticals import get_vertical
+
 # Configurazione logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -16,8 +20,14 @@ logger.setLevel(logging.INFO)
 class MetaCatalogManager:
     """Gestore per l'integrazione con Meta Catalog API."""
     
-    def __init__(self):
-        """Inizializza il gestore con le variabili d'ambiente."""
+    def __init__(self, deadline: Optional[Deadline] = None):
+        """
+        Inizializza il gestore con le variabili d'ambiente.
+        
+        Args:
+            deadline: Tempo rimasto alla Lambda: nessuna chiamata a Meta lo supera
+        """
+        self.deadline = deadline
         self.access_token = os.environ.get('META_ACCESS_TOKEN')
         self.catalog_id = os.environ.get('META_CATALOG_ID')
         self.business_id = os.environ.get('META_BUSINESS_ID')
@@ -32,6 +42,16 @@ class MetaCatalogManager:
         if missing_vars:
             raise ValueError(f"Variabili d'ambiente mancanti: {', '.join(missing_vars)}")
     
+    def _timeout(self, seconds: float) -> float:
+        """Riduce il timeout di una chiamata al tempo rimasto alla Lambda."""
+        return self.deadline.clamp_timeout(seconds) if self.deadline is not None else seconds
+    
+    def _out_of_time(self) -> Optional[Dict[str, Any]]:
+        """Risultato di errore se il tempo della Lambda è esaurito, altrimenti None."""
+        if self.deadline is not None and self.deadline.expired:
+            return {'success': False, 'error': 'Tempo della Lambda esaurito', 'timeout': True}
+        return None
+    
     def detect_catalog_type(self) -> str:
         """Rileva automaticamente il tipo di catalogo."""
         try:
@@ -39,7 +59,7 @@ class MetaCatalogManager:
             headers = {'Authorization': f'Bearer {self.access_token}'}
             params = {'fields': 'name,vertical,id'}
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = requests.get(url, headers=headers, params=params, timeout=self._timeout(10))
             
             if response.status_code == 200:
                 data = response.json()
@@ -63,28 +83,12 @@ class MetaCatalogManager:
                 'Content-Type': 'application/json'
             }
             
-            # Validazione campi obbligatori per home_listings
-            required_fields = ['home_listing_id', 'name', 'description', 'price', 
-                             'currency', 'url', 'address', 'images', 'availability', 'year_built']
-            
-            missing_fields = [field for field in required_fields if field not in listing_data]
-            if missing_fields:
-                return {
-                    'success': False,
-                    'error': f'Campi obbligatori mancanti: {", ".join(missing_fields)}'
-                }
-            
-            # Validazione address
-            address = listing_data.get('address', {})
-            required_address_fields = ['street_address', 'city', 'region', 'country', 
-                                     'postal_code', 'latitude', 'longitude']
-            
-            missing_address_fields = [field for field in required_address_fields 
-                                    if field not in address]
-            if missing_address_fields:
+            # Validazione con lo schema home_listings (stesse regole dell'SDK)
+            is_valid, errors = get_vertical('home_listings').validate(listing_data)
+            if not is_valid:
                 return {
                     'success': False,
-                    'error': f'Campi address obbligatori mancanti: {", ".join(missing_address_fields)}'
+                    'error': '; '.join(errors)
                 }
             
             # Assicurati che il prezzo sia integer
@@ -97,7 +101,10 @@ class MetaCatalogManager:
                         'error': 'Il prezzo deve essere un numero intero'
                     }
             
-            response = requests.post(url, headers=headers, json=listing_data, timeout=30)
+            out_of_time = self._out_of_time()
+            if out_of_time:
+                return out_of_time
+            response = requests.post(url, headers=headers, json=listing_data, timeout=self._timeout(30))
             
             if response.status_code == 200:
                 result = response.json()
@@ -115,6 +122,9 @@ class MetaCatalogManager:
                     'status_code': response.status_code
                 }
                 
+        except requests.Timeout:
+            logger.error("Timeout adding home listing")
+            return {'success': False, 'error': 'Timeout della chiamata a Meta', 'timeout': True}
         except Exception as e:
             logger.error(f"Error adding home listing: {str(e)}")
             return {
@@ -131,15 +141,17 @@ class MetaCatalogManager:
                 'Content-Type': 'application/json'
             }
             
-            # Validazione campi obbligatori per prodotti commerce
-            required_fields = ['retailer_id', 'name', 'description', 'price', 
-                             'currency', 'availability', 'condition', 'image_url', 'url']
+            # Validazione con lo schema commerce (stesse regole dell'SDK)
+            is_valid, errors = get_vertical('commerce').validate(product_data)
             
-            missing_fields = [field for field in required_fields if field not in product_data]
+            # Via API Gateway immagine e link del prodotto sono sempre richiesti
+            missing_fields = [field for field in ('image_url', 'url') if field not in product_data]
             if missing_fields:
+                errors.append(f'Campi obbligatori mancanti: {", ".join(missing_fields)}')
+            if errors:
                 return {
                     'success': False,
-                    'error': f'Campi obbligatori mancanti: {", ".join(missing_fields)}'
+                    'error': '; '.join(errors)
                 }
             
             # Assicurati che il prezzo sia integer
@@ -152,7 +164,10 @@ class MetaCatalogManager:
                         'error': 'Il prezzo deve essere un numero intero'
                     }
             
-            response = requests.post(url, headers=headers, json=product_data, timeout=30)
+            out_of_time = self._out_of_time()
+            if out_of_time:
+                return out_of_time
+            response = requests.post(url, headers=headers, json=product_data, timeout=self._timeout(30))
             
             if response.status_code == 200:
                 result = response.json()
@@ -170,6 +185,9 @@ class MetaCatalogManager:
                     'status_code': response.status_code
                 }
                 
+        except requests.Timeout:
+            logger.error("Timeout adding commerce product")
+            return {'success': False, 'error': 'Timeout della chiamata a Meta', 'timeout': True}
         except Exception as e:
             logger.error(f"Error adding commerce product: {str(e)}")
             return {
@@ -229,7 +247,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         # Inizializza il gestore Meta Catalog
         try:
-            catalog_manager = MetaCatalogManager()
+            catalog_manager = MetaCatalogManager(deadline=Deadline.from_lambda_context(context))
         except ValueError as e:
             return {
                 'statusCode': 500,
@@ -261,8 +279,11 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 })
             }
         
-        # Restituisci il risultato
-        status_code = 200 if result['success'] else 400
+        # Restituisci il risultato (504 se il tempo della Lambda non è bastato)
+        if result['success']:
+            status_code = 200
+        else:
+            status_code = 504 if result.get('timeout') else 400
         
         return {
             'statusCode': status_code,
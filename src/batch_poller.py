@@ -0,0 +1,289 @@
+"""
+Raccolta asincrona degli esiti delle batch ``items_batch``.
+
+``items_batch`` restituisce subito degli handle: l'esito dei singoli item
+(errori di validazione, immagini rifiutate, ...) si ottiene solo
+interrogando ``check_batch_request_status``. ``BatchStatusPoller`` tiene
+traccia di molti handle contemporaneamente e li interroga con intervalli
+adattivi (brevi subito dopo l'invio, poi sempre più lunghi mentre la batch
+è in elaborazione), raggruppando le interrogazioni in richieste batch della
+Graph API: cento handle in attesa costano due chiamate HTTP per ciclo.
+Gli esiti per item vengono raccolti in ``results`` e notificati con
+callback, così chi importa può inviare le batch alla massima velocità e
+registrare gli esiti (es. in un checkpoint) man mano che arrivano.
+
+Example:
+    def save(item_id, outcome):
+        checkpoint[item_id] = outcome
+
+    with BatchStatusPoller(manager, on_item=save) as poller:
+        for chunk in chunks:
+            poller.submit(chunk)
+    # all'uscita tutti gli handle sono conclusi (o scaduti)
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+from .config import logger
+from .exceptions import MetaAPIException
+from .whatsapp_catalog_manager import GRAPH_BATCH_MAX_SIZE, ITEMS_BATCH_MAX_SIZE, WhatsAppCatalogManager
+
+
+# Stati di check_batch_request_status che indicano una batch conclusa
+TERMINAL_STATUSES = frozenset({'finished', 'error', 'failed', 'canceled'})
+
+
+class BatchStatusPoller:
+    """Interroga gli handle delle batch e raccoglie gli esiti per item."""
+
+    def __init__(self, manager: WhatsAppCatalogManager, initial_interval: float = 2.0,
+                 max_interval: float = 60.0, backoff: float = 1.5, timeout_seconds: float = 3600.0,
+                 on_item: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 on_handle: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        Args:
+            manager: Manager usato per inviare le batch e interrogarne lo stato
+            initial_interval: Attesa prima della prima interrogazione di un handle
+            max_interval: Attesa massima tra due interrogazioni dello stesso handle
+            backoff: Fattore di crescita dell'intervallo mentre la batch è in elaborazione
+            timeout_seconds: Tempo dopo il quale un handle non concluso viene abbandonato
+            on_item: Callback(item_id, esito) chiamata per ogni item concluso
+            on_handle: Callback(handle, stato) chiamata quando un handle si conclude
+        """
+        self.manager = manager
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout_seconds = timeout_seconds
+        self.on_item = on_item
+        self.on_handle = on_handle
+
+        # Esito per item_id: {'success', 'handle', 'errors'?, 'warnings'?}
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+        # handle -> {'item_ids', 'submitted_at', 'next_poll', 'interval'}
+        self._handles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.status_queries = 0
+        self.http_calls = 0
+
+    def track(self, handle: str, item_ids: Optional[List[str]] = None) -> None:
+        """
+        Aggiunge un handle da interrogare.
+
+        Args:
+            handle: Handle restituito da items_batch
+            item_ids: ID degli item inviati con l'handle (per marcare come riusciti
+                quelli senza errori); se omesso vengono riportati solo gli errori
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._handles[handle] = {
+                'item_ids': list(item_ids) if item_ids is not None else None,
+                'submitted_at': now,
+                'next_poll': now + self.initial_interval,
+                'interval': self.initial_interval,
+            }
+        self._wakeup.set()
+
+    def submit(self, item_requests: List[Dict[str, Any]], item_type: str = 'PRODUCT_ITEM',
+               chunk_size: int = ITEMS_BATCH_MAX_SIZE) -> List[str]:
+        """
+        Invia operazioni con items_batch e ne traccia gli handle senza attenderne l'esito.
+
+        Args:
+            item_requests: Operazioni nel formato items_batch
+            item_type: Tipo di item
+            chunk_size: Operazioni per chiamata (max 5000)
+
+        Returns:
+            list: Handle tracciati
+        """
+        chunk_size = min(chunk_size, ITEMS_BATCH_MAX_SIZE)
+        responses = self.manager.submit_items_batch(item_requests, item_type=item_type, chunk_size=chunk_size)
+        tracked = []
+        for index, response in enumerate(responses):
+            chunk = item_requests[index * chunk_size:(index + 1) * chunk_size]
+            item_ids = [str((request.get('data') or {}).get('id')) for request in chunk]
+            handles = response.get('handles') or []
+            for handle in handles:
+                self.track(handle, item_ids if len(handles) == 1 else None)
+                tracked.append(handle)
+        return tracked
+
+    def pending(self) -> Dict[str, Optional[List[str]]]:
+        """
+        Handle non ancora conclusi con i relativi item (da salvare per riprendere dopo un riavvio).
+
+        Returns:
+            dict: item_ids per ogni handle in attesa
+        """
+        with self._lock:
+            return {handle: state['item_ids'] for handle, state in self._handles.items()}
+
+    def poll_once(self) -> int:
+        """
+        Interroga gli handle il cui intervallo è scaduto, con richieste batch.
+
+        Returns:
+            int: Numero di handle conclusi in questo ciclo
+        """
+        with self._poll_lock:
+            now = time.monotonic()
+            with self._lock:
+                due = [handle for handle, state in self._handles.items() if state['next_poll'] <= now]
+            if not due:
+                return 0
+
+            catalog_id = self.manager.catalog_id
+            relative_urls = [f"{catalog_id}/check_batch_request_status?handle={quote(handle, safe='')}"
+                             for handle in due]
+            outcomes = self.manager.get_many(relative_urls)
+            self.status_queries += len(due)
+            self.http_calls += -(-len(due) // GRAPH_BATCH_MAX_SIZE)
+
+            completed = 0
+            for handle, outcome in zip(due, outcomes):
+                status = None
+                if outcome['success']:
+                    entries = (outcome['data'] or {}).get('data') or []
+                    status = entries[0] if entries else None
+                if status is not None and status.get('status') in TERMINAL_STATUSES:
+                    self._complete(handle, status)
+                    completed += 1
+                elif time.monotonic() - self._handles[handle]['submitted_at'] >= self.timeout_seconds:
+                    logger.warning("Handle %s non concluso entro %.0f secondi: abbandonato",
+                                   handle, self.timeout_seconds)
+                    self._complete(handle, {'status': 'timeout', 'handle': handle})
+                    completed += 1
+                else:
+                    if not outcome['success']:
+                        logger.debug("Stato dell'handle %s non disponibile: %s", handle, outcome.get('error'))
+                    with self._lock:
+                        state = self._handles[handle]
+                        state['interval'] = min(state['interval'] * self.backoff, self.max_interval)
+                        state['next_poll'] = time.monotonic() + state['interval']
+            return completed
+
+    def _complete(self, handle: str, status: Dict[str, Any]) -> None:
+        """Unisce gli esiti per item dell'handle concluso e notifica i callback."""
+        with self._lock:
+            state = self._handles.pop(handle)
+        item_ids = state['item_ids']
+
+        errors: Dict[str, List[str]] = {}
+        warnings: Dict[str, List[str]] = {}
+        for key, target in (('errors', errors), ('warnings', warnings)):
+            for entry in status.get(key) or []:
+                item_id = entry.get('id')
+                if item_id is None and item_ids is not None and isinstance(entry.get('line'), int) \
+                        and 0 <= entry['line'] < len(item_ids):
+                    item_id = item_ids[entry['line']]
+                target.setdefault(str(item_id), []).append(entry.get('message', 'Errore sconosciuto'))
+
+        batch_failed = status.get('status') != 'finished'
+        outcomes = {}
+        for item_id in (item_ids or []):
+            outcomes[item_id] = {'success': not batch_failed, 'handle': handle}
+            if batch_failed:
+                outcomes[item_id]['errors'] = [f"Batch non conclusa: {status.get('status')}"]
+        for item_id, messages in errors.items():
+            outcomes[item_id] = {'success': False, 'handle': handle, 'errors': messages}
+        for item_id, messages in warnings.items():
+            outcomes.setdefault(item_id, {'success': not batch_failed, 'handle': handle})['warnings'] = messages
+
+        with self._lock:
+            self.results.update(outcomes)
+
+        logger.info("Batch %s conclusa (%s): %s item con errori su %s", handle, status.get('status'),
+                    len(errors), len(item_ids) if item_ids is not None else '?')
+        if self.on_item is not None:
+            for item_id, outcome in outcomes.items():
+                self.on_item(item_id, outcome)
+        if self.on_handle is not None:
+            self.on_handle(handle, status)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Interroga gli handle fino alla conclusione di tutti.
+
+        Args:
+            timeout: Attesa massima in secondi (None = fino alla conclusione)
+
+        Returns:
+            bool: True se non restano handle in attesa
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            if self._thread is None:
+                try:
+                    self.poll_once()
+                except MetaAPIException as e:
+                    logger.error("Errore nell'interrogazione dello stato delle batch: %s", e.message)
+            delay = self._seconds_until_due()
+            if delay is None:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(max(delay, 0.01))
+
+    def _seconds_until_due(self) -> Optional[float]:
+        """Secondi alla prossima interrogazione, o None se non ci sono handle in attesa."""
+        with self._lock:
+            if not self._handles:
+                return None
+            next_poll = min(state['next_poll'] for state in self._handles.values())
+        return max(next_poll - time.monotonic(), 0.0)
+
+    def start(self) -> None:
+        """Avvia l'interrogazione degli handle in un thread in background."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='batch-status-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """
+        Ferma il thread in background.
+
+        Args:
+            wait: Se True attende prima la conclusione degli handle in attesa
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        if wait:
+            self.wait()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            delay = self._seconds_until_due()
+            self._wakeup.wait(self.max_interval if delay is None else delay)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.poll_once()
+            except MetaAPIException as e:
+                logger.error("Errore nell'interrogazione dello stato delle batch: %s", e.message)
+
+    def __enter__(self) -> 'BatchStatusPoller':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop(wait=exc_type is None)
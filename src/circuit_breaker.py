@@ -0,0 +1,179 @@
+"""
+Circuit breaker per classe di endpoint della Graph API.
+
+Durante un incidente lato Meta ogni chiamata attenderebbe fino a
+REQUEST_TIMEOUT per ogni tentativo, accumulando thread e invocazioni Lambda
+bloccate. Il circuit breaker osserva l'esito delle ultime chiamate di una
+classe di endpoint (scritture catalogo, letture catalogo, messaggi) e,
+superata la soglia di errori o di chiamate lente, si apre: le chiamate
+successive falliscono subito con ``CircuitOpenError``. Trascorso
+``open_seconds`` passa in half-open e lascia passare poche chiamate di prova;
+se riescono il circuito si richiude, altrimenti si riapre.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from .config import Config, logger
+from .exceptions import CircuitOpenError
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Circuit breaker thread-safe basato su una finestra scorrevole di chiamate."""
+
+    def __init__(self, name: str, failure_rate_threshold: Optional[float] = None,
+                 slow_call_seconds: Optional[float] = None, window_size: Optional[int] = None,
+                 min_calls: Optional[int] = None, open_seconds: Optional[float] = None,
+                 half_open_max_calls: Optional[int] = None):
+        """
+        Args:
+            name: Nome del circuito (classe di endpoint)
+            failure_rate_threshold: Frazione di chiamate fallite o lente che apre il circuito
+            slow_call_seconds: Durata oltre la quale una chiamata riuscita conta come fallita
+            window_size: Numero di chiamate recenti considerate
+            min_calls: Chiamate minime nella finestra prima di valutare la soglia
+            open_seconds: Durata dello stato aperto prima della prova half-open
+            half_open_max_calls: Chiamate di prova ammesse (e necessarie) in half-open
+        """
+        self.name = name
+        self.failure_rate_threshold = (Config.CIRCUIT_FAILURE_RATE if failure_rate_threshold is None
+                                       else failure_rate_threshold)
+        self.slow_call_seconds = Config.CIRCUIT_SLOW_CALL_SECONDS if slow_call_seconds is None else slow_call_seconds
+        self.min_calls = Config.CIRCUIT_MIN_CALLS if min_calls is None else min_calls
+        self.open_seconds = Config.CIRCUIT_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.half_open_max_calls = 1 if half_open_max_calls is None else half_open_max_calls
+
+        self._window = deque(maxlen=window_size or Config.CIRCUIT_WINDOW_SIZE)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Stato corrente: 'closed', 'open' o 'half_open'."""
+        with self._lock:
+            self._refresh_state(time.monotonic())
+            return self._state
+
+    def _refresh_state(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+            logger.info("Circuito '%s' in half-open: invio chiamate di prova", self.name)
+
+    def before_call(self) -> None:
+        """
+        Da chiamare prima di ogni richiesta.
+
+        Raises:
+            CircuitOpenError: Se il circuito è aperto o le prove half-open sono già in corso
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refresh_state(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return
+            retry_after = max(self._opened_at + self.open_seconds - now, 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def cancel_call(self) -> None:
+        """
+        Annulla una chiamata ammessa da before_call ma mai inviata (es. scadenza raggiunta in coda).
+
+        In half-open restituisce la chiamata di prova, che altrimenti resterebbe occupata
+        e bloccherebbe il circuito fino al riavvio del processo.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+
+    def record_success(self, duration: float = 0.0) -> None:
+        """
+        Registra una chiamata completata.
+
+        Args:
+            duration: Durata della chiamata in secondi (le chiamate lente contano come fallite)
+        """
+        if self.slow_call_seconds and duration > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._state = CLOSED
+                    self._window.clear()
+                    logger.info("Circuito '%s' richiuso", self.name)
+                return
+            self._window.append(False)
+
+    def record_failure(self) -> None:
+        """Registra una chiamata fallita (errore di rete, 5xx o timeout)."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trip(time.monotonic())
+                return
+            if self._state == OPEN:
+                return
+            self._window.append(True)
+            if len(self._window) >= self.min_calls:
+                failure_rate = sum(self._window) / len(self._window)
+                if failure_rate >= self.failure_rate_threshold:
+                    self._trip(time.monotonic())
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._window.clear()
+        logger.warning("Circuito '%s' aperto per %.0f secondi", self.name, self.open_seconds)
+
+    def reset(self) -> None:
+        """Riporta il circuito nello stato chiuso."""
+        with self._lock:
+            self._state = CLOSED
+            self._window.clear()
+
+
+class CircuitBreakerGroup:
+    """Insieme di circuit breaker, uno per classe di endpoint, creati su richiesta."""
+
+    def __init__(self, **breaker_options):
+        """
+        Args:
+            **breaker_options: Parametri passati a ogni CircuitBreaker creato
+        """
+        self._options = breaker_options
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        """Restituisce (creandolo se serve) il circuit breaker della classe di endpoint."""
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(endpoint)
+                if breaker is None:
+                    breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, **self._options)
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        """Stato corrente di ogni circuito creato."""
+        return {name: breaker.state for name, breaker in self._breakers.items()}
+
+
+# Circuiti condivisi da tutti i manager del processo: un incidente Meta li riguarda tutti
+DEFAULT_CIRCUIT_BREAKERS = CircuitBreakerGroup()
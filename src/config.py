@@ -4,11 +4,17 @@ Gestisce il caricamento delle variabili d'ambiente e la configurazione dell'appl
 """
 
 import os
+import json
+import atexit
 import logging
+import logging.handlers
+import queue
 from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
 
+from . import verticals
+
 # Carica le variabili d'ambiente dal file .env
 load_dotenv()
 
@@ -22,6 +28,7 @@ class Config:
     META_ACCESS_TOKEN: str = os.getenv('META_ACCESS_TOKEN', '')
     META_APP_ID: str = os.getenv('META_APP_ID', '')
     META_APP_SECRET: str = os.getenv('META_APP_SECRET', '')
+    META_WEBHOOK_VERIFY_TOKEN: str = os.getenv('META_WEBHOOK_VERIFY_TOKEN', '')  # verifica iscrizione webhook
     WHATSAPP_BUSINESS_ACCOUNT_ID: str = os.getenv('WHATSAPP_BUSINESS_ACCOUNT_ID', '')
     PHONE_NUMBER_ID: str = os.getenv('PHONE_NUMBER_ID', '')
     
@@ -41,20 +48,55 @@ class Config:
     REQUEST_TIMEOUT: int = int(os.getenv('REQUEST_TIMEOUT', '30'))
     MAX_RETRIES: int = int(os.getenv('MAX_RETRIES', '3'))
     RETRY_DELAY: int = int(os.getenv('RETRY_DELAY', '5'))
+    RETRY_MAX_DELAY: float = float(os.getenv('RETRY_MAX_DELAY', '60'))
+    RETRY_BUDGET_RATIO: float = float(os.getenv('RETRY_BUDGET_RATIO', '0.1'))  # max 10% di retry sul traffico
+    
+    # Trasporto HTTP: 'requests' (HTTP/1.1) oppure 'httpx' (HTTP/2 con multiplexing)
+    HTTP_TRANSPORT: str = os.getenv('HTTP_TRANSPORT', 'requests')
+    
+    # Compressione gzip dei body delle scritture batch oltre questa dimensione in byte (0 = disattivata)
+    REQUEST_GZIP_MIN_BYTES: int = int(os.getenv('REQUEST_GZIP_MIN_BYTES', '0'))
+    
+    # Connessioni: cache DNS del processo (0 = disattivata) e connessioni aperte all'avvio del manager
+    DNS_CACHE_TTL: float = float(os.getenv('DNS_CACHE_TTL', '0'))
+    WARMUP_CONNECTIONS: int = int(os.getenv('WARMUP_CONNECTIONS', '0'))
+    
+    # Scheduler a priorità tra traffico interattivo e bulk (0 = disattivato, altrimenti richieste in volo)
+    SCHEDULER_MAX_CONCURRENCY: int = int(os.getenv('SCHEDULER_MAX_CONCURRENCY', '0'))
+    SCHEDULER_RESERVED_CONCURRENCY: int = int(os.getenv('SCHEDULER_RESERVED_CONCURRENCY', '2'))
+    SCHEDULER_REQUESTS_PER_HOUR: int = int(os.getenv('SCHEDULER_REQUESTS_PER_HOUR', '0'))
+    SCHEDULER_RESERVED_RATE: float = float(os.getenv('SCHEDULER_RESERVED_RATE', '0.2'))
+    SCHEDULER_INTERACTIVE_WEIGHT: float = float(os.getenv('SCHEDULER_INTERACTIVE_WEIGHT', '4'))
+    
+    # De-duplicazione dei messaggi: secondi per cui un messaggio inviato blocca i duplicati (0 = disattivata),
+    # database SQLite per condividere le chiavi tra processi (vuoto = solo memoria) e chiave derivata dal
+    # contenuto per i messaggi inviati senza idempotency_key (blocca anche i messaggi ripetuti di proposito)
+    MESSAGE_DEDUP_TTL: float = float(os.getenv('MESSAGE_DEDUP_TTL', '600'))
+    MESSAGE_DEDUP_DB: str = os.getenv('MESSAGE_DEDUP_DB', '')
+    MESSAGE_DEDUP_BY_CONTENT: bool = os.getenv('MESSAGE_DEDUP_BY_CONTENT', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Circuit Breaker Configuration
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+    CIRCUIT_SLOW_CALL_SECONDS: float = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '10'))
+    CIRCUIT_WINDOW_SIZE: int = int(os.getenv('CIRCUIT_WINDOW_SIZE', '20'))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
     
     # Batch Operation Limits
     MAX_BATCH_SIZE: int = int(os.getenv('MAX_BATCH_SIZE', '50'))
     
     # Logging Configuration
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
-    LOG_FILE: str = os.getenv('LOG_FILE', 'whatsapp_catalog.log')
+    LOG_FILE: str = os.getenv('LOG_FILE', 'whatsapp_catalog.log')  # vuoto = nessun file di log
+    LOG_FORMAT: str = os.getenv('LOG_FORMAT', 'text')  # 'text' oppure 'structured' (JSON)
+    LOG_ASYNC: bool = os.getenv('LOG_ASYNC', 'false').lower() in ('1', 'true', 'yes')
     
     # Data Validation
-    MAX_PRODUCT_NAME_LENGTH: int = 150
-    MAX_PRODUCT_DESCRIPTION_LENGTH: int = 9999
-    SUPPORTED_CURRENCIES: list = ['EUR', 'USD', 'GBP', 'JPY', 'CNY', 'CAD', 'AUD']
-    SUPPORTED_AVAILABILITY_STATUS: list = ['in stock', 'out of stock', 'preorder', 'available for order', 'discontinued']
-    SUPPORTED_CONDITIONS: list = ['new', 'refurbished', 'used', 'open_box']
+    MAX_PRODUCT_NAME_LENGTH: int = verticals.MAX_NAME_LENGTH
+    MAX_PRODUCT_DESCRIPTION_LENGTH: int = verticals.MAX_DESCRIPTION_LENGTH
+    SUPPORTED_CURRENCIES: list = list(verticals.SUPPORTED_CURRENCIES)
+    SUPPORTED_AVAILABILITY_STATUS: list = list(verticals.PRODUCT_AVAILABILITY)
+    SUPPORTED_CONDITIONS: list = list(verticals.PRODUCT_CONDITIONS)
     
     # File Upload Configuration
     MAX_IMAGE_SIZE_MB: int = int(os.getenv('MAX_IMAGE_SIZE_MB', '10'))
@@ -86,7 +128,7 @@ class Config:
         
         if missing_fields:
             logger = logging.getLogger(__name__)
-            logger.error(f"Campi obbligatori mancanti nella configurazione: {', '.join(missing_fields)}")
+            logger.error("Campi obbligatori mancanti nella configurazione: %s", ', '.join(missing_fields))
             return False
         
         return True
@@ -120,92 +162,157 @@ class Config:
         return f"{cls.META_BASE_URL}/{phone_number_id}/messages"
     
     @classmethod
-    def get_headers(cls) -> dict:
+    def get_headers(cls, access_token: Optional[str] = None) -> dict:
         """
         Restituisce gli header HTTP standard per le richieste API.
         
+        Args:
+            access_token: Token da usare (opzionale, usa META_ACCESS_TOKEN se non specificato)
+        
         Returns:
             dict: Dictionary con gli header HTTP
         """
         return {
-            'Authorization': f'Bearer {cls.META_ACCESS_TOKEN}',
+            'Authorization': f'Bearer {access_token or cls.META_ACCESS_TOKEN}',
             'Content-Type': 'application/json',
             'User-Agent': 'WhatsAppCatalogManager/1.0'
         }
     
+    # Listener del logging asincrono attivo (vedi setup_logging)
+    _log_listener: Optional[logging.handlers.QueueListener] = None
+    
     @classmethod
-    def setup_logging(cls) -> logging.Logger:
+    def _build_log_formatter(cls) -> logging.Formatter:
         """
-        Configura il sistema di logging dell'applicazione.
+        Crea il formatter per il formato di log configurato.
+        
+        In modalità 'structured' usa structlog se installato, altrimenti
+        StructuredFormatter (JSON con la sola libreria standard).
         
         Returns:
-            logging.Logger: Logger configurato
+            logging.Formatter: Formatter da assegnare agli handler
         """
-        # Crea directory logs se non esiste
-        log_dir = Path('logs')
-        log_dir.mkdir(exist_ok=True)
+        if cls.LOG_FORMAT.lower() != 'structured':
+            return logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            )
         
-        # Configura il logging
-        log_file_path = log_dir / cls.LOG_FILE
+        try:
+            import structlog
+        except ImportError:
+            return StructuredFormatter()
         
-        # Configurazione del formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+        return structlog.stdlib.ProcessorFormatter(
+            processor=structlog.processors.JSONRenderer(),
+            foreign_pre_chain=[
+                structlog.processors.TimeStamper(fmt='iso', utc=True),
+                structlog.stdlib.add_log_level,
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.ExtraAdder(),
+                _drop_formatted_message,
+            ],
         )
+    
+    @classmethod
+    def setup_logging(cls) -> logging.Logger:
+        """
+        Configura il sistema di logging dell'applicazione.
+        
+        Con LOG_ASYNC attivo gli handler di file e console vengono eseguiti da un
+        QueueListener in un thread dedicato: il thread chiamante si limita ad
+        accodare il record, senza bloccarsi sull'I/O.
+        
+        Returns:
+            logging.Logger: Logger configurato
+        """
+        formatter = cls._build_log_formatter()
+        level = getattr(logging, cls.LOG_LEVEL.upper(), logging.INFO)
         
         # Configurazione del logger principale
         logger = logging.getLogger('whatsapp_catalog_manager')
-        logger.setLevel(getattr(logging, cls.LOG_LEVEL.upper(), logging.INFO))
+        logger.setLevel(level)
         
         # Rimuovi handler esistenti per evitare duplicati
         logger.handlers.clear()
+        if cls._log_listener is not None:
+            cls._log_listener.stop()
+            cls._log_listener = None
+        
+        handlers = []
         
         # Handler per file
-        file_handler = logging.FileHandler(log_file_path, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        if cls.LOG_FILE:
+            # Crea directory logs se non esiste
+            log_dir = Path('logs')
+            log_dir.mkdir(exist_ok=True)
+            
+            file_handler = logging.FileHandler(log_dir / cls.LOG_FILE, encoding='utf-8')
+            file_handler.setLevel(logging.DEBUG)
+            file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
         
         # Handler per console
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(getattr(logging, cls.LOG_LEVEL.upper(), logging.INFO))
+        console_handler.setLevel(level)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
+        
+        if cls.LOG_ASYNC:
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)
+            cls._log_listener = listener
+            logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
         
         return logger
 
+
+def _drop_formatted_message(logger, method_name, event_dict):
+    """Processor structlog: rimuove il duplicato 'message' aggiunto da QueueHandler.prepare()."""
+    event_dict.pop('message', None)
+    return event_dict
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formatter JSON (una riga per record) basato solo sulla libreria standard.
+    
+    Usato in modalità LOG_FORMAT=structured quando structlog non è installato.
+    I campi passati con ``extra={...}`` vengono inclusi nel documento.
+    """
+    
+    # Attributi standard di LogRecord, esclusi dai campi extra
+    _RESERVED = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self._RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
 class ProductValidationRules:
     """
     Regole di validazione per i prodotti del catalogo.
+    
+    Le regole sono definite dallo schema 'commerce' del registro dei vertical.
     """
     
-    REQUIRED_FIELDS = [
-        'retailer_id',
-        'name', 
-        'description',
-        'price',
-        'currency',
-        'availability',
-        'condition'
-    ]
-    
-    OPTIONAL_FIELDS = [
-        'brand',
-        'category',
-        'image_url',
-        'additional_image_urls',
-        'url',
-        'size',
-        'color',
-        'material',
-        'pattern',
-        'gender',
-        'age_group',
-        'inventory',
-        'sale_price',
-        'sale_price_effective_date'
-    ]
+    REQUIRED_FIELDS = list(verticals.COMMERCE.required_fields)
+    
+    OPTIONAL_FIELDS = list(verticals.COMMERCE.optional_fields)
     
     @classmethod
     def validate_product_data(cls, product_data: dict) -> tuple[bool, list[str]]:
@@ -218,56 +325,48 @@ class ProductValidationRules:
         Returns:
             tuple: (is_valid: bool, errors: list[str])
         """
-        errors = []
-        
-        # Controlla campi obbligatori
-        for field in cls.REQUIRED_FIELDS:
-            if field not in product_data or not product_data[field]:
-                errors.append(f"Campo obbligatorio mancante: {field}")
-        
-        # Valida lunghezza nome
-        if 'name' in product_data:
-            name = product_data['name']
-            if len(name) > Config.MAX_PRODUCT_NAME_LENGTH:
-                errors.append(f"Nome troppo lungo: {len(name)} caratteri (max {Config.MAX_PRODUCT_NAME_LENGTH})")
-        
-        # Valida lunghezza descrizione
-        if 'description' in product_data:
-            description = product_data['description']
-            if len(description) > Config.MAX_PRODUCT_DESCRIPTION_LENGTH:
-                errors.append(f"Descrizione troppo lunga: {len(description)} caratteri (max {Config.MAX_PRODUCT_DESCRIPTION_LENGTH})")
-        
-        # Valida valuta
-        if 'currency' in product_data:
-            currency = product_data['currency'].upper()
-            if currency not in Config.SUPPORTED_CURRENCIES:
-                errors.append(f"Valuta non supportata: {currency}. Supportate: {', '.join(Config.SUPPORTED_CURRENCIES)}")
-        
-        # Valida disponibilità
-        if 'availability' in product_data:
-            availability = product_data['availability']
-            if availability not in Config.SUPPORTED_AVAILABILITY_STATUS:
-                errors.append(f"Status disponibilità non valido: {availability}. Validi: {', '.join(Config.SUPPORTED_AVAILABILITY_STATUS)}")
-        
-        # Valida condizione
-        if 'condition' in product_data:
-            condition = product_data['condition']
-            if condition not in Config.SUPPORTED_CONDITIONS:
-                errors.append(f"Condizione non valida: {condition}. Valide: {', '.join(Config.SUPPORTED_CONDITIONS)}")
+        return verticals.COMMERCE.validate(product_data)
+
+class HomeListingValidationRules:
+    """
+    Regole di validazione per i listing immobiliari (cataloghi home_listings).
+    
+    Le regole sono definite dallo schema 'home_listings' del registro dei vertical.
+    """
+    
+    REQUIRED_FIELDS = list(verticals.HOME_LISTINGS.required_fields)
+    
+    REQUIRED_ADDRESS_FIELDS = list(verticals.HOME_LISTINGS.nested_required['address'])
+    
+    OPTIONAL_FIELDS = list(verticals.HOME_LISTINGS.optional_fields)
+    
+    SUPPORTED_AVAILABILITY_STATUS = list(verticals.HOME_LISTING_AVAILABILITY)
+    
+    @classmethod
+    def validate_listing_data(cls, listing_data: dict) -> tuple[bool, list[str]]:
+        """
+        Valida i dati di un listing immobiliare secondo le regole di Meta.
         
-        # Valida prezzo
-        if 'price' in product_data:
-            try:
-                price_str = str(product_data['price']).replace(',', '.')
-                # Rimuovi simboli di valuta e spazi
-                price_clean = ''.join(c for c in price_str if c.isdigit() or c == '.')
-                price_float = float(price_clean)
-                if price_float <= 0:
-                    errors.append("Il prezzo deve essere maggiore di zero")
-            except (ValueError, TypeError):
-                errors.append(f"Formato prezzo non valido: {product_data['price']}")
+        Args:
+            listing_data: Dictionary con i dati del listing
+            
+        Returns:
+            tuple: (is_valid: bool, errors: list[str])
+        """
+        return verticals.HOME_LISTINGS.validate(listing_data)
+    
+    @classmethod
+    def validate_listings(cls, listings: list) -> list[tuple[bool, list[str]]]:
+        """
+        Valida molti listing in un passaggio (per batch e sincronizzazioni).
         
-        return len(errors) == 0, errors
+        Args:
+            listings: Lista di dizionari o HomeListing
+            
+        Returns:
+            list: (is_valid, errors) per ogni listing, nello stesso ordine
+        """
+        return verticals.HOME_LISTINGS.validate_many(listings)
 
 # Inizializza la configurazione e il logger
 config = Config()
@@ -0,0 +1,195 @@
+"""
+Scadenze (deadline) per le operazioni del manager e token di continuazione.
+
+``REQUEST_TIMEOUT`` limita la singola richiesta HTTP, non l'operazione: una
+batch, un delta-sync o un export possono durare molto più del tempo concesso
+al chiamante (es. i 30 secondi della Lambda) ed essere interrotti a metà
+senza riportare nulla. Una ``Deadline`` è il tempo rimasto all'operazione:
+
+- ``use_deadline`` la rende attiva nel contesto corrente (thread o task
+  asyncio), così ``_make_request`` riduce il timeout di ogni tentativo al
+  tempo rimasto e non effettua retry che finirebbero oltre la scadenza;
+- le operazioni a più passi (batch, sync, export) smettono di avviare nuovi
+  passi quando il tempo rimasto non basta per un altro passo e sollevano
+  ``DeadlineExceeded`` con i risultati parziali e un token di continuazione,
+  da passare alla chiamata successiva per riprendere dal punto di arresto.
+
+Il modulo usa solo la libreria standard: viene copiato anche nel layer
+della Lambda (vedi cloud/create_layer.py).
+
+Example:
+    deadline = Deadline.from_lambda_context(context)
+    try:
+        results = manager.submit_items_batch(item_requests, deadline=deadline)
+    except DeadlineExceeded as e:
+        results, token = e.partial, e.continuation  # riprendere con continuation=token
+
+    with use_deadline(5.0):
+        manager.get_product('SKU_1')
+"""
+
+import base64
+import contextvars
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+# Secondi lasciati alla Lambda per serializzare la risposta dopo la scadenza
+LAMBDA_SAFETY_MARGIN = 1.0
+
+# Durata minima di un timeout ridotto alla scadenza (requests rifiuta timeout nulli)
+MIN_TIMEOUT = 0.001
+
+Timeout = Union[float, Tuple[float, float]]
+
+_current: contextvars.ContextVar[Optional['Deadline']] = contextvars.ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """Istante entro cui un'operazione deve concludersi (orologio monotono)."""
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: Secondi a disposizione a partire da ora
+        """
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_lambda_context(cls, context: Any, margin: float = LAMBDA_SAFETY_MARGIN) -> Optional['Deadline']:
+        """
+        Crea la scadenza dal tempo rimasto a una invocazione Lambda.
+
+        Args:
+            context: Contesto della Lambda (con get_remaining_time_in_millis)
+            margin: Secondi riservati alla risposta
+
+        Returns:
+            Deadline: Scadenza, o None se il contesto non indica il tempo rimasto
+        """
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return None
+        return cls(context.get_remaining_time_in_millis() / 1000 - margin)
+
+    @classmethod
+    def coerce(cls, value: Union[float, 'Deadline', None]) -> Optional['Deadline']:
+        """Accetta una Deadline oppure i secondi a disposizione."""
+        if value is None or isinstance(value, Deadline):
+            return value
+        return cls(float(value))
+
+    def remaining(self) -> float:
+        """Secondi rimasti (negativi se la scadenza è passata)."""
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_time_for(self, seconds: float) -> bool:
+        """
+        Indica se resta tempo per un passo della durata indicata.
+
+        Args:
+            seconds: Durata stimata del passo
+
+        Returns:
+            bool: True se il passo può concludersi entro la scadenza
+        """
+        remaining = self.remaining()
+        return remaining > 0 and remaining >= seconds
+
+    def clamp_timeout(self, timeout: Optional[Timeout]) -> Timeout:
+        """
+        Riduce un timeout di requests (secondi o tupla connect/read) al tempo rimasto.
+
+        Il timeout di lettura di requests vale per ogni singola lettura dal
+        socket: la scadenza limita quindi l'attesa della risposta, non il
+        download di un body in streaming.
+
+        Args:
+            timeout: Timeout della richiesta (None = nessun limite)
+
+        Returns:
+            Timeout con ogni componente non superiore al tempo rimasto
+        """
+        remaining = max(self.remaining(), MIN_TIMEOUT)
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Scadenza attiva nel contesto corrente (None se non impostata)."""
+    return _current.get()
+
+
+@contextmanager
+def use_deadline(deadline: Union[float, Deadline, None]) -> Iterator[Optional[Deadline]]:
+    """
+    Attiva una scadenza per il blocco, senza mai estendere quella già attiva.
+
+    Con deadline None il blocco usa la scadenza già attiva (se presente).
+
+    Args:
+        deadline: Deadline o secondi a disposizione
+
+    Yields:
+        Deadline: Scadenza effettiva del blocco (la più vicina tra le due), o None
+    """
+    deadline = Deadline.coerce(deadline)
+    outer = _current.get()
+    if deadline is None or (outer is not None and outer.expires_at <= deadline.expires_at):
+        yield outer
+        return
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def encode_continuation(operation: str, **state: Any) -> str:
+    """
+    Crea un token di continuazione opaco.
+
+    Args:
+        operation: Nome dell'operazione che potrà accettarlo
+        **state: Stato necessario per riprendere (valori serializzabili in JSON)
+
+    Returns:
+        str: Token base64 URL-safe
+    """
+    payload = json.dumps({'op': operation, **state}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_continuation(token: Optional[str], operation: str) -> Dict[str, Any]:
+    """
+    Legge un token di continuazione creato da encode_continuation.
+
+    Args:
+        token: Token ricevuto (None = operazione da iniziare)
+        operation: Operazione che lo riceve
+
+    Returns:
+        dict: Stato salvato nel token (vuoto se token è None)
+
+    Raises:
+        ValueError: Se il token non è valido o appartiene a un'altra operazione
+    """
+    if token is None:
+        return {}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Token di continuazione non valido")
+    if not isinstance(state, dict) or state.pop('op', None) != operation:
+        raise ValueError(f"Token di continuazione non valido per {operation}")
+    return state
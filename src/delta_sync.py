@@ -0,0 +1,267 @@
+"""
+Sincronizzazione incrementale (delta-sync) di un catalogo tramite items_batch.
+
+Un sistema sorgente che esporta ogni giorno l'intero inventario (centinaia di
+migliaia di prodotti o listing) cambia di solito solo una piccola parte degli
+item. ``DeltaSync`` calcola un hash del contenuto di ogni item, lo confronta
+con quello dell'ultima sincronizzazione riuscita e invia con ``items_batch``
+solo gli item nuovi o modificati, più le eliminazioni di quelli spariti
+dalla sorgente. Gli hash sono salvati in un file JSON.
+
+``DeltaSync.for_vertical`` ricava tipo di item e campi identificativi dal
+registro dei vertical, compresi gli ID composti (es. i voli).
+
+Example:
+    sync = DeltaSync(manager, item_type='HOME_LISTING', id_field='home_listing_id',
+                     state_path='home_listings.state.json', prepare=manager.validate_home_listing)
+    summary = sync.sync(load_listings())
+
+    flights = DeltaSync.for_vertical(manager, 'flights', state_path='flights.state.json')
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .config import logger
+from .deadline import Deadline, decode_continuation, use_deadline
+from .exceptions import DeadlineExceeded
+from .verticals import VerticalSchema, get_vertical
+
+
+def content_hash(data: Dict[str, Any]) -> str:
+    """
+    Hash stabile del contenuto di un item (indipendente dall'ordine delle chiavi).
+
+    Args:
+        data: Dati dell'item
+
+    Returns:
+        str: Digest esadecimale
+    """
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class DeltaSync:
+    """Invia solo le differenze rispetto all'ultima sincronizzazione riuscita."""
+
+    def __init__(self, manager, item_type: str = 'PRODUCT_ITEM',
+                 id_field: Union[str, Tuple[str, ...]] = 'retailer_id',
+                 state_path: Optional[str] = None, batch_id_field: Optional[str] = None,
+                 prepare: Optional[Callable[[Any], Dict[str, Any]]] = None,
+                 on_synced: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        """
+        Args:
+            manager: WhatsAppCatalogManager usato per inviare le batch
+            item_type: Tipo di item per items_batch
+            id_field: Campo che identifica l'item nei dati sorgente (o tupla di campi per ID
+                composti, uniti da ':' nello stato)
+            state_path: File JSON con gli hash dell'ultima sincronizzazione (None = solo in memoria)
+            batch_id_field: Campo dell'ID nei dati items_batch (default: id_field; per ID
+                composti i campi identificativi restano nei dati)
+            prepare: Funzione che valida e normalizza un item e restituisce i dati da
+                inviare; un ValueError scarta l'item (default: item.to_dict() o copia del dict)
+            on_synced: Callback chiamata con le operazioni inviate dopo ogni sincronizzazione
+                riuscita (es. ProductIndex.apply_item_requests per mantenere l'indice locale)
+        """
+        self.manager = manager
+        self.item_type = item_type
+        self.id_field = id_field
+        self.id_fields = (id_field,) if isinstance(id_field, str) else tuple(id_field)
+        self.batch_id_field = batch_id_field or (id_field if isinstance(id_field, str) else None)
+        self.state_path = state_path
+        self.prepare = prepare
+        self.on_synced = on_synced
+        self.hashes: Dict[str, str] = self._load_state()
+
+    @classmethod
+    def for_vertical(cls, manager, vertical: Union[str, VerticalSchema], state_path: Optional[str] = None,
+                     prepare: Optional[Callable[[Any], Dict[str, Any]]] = None) -> 'DeltaSync':
+        """
+        Crea una sincronizzazione per un vertical registrato.
+
+        Args:
+            manager: WhatsAppCatalogManager usato per inviare le batch
+            vertical: Nome del vertical o relativo schema
+            state_path: File JSON con gli hash dell'ultima sincronizzazione
+            prepare: Funzione di validazione e normalizzazione (default: validazione dello schema)
+
+        Returns:
+            DeltaSync: Sincronizzazione configurata per il vertical
+        """
+        schema = get_vertical(vertical) if isinstance(vertical, str) else vertical
+        if prepare is None:
+            def prepare(item: Any) -> Dict[str, Any]:
+                data = item.copy() if isinstance(item, dict) else item.to_dict()
+                is_valid, errors = schema.validate(data)
+                if not is_valid:
+                    raise ValueError("; ".join(errors))
+                return data
+        return cls(manager, item_type=schema.item_type, id_field=schema.id_field, state_path=state_path,
+                   batch_id_field=schema.batch_id_field, prepare=prepare)
+
+    def _item_id(self, data: Dict[str, Any]) -> Optional[str]:
+        values = [data.get(field) for field in self.id_fields]
+        if all(value is None for value in values):
+            return None
+        return ':'.join(str(value) for value in values)
+
+    def _id_data(self, item_id: str) -> Dict[str, str]:
+        if self.batch_id_field:
+            return {self.batch_id_field: item_id}
+        return dict(zip(self.id_fields, item_id.split(':', len(self.id_fields) - 1)))
+
+    def _load_state(self) -> Dict[str, str]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as state_file:
+            return json.load(state_file)
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump(self.hashes, state_file, separators=(',', ':'))
+        os.replace(temp_path, self.state_path)
+
+    def _prepare(self, item: Any) -> Dict[str, Any]:
+        if self.prepare is not None:
+            return self.prepare(item)
+        return item.copy() if isinstance(item, dict) else item.to_dict()
+
+    def plan(self, items: Iterable[Any], delete_missing: bool = True) -> Dict[str, Any]:
+        """
+        Calcola le operazioni necessarie senza inviarle.
+
+        Args:
+            items: Stato completo della sorgente (dizionari o modelli)
+            delete_missing: Se True elimina gli item non più presenti nella sorgente
+
+        Returns:
+            dict: 'requests' (operazioni items_batch), 'hashes' (nuovi hash per ID),
+                conteggi 'created', 'updated', 'unchanged', 'deleted' e 'rejected'
+                (lista con ID ed errore degli item scartati)
+        """
+        item_requests, rejected = [], []
+        hashes: Dict[str, str] = {}
+        created = updated = unchanged = 0
+
+        for item in items:
+            item_id = self._item_id(item if isinstance(item, dict) else item.to_dict())
+            try:
+                data = self._prepare(item)
+            except ValueError as e:
+                id_key = self.id_field if isinstance(self.id_field, str) else 'id'
+                rejected.append({'success': False, id_key: item_id, 'error': str(e)})
+                # L'item resta com'era sul catalogo: si conserva l'hash precedente
+                if str(item_id) in self.hashes:
+                    hashes[str(item_id)] = self.hashes[str(item_id)]
+                continue
+
+            item_id = self._item_id(data) or str(item_id)
+            digest = content_hash(data)
+            hashes[item_id] = digest
+            previous = self.hashes.get(item_id)
+            if previous == digest:
+                unchanged += 1
+                continue
+            if previous is None:
+                created += 1
+            else:
+                updated += 1
+            if self.batch_id_field:
+                payload = {k: v for k, v in data.items() if k != self.id_field}
+                payload[self.batch_id_field] = item_id
+            else:
+                payload = data
+            # UPDATE fa upsert: funziona anche se lo stato locale è andato perso
+            item_requests.append({'method': 'UPDATE', 'data': payload})
+
+        deleted = 0
+        if delete_missing:
+            for item_id in self.hashes.keys() - hashes.keys():
+                item_requests.append({'method': 'DELETE', 'data': self._id_data(item_id)})
+                deleted += 1
+        else:
+            for item_id in self.hashes.keys() - hashes.keys():
+                hashes[item_id] = self.hashes[item_id]
+
+        return {'requests': item_requests, 'hashes': hashes, 'created': created, 'updated': updated,
+                'unchanged': unchanged, 'deleted': deleted, 'rejected': rejected}
+
+    def sync(self, items: Iterable[Any], delete_missing: bool = True,
+             deadline: Union[float, Deadline, None] = None) -> Dict[str, Any]:
+        """
+        Sincronizza il catalogo con lo stato della sorgente.
+
+        Lo stato locale viene aggiornato solo dopo l'invio di tutte le batch:
+        se l'invio fallisce la sincronizzazione successiva ripete le stesse operazioni.
+        Se invece la scadenza interrompe l'invio, lo stato registra le operazioni già
+        inviate: la sincronizzazione successiva invia solo le rimanenti.
+
+        Args:
+            items: Stato completo della sorgente (dizionari o modelli)
+            delete_missing: Se True elimina gli item non più presenti nella sorgente
+            deadline: Scadenza della sincronizzazione (Deadline o secondi; default: quella attiva)
+
+        Returns:
+            dict: Conteggi delle operazioni, item scartati e 'handles' delle batch inviate
+
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe l'invio ('partial' contiene gli
+                'handles' delle batch inviate e il numero di operazioni 'sent' e 'pending')
+        """
+        plan = self.plan(items, delete_missing=delete_missing)
+        handles: List[str] = []
+        if plan['requests']:
+            try:
+                # Scadenza attivata nel contesto: il manager la applica senza parametri aggiuntivi
+                with use_deadline(deadline):
+                    responses = self.manager.submit_items_batch(plan['requests'], item_type=self.item_type)
+            except DeadlineExceeded as e:
+                self._save_partial(plan, e)
+                raise
+            handles = [handle for response in responses for handle in response.get('handles', [])]
+
+        self.hashes = plan['hashes']
+        self._save_state()
+        if self.on_synced is not None and plan['requests']:
+            self.on_synced(plan['requests'])
+
+        summary = {key: plan[key] for key in ('created', 'updated', 'unchanged', 'deleted', 'rejected')}
+        summary['handles'] = handles
+        logger.info("Delta-sync %s: %s nuovi, %s modificati, %s invariati, %s eliminati, %s scartati",
+                    self.item_type, summary['created'], summary['updated'], summary['unchanged'],
+                    summary['deleted'], len(summary['rejected']))
+        return summary
+
+    def _save_partial(self, plan: Dict[str, Any], error: DeadlineExceeded) -> None:
+        """Registra nello stato le operazioni inviate prima della scadenza."""
+        # Senza token nessun chunk è stato inviato (scadenza prima di submit_items_batch)
+        sent_count = (decode_continuation(error.continuation, 'submit_items_batch').get('offset', 0)
+                      if error.continuation else 0)
+        sent = plan['requests'][:sent_count]
+        for request in sent:
+            data = request['data']
+            item_id = str(data[self.batch_id_field]) if self.batch_id_field else self._item_id(data)
+            if request['method'] == 'DELETE':
+                self.hashes.pop(item_id, None)
+            else:
+                self.hashes[item_id] = plan['hashes'][item_id]
+        self._save_state()
+        if self.on_synced is not None and sent:
+            self.on_synced(sent)
+
+        responses = error.partial or []
+        error.partial = {
+            'handles': [handle for response in responses for handle in response.get('handles', [])],
+            'sent': len(sent),
+            'pending': len(plan['requests']) - len(sent),
+        }
+        # La continuazione è lo stato salvato: basta ripetere sync con la stessa sorgente
+        error.continuation = None
+        logger.warning("Delta-sync %s interrotto dalla scadenza: %s operazioni inviate, %s rimaste",
+                       self.item_type, len(sent), error.partial['pending'])
@@ -0,0 +1,87 @@
+"""
+Cache in-process delle risoluzioni DNS per le connessioni HTTP del manager.
+
+Ogni nuova connessione alla Graph API risolve di nuovo ``graph.facebook.com``:
+in una CLI di breve durata o in una Lambda a freddo la risoluzione si ripete
+per ogni connessione del pool aperta in parallelo. ``DNSCache`` conserva gli
+indirizzi risolti per ``ttl_seconds`` ed è usata dalle connessioni di
+``InstrumentedHTTPAdapter`` (vedi ``metrics``); un errore di connessione
+invalida la voce, così un indirizzo non più valido viene risolto di nuovo.
+
+La cache è disattivata di default: si attiva con ``DNS_CACHE_TTL`` (secondi).
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+
+
+class DNSCache:
+    """Cache thread-safe host -> indirizzi IP con scadenza."""
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        """
+        Args:
+            ttl_seconds: Durata di validità di una risoluzione (0 = cache disattivata)
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def resolve(self, host: str, port: int) -> Optional[str]:
+        """
+        Restituisce un indirizzo IP per host e porta, risolvendolo se necessario.
+
+        Args:
+            host: Nome host
+            port: Porta TCP
+
+        Returns:
+            str: Indirizzo IP (None se la cache è disattivata)
+
+        Raises:
+            socket.gaierror: Se la risoluzione fallisce
+        """
+        if not self.enabled:
+            return None
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[1] > now:
+                self.hits += 1
+                return cached[0][0]
+            self.misses += 1
+
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[key] = (addresses, time.monotonic() + self.ttl_seconds)
+        return addresses[0]
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        """
+        Rimuove le risoluzioni di un host (o tutte se host è None).
+
+        Args:
+            host: Nome host
+        """
+        with self._lock:
+            if host is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == host]:
+                    del self._entries[key]
+
+
+# Cache condivisa da tutte le connessioni del processo
+DEFAULT_DNS_CACHE = DNSCache(Config.DNS_CACHE_TTL)
@@ -0,0 +1,59 @@
+"""
+Eccezioni del pacchetto WhatsApp Business Catalog Manager.
+"""
+
+from typing import Any, Optional
+
+
+class MetaAPIException(Exception):
+    """Eccezione personalizzata per errori dell'API Meta."""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, response_data: Optional[dict] = None):
+        self.message = message
+        self.status_code = status_code
+        self.response_data = response_data
+        super().__init__(self.message)
+
+
+class CircuitOpenError(MetaAPIException):
+    """
+    Sollevata senza effettuare la chiamata quando il circuit breaker
+    dell'endpoint è aperto (Graph API considerata non disponibile).
+    """
+    
+    def __init__(self, endpoint: str, retry_after: float):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(f"Circuito '{endpoint}' aperto: chiamate sospese per altri {retry_after:.1f} secondi")
+
+
+class DeadlineExceeded(MetaAPIException):
+    """
+    Sollevata quando il tempo a disposizione dell'operazione (vedi deadline)
+    non basta per la prossima richiesta o il prossimo passo.
+
+    Le operazioni a più passi riportano i risultati già ottenuti in ``partial``
+    e, se l'operazione si può riprendere, il token da passare come
+    ``continuation`` alla chiamata successiva.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response_data: Optional[dict] = None,
+                 partial: Any = None, continuation: Optional[str] = None):
+        self.partial = partial
+        self.continuation = continuation
+        super().__init__(message, status_code, response_data)
+
+
+class DuplicateMessageError(MetaAPIException):
+    """
+    Sollevata senza effettuare la chiamata quando un messaggio con la stessa
+    chiave di idempotenza è ancora in invio o il suo invio ha avuto esito
+    incerto (es. timeout dopo l'invio): ripeterlo rischierebbe un doppione.
+    """
+
+    def __init__(self, key: str, status: str, retry_after: float):
+        self.key = key
+        self.status = status
+        self.retry_after = retry_after
+        super().__init__(f"Messaggio duplicato (chiave {key}, stato '{status}'): "
+                         f"invio sospeso per altri {retry_after:.1f} secondi")
@@ -0,0 +1,355 @@
+"""
+Feed file per l'aggiornamento completo di cataloghi molto grandi.
+
+Per milioni di item le chiamate per prodotto o le batch sono lo strumento
+sbagliato: un aggiornamento completo diventa un solo upload di un file di
+feed (CSV, TSV o XML, eventualmente compresso con gzip) associato a un
+``product_feed`` del catalogo. ``write_feed`` genera il file in streaming
+(i prodotti possono arrivare da un generatore, es. una query sul database),
+``FeedUploader`` lo carica e segue la sessione di upload fino al termine,
+riportando conteggi ed errori dell'elaborazione di Meta.
+
+Example:
+    uploader = FeedUploader(manager, feed_name='Catalogo completo')
+    session = uploader.refresh(iter_products_from_db(), '/tmp/catalog.csv.gz')
+    if session['errors']:
+        ...
+"""
+
+import csv
+import gzip
+import io
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+from xml.sax.saxutils import escape
+
+from .config import Config, logger
+from .exceptions import MetaAPIException
+
+
+# Campo del prodotto -> colonna del feed Meta
+FEED_FIELD_MAP = {
+    'retailer_id': 'id',
+    'name': 'title',
+    'description': 'description',
+    'availability': 'availability',
+    'condition': 'condition',
+    'price': 'price',
+    'url': 'link',
+    'image_url': 'image_link',
+    'additional_image_urls': 'additional_image_link',
+    'brand': 'brand',
+    'category': 'product_type',
+    'size': 'size',
+    'color': 'color',
+    'material': 'material',
+    'pattern': 'pattern',
+    'gender': 'gender',
+    'age_group': 'age_group',
+    'inventory': 'quantity_to_sell_on_facebook',
+    'sale_price': 'sale_price',
+    'sale_price_effective_date': 'sale_price_effective_date',
+}
+
+FEED_FORMATS = ('csv', 'tsv', 'xml')
+
+# Campi con importo a cui va aggiunta la valuta ("19.90 EUR")
+_PRICE_FIELDS = ('price', 'sale_price')
+
+_XML_NAMESPACE = 'http://base.google.com/ns/1.0'
+
+
+def feed_format_for_path(path: str) -> str:
+    """
+    Deduce il formato del feed dall'estensione del file (es. catalog.tsv.gz -> 'tsv').
+
+    Raises:
+        ValueError: Se l'estensione non corrisponde a un formato supportato
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    if extension not in FEED_FORMATS:
+        raise ValueError(f"Formato di feed non supportato: '{extension}'. "
+                         f"Valori ammessi: {', '.join(FEED_FORMATS)}")
+    return extension
+
+
+def product_to_feed_row(product: Any) -> Dict[str, str]:
+    """
+    Converte un prodotto nella riga di feed corrispondente.
+
+    Args:
+        product: Dizionario o Product con i dati grezzi (prezzo come importo, es. "19.90")
+
+    Returns:
+        dict: Valori per colonna del feed (solo le colonne valorizzate)
+    """
+    currency = product.get('currency') or Config.DEFAULT_CURRENCY
+    row = {}
+    for field, column in FEED_FIELD_MAP.items():
+        value = product.get(field)
+        if value is None or value == '':
+            continue
+        if field in _PRICE_FIELDS:
+            value = str(value).strip()
+            if not value[-3:].isalpha():
+                value = f"{value} {currency}"
+        elif isinstance(value, (list, tuple)):
+            value = ','.join(str(v) for v in value)
+        row[column] = str(value)
+    return row
+
+
+def write_feed(products: Iterable[Any], output_path: str, feed_format: Optional[str] = None,
+               compress: Optional[bool] = None, columns: Optional[List[str]] = None) -> int:
+    """
+    Scrive un feed file in streaming: in memoria c'è un prodotto alla volta.
+
+    Args:
+        products: Prodotti (dizionari o Product), anche da un generatore
+        output_path: Percorso del file di destinazione
+        feed_format: 'csv', 'tsv' o 'xml' (default: dedotto dall'estensione)
+        compress: Comprime con gzip (default: se il percorso termina con .gz)
+        columns: Colonne del feed CSV/TSV (default: tutte quelle di FEED_FIELD_MAP)
+
+    Returns:
+        int: Numero di prodotti scritti
+    """
+    feed_format = feed_format or feed_format_for_path(output_path)
+    if feed_format not in FEED_FORMATS:
+        raise ValueError(f"Formato di feed non supportato: '{feed_format}'. "
+                         f"Valori ammessi: {', '.join(FEED_FORMATS)}")
+    if compress is None:
+        compress = output_path.endswith('.gz')
+
+    if compress:
+        output = gzip.open(output_path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    else:
+        output = open(output_path, 'w', encoding='utf-8', newline='')
+
+    with output:
+        if feed_format == 'xml':
+            count = _write_xml(products, output)
+        else:
+            count = _write_delimited(products, output, '\t' if feed_format == 'tsv' else ',',
+                                     columns or list(FEED_FIELD_MAP.values()))
+
+    logger.info("Feed %s scritto: %s prodotti in %s", feed_format, count, output_path)
+    return count
+
+
+def _write_delimited(products: Iterable[Any], output: TextIO, delimiter: str, columns: List[str]) -> int:
+    writer = csv.DictWriter(output, fieldnames=columns, delimiter=delimiter, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for product in products:
+        row = product_to_feed_row(product)
+        if delimiter == '\t':
+            # Nel TSV non sono ammessi tab e a capo all'interno dei valori
+            row = {k: ' '.join(v.split()) for k, v in row.items()}
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _write_xml(products: Iterable[Any], output: TextIO) -> int:
+    output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    output.write(f'<rss xmlns:g="{_XML_NAMESPACE}" version="2.0">\n<channel>\n')
+    count = 0
+    for product in products:
+        elements = ''.join(f'<g:{column}>{escape(value)}</g:{column}>'
+                           for column, value in product_to_feed_row(product).items())
+        output.write(f'<item>{elements}</item>\n')
+        count += 1
+    output.write('</channel>\n</rss>\n')
+    return count
+
+
+class MultipartFileBody:
+    """
+    Body multipart/form-data letto dal file a blocchi, con lunghezza nota.
+
+    requests invia così il file in streaming con Content-Length (senza
+    caricarlo in memoria); ``seek(0)`` permette di ripetere l'invio in caso di retry.
+    """
+
+    def __init__(self, file_path: str, fields: Optional[Dict[str, str]] = None,
+                 file_field: str = 'file', content_type: str = 'application/octet-stream'):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.file_path = file_path
+
+        parts = []
+        for name, value in (fields or {}).items():
+            parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                     f'filename="{os.path.basename(file_path)}"\r\nContent-Type: {content_type}\r\n\r\n')
+        self._head = ''.join(parts).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._file_size = os.path.getsize(file_path)
+        self._file: Optional[io.BufferedReader] = None
+        self._position = 0
+
+    def __len__(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation("Solo seek(0) è supportato")
+        self.close()
+        self._position = 0
+        return 0
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self) - self._position
+        chunks = []
+        while size > 0 and self._position < len(self):
+            head_size = len(self._head)
+            if self._position < head_size:
+                chunk = self._head[self._position:self._position + size]
+            elif self._position < head_size + self._file_size:
+                if self._file is None:
+                    self._file = open(self.file_path, 'rb')
+                    self._file.seek(self._position - head_size)
+                chunk = self._file.read(min(size, head_size + self._file_size - self._position))
+                if not chunk:
+                    raise IOError(f"Il file {self.file_path} è stato modificato durante l'upload")
+            else:
+                offset = self._position - head_size - self._file_size
+                chunk = self._tail[offset:offset + size]
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FeedUploader:
+    """Genera e carica feed file tracciando le sessioni di upload."""
+
+    def __init__(self, manager, feed_id: Optional[str] = None,
+                 feed_name: str = 'WhatsApp Catalog Manager feed'):
+        """
+        Args:
+            manager: WhatsAppCatalogManager del catalogo
+            feed_id: ID del product feed da usare (default: cercato per nome o creato)
+            feed_name: Nome del product feed da cercare o creare se feed_id non è indicato
+        """
+        self.manager = manager
+        self.feed_id = feed_id
+        self.feed_name = feed_name
+        # ID sessione -> ultimo stato noto della sessione di upload
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+
+    def ensure_feed(self) -> str:
+        """
+        Restituisce l'ID del product feed, creandolo se non esiste.
+
+        Returns:
+            str: ID del product feed
+        """
+        if self.feed_id:
+            return self.feed_id
+        for feed in self.manager.list_product_feeds().get('data', []):
+            if feed.get('name') == self.feed_name:
+                self.feed_id = feed['id']
+                return self.feed_id
+        self.feed_id = self.manager.create_product_feed(self.feed_name)['id']
+        return self.feed_id
+
+    def upload(self, file_path: str, update_only: bool = False) -> str:
+        """
+        Carica un feed file già generato.
+
+        Args:
+            file_path: Percorso del feed file
+            update_only: Se True aggiorna solo gli item presenti nel file, senza eliminare gli altri
+
+        Returns:
+            str: ID della sessione di upload
+        """
+        result = self.manager.upload_product_feed(self.ensure_feed(), file_path=file_path, update_only=update_only)
+        session_id = result['id']
+        self.sessions[session_id] = {'id': session_id, 'file': file_path, 'status': 'uploaded'}
+        return session_id
+
+    def wait(self, session_id: str, timeout: float = 3600.0, poll_interval: float = 10.0,
+             max_poll_interval: float = 120.0) -> Dict[str, Any]:
+        """
+        Attende la fine dell'elaborazione della sessione di upload.
+
+        Args:
+            session_id: ID della sessione di upload
+            timeout: Attesa massima in secondi
+            poll_interval: Intervallo iniziale tra due interrogazioni
+            max_poll_interval: Intervallo massimo tra due interrogazioni
+
+        Returns:
+            dict: Stato della sessione con conteggi ('num_detected_items', 'num_invalid_items', ...),
+                'status' ('finished' o 'timeout') ed 'errors'
+        """
+        deadline = time.monotonic() + timeout
+        interval = poll_interval
+        while True:
+            session = self.manager.get_feed_upload_session(session_id)
+            if session.get('end_time'):
+                session['status'] = 'finished'
+                session['errors'] = self.manager.get_feed_upload_errors(session_id) \
+                    if session.get('error_count') or session.get('num_invalid_items') else []
+                break
+            if time.monotonic() + interval > deadline:
+                session['status'] = 'timeout'
+                session['errors'] = []
+                logger.warning("Sessione di upload %s non conclusa entro %.0f secondi", session_id, timeout)
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+
+        self.sessions[session_id] = {**self.sessions.get(session_id, {}), **session}
+        logger.info("Sessione di upload %s: %s, %s item rilevati, %s non validi, %s errori", session_id,
+                    session['status'], session.get('num_detected_items'), session.get('num_invalid_items'),
+                    len(session['errors']))
+        return self.sessions[session_id]
+
+    def refresh(self, products: Iterable[Any], file_path: str, update_only: bool = False,
+                wait: bool = True, **wait_options) -> Dict[str, Any]:
+        """
+        Aggiornamento completo: genera il feed file, lo carica e (opzionalmente) attende l'esito.
+
+        Args:
+            products: Prodotti da pubblicare (anche da un generatore)
+            file_path: Percorso del feed file da generare (formato dall'estensione, .gz per comprimere)
+            update_only: Se True non elimina gli item assenti dal file
+            wait: Se True attende la fine dell'elaborazione
+            **wait_options: Parametri passati a wait()
+
+        Returns:
+            dict: Stato della sessione di upload
+        """
+        count = write_feed(products, file_path)
+        session_id = self.upload(file_path, update_only=update_only)
+        self.sessions[session_id]['items_written'] = count
+        if not wait:
+            return self.sessions[session_id]
+        try:
+            return self.wait(session_id, **wait_options)
+        except MetaAPIException as e:
+            logger.error("Errore nel controllo della sessione di upload %s: %s", session_id, e.message)
+            raise
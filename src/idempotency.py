@@ -0,0 +1,293 @@
+"""
+De-duplicazione lato client dell'invio dei messaggi WhatsApp.
+
+Le POST a /messages non vengono ritentate dopo l'invio (vedi retry), ma i
+job che chiamano ``send_product_message`` o ``send_catalog_message`` sì: un
+timeout dopo che Meta ha accettato il messaggio, un worker riavviato o una
+Lambda rieseguita inviano di nuovo lo stesso messaggio al cliente, con il
+relativo costo di messaggistica e di throughput. ``IdempotencyStore``
+assegna a ogni messaggio una chiave e ne ricorda l'esito per ``ttl_seconds``:
+
+- la chiave è quella passata dal chiamante (``idempotency_key``, es. l'ID
+  dell'ordine); solo con ``derive_keys`` (MESSAGE_DEDUP_BY_CONTENT) i
+  messaggi senza chiave usano l'hash di numero mittente, destinatario e
+  contenuto (``message_key``), che blocca anche i ripetuti voluti;
+- prima dell'invio la chiave viene riservata atomicamente: un duplicato di
+  un messaggio già inviato restituisce la risposta originale, un duplicato
+  di un messaggio ancora in invio o con esito incerto solleva
+  ``DuplicateMessageError``, in entrambi i casi senza alcuna chiamata HTTP;
+- se l'invio fallisce e Meta sicuramente non l'ha elaborato (o la richiesta
+  non è mai partita) la chiave viene liberata e il messaggio si può ripetere
+  subito.
+
+Lo store è in memoria (LRU con TTL, thread-safe). Per condividere le chiavi
+tra processi o tra invocazioni della Lambda si aggiunge un backend
+persistente: ``SQLiteIdempotencyBackend`` (libreria standard) oppure una
+classe con l'interfaccia di ``IdempotencyBackend`` (es. Redis o DynamoDB).
+
+Example:
+    store = IdempotencyStore(ttl_seconds=3600, backend=SQLiteIdempotencyBackend('messages.db'))
+    manager = WhatsAppCatalogManager(idempotency_store=store)
+    manager.send_product_message('+39123456789', 'SKU_1', idempotency_key=f'order-{order_id}')
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .config import Config, logger
+from .serialization import dumps, loads
+
+
+# Stati di una chiave: in invio, inviato (con risposta) ed esito incerto
+PENDING = 'pending'
+SENT = 'sent'
+UNKNOWN = 'unknown'
+
+# Durata di una prenotazione mai conclusa (es. processo terminato durante l'invio)
+DEFAULT_PENDING_SECONDS = 120.0
+
+Record = Dict[str, Any]
+
+
+def message_key(phone_number_id: str, message_data: Dict[str, Any]) -> str:
+    """
+    Deriva la chiave di idempotenza di un messaggio dal suo contenuto.
+
+    Args:
+        phone_number_id: ID del numero WhatsApp mittente
+        message_data: Body della richiesta a /messages (destinatario incluso)
+
+    Returns:
+        str: Chiave 'msg:' seguita dallo SHA-256 del contenuto normalizzato
+    """
+    canonical = json.dumps([phone_number_id, message_data], sort_keys=True, separators=(',', ':'),
+                           ensure_ascii=False)
+    return 'msg:' + hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _record(status: str, seconds: float, response: Optional[Dict[str, Any]] = None) -> Record:
+    # Orologio di sistema: la scadenza deve valere anche per altri processi
+    return {'status': status, 'response': response, 'expires_at': time.time() + seconds}
+
+
+class IdempotencyBackend(ABC):
+    """Interfaccia dei backend persistenti di IdempotencyStore."""
+
+    @abstractmethod
+    def reserve(self, key: str, record: Record) -> Optional[Record]:
+        """
+        Salva il record se la chiave non esiste o è scaduta, in modo atomico.
+
+        Args:
+            key: Chiave di idempotenza
+            record: Record 'pending' da salvare
+
+        Returns:
+            dict: Record valido già presente, o None se la chiave è stata riservata
+        """
+
+    @abstractmethod
+    def put(self, key: str, record: Record) -> None:
+        """Salva (o sostituisce) il record della chiave."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Rimuove la chiave."""
+
+    def close(self) -> None:
+        """Rilascia le risorse del backend (connessioni, file)."""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    response BLOB,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys(expires_at);
+"""
+
+
+class SQLiteIdempotencyBackend(IdempotencyBackend):
+    """Backend persistente su SQLite, condivisibile tra processi sullo stesso host."""
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        """
+        Args:
+            path: File del database SQLite
+            purge_every: Prenotazioni tra due pulizie delle chiavi scadute
+        """
+        self.path = path
+        self.purge_every = purge_every
+        self._reservations = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    def reserve(self, key: str, record: Record) -> Optional[Record]:
+        with self._lock, self._conn:
+            # Un solo statement: la prenotazione è atomica anche tra processi diversi
+            cursor = self._conn.execute(
+                "INSERT INTO idempotency_keys (key, status, response, expires_at) VALUES (?, ?, NULL, ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = excluded.status, response = NULL, "
+                "expires_at = excluded.expires_at WHERE idempotency_keys.expires_at <= ?",
+                (key, record['status'], record['expires_at'], time.time()),
+            )
+            if cursor.rowcount:
+                self._reservations += 1
+                if self._reservations % self.purge_every == 0:
+                    self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+                return None
+            row = self._conn.execute("SELECT status, response, expires_at FROM idempotency_keys WHERE key = ?",
+                                     (key,)).fetchone()
+        if row is None:
+            return self.reserve(key, record)
+        return {'status': row[0], 'response': loads(row[1]) if row[1] is not None else None,
+                'expires_at': row[2]}
+
+    def put(self, key: str, record: Record) -> None:
+        response = dumps(record['response']) if record['response'] is not None else None
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO idempotency_keys (key, status, response, expires_at) "
+                               "VALUES (?, ?, ?, ?)", (key, record['status'], response, record['expires_at']))
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        """Chiude il database."""
+        with self._lock:
+            self._conn.close()
+
+
+class IdempotencyStore:
+    """Chiavi di idempotenza dei messaggi in memoria (LRU con TTL), con backend persistente opzionale."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, pending_seconds: float = DEFAULT_PENDING_SECONDS,
+                 max_size: int = 100000, backend: Optional[IdempotencyBackend] = None,
+                 derive_keys: Optional[bool] = None):
+        """
+        Args:
+            ttl_seconds: Per quanto tempo un messaggio inviato (o con esito incerto) blocca i
+                duplicati (default: MESSAGE_DEDUP_TTL)
+            pending_seconds: Durata massima di una prenotazione senza esito
+            max_size: Numero massimo di chiavi in memoria (le meno usate vengono rimosse)
+            backend: Backend persistente condiviso (default: solo memoria)
+            derive_keys: Se de-duplicare anche i messaggi senza idempotency_key, con la chiave
+                derivata dal contenuto (default: MESSAGE_DEDUP_BY_CONTENT)
+        """
+        self.ttl_seconds = Config.MESSAGE_DEDUP_TTL if ttl_seconds is None else ttl_seconds
+        self.pending_seconds = pending_seconds
+        self.max_size = max_size
+        self.backend = backend
+        self.derive_keys = Config.MESSAGE_DEDUP_BY_CONTENT if derive_keys is None else derive_keys
+        self._records: 'OrderedDict[str, Record]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def _store(self, key: str, record: Record) -> None:
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+
+    def reserve(self, key: str) -> Optional[Record]:
+        """
+        Riserva la chiave prima dell'invio.
+
+        Args:
+            key: Chiave di idempotenza
+
+        Returns:
+            dict: Record del messaggio duplicato ('status', 'response', 'expires_at'),
+                o None se la chiave è stata riservata e il messaggio va inviato
+        """
+        pending = _record(PENDING, self.pending_seconds)
+        with self._lock:
+            existing = self._records.get(key)
+            if existing is not None and existing['expires_at'] > time.time():
+                self._records.move_to_end(key)
+                self.suppressed += 1
+                return existing
+            if self.backend is None:
+                self._store(key, pending)
+                return None
+
+        existing = self.backend.reserve(key, pending)
+        with self._lock:
+            if existing is None:
+                self._store(key, pending)
+            else:
+                self.suppressed += 1
+                # Una prenotazione di un altro processo non va in memoria: il suo esito arriva dal backend
+                if existing['status'] != PENDING:
+                    self._store(key, existing)
+        return existing
+
+    def _finish(self, key: str, record: Record) -> None:
+        with self._lock:
+            self._store(key, record)
+        if self.backend is not None:
+            self.backend.put(key, record)
+
+    def complete(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Registra l'invio riuscito: i duplicati riceveranno questa risposta.
+
+        Args:
+            key: Chiave riservata
+            response: Risposta dell'API WhatsApp
+        """
+        self._finish(key, _record(SENT, self.ttl_seconds, response))
+
+    def mark_unknown(self, key: str) -> None:
+        """
+        Registra un invio con esito incerto: i duplicati vengono bloccati per ttl_seconds.
+
+        Args:
+            key: Chiave riservata
+        """
+        logger.warning("Esito incerto per il messaggio %s: i duplicati saranno bloccati per %.0f secondi",
+                       key, self.ttl_seconds)
+        self._finish(key, _record(UNKNOWN, self.ttl_seconds))
+
+    def release(self, key: str) -> None:
+        """
+        Libera la chiave di un invio fallito senza effetti, così il messaggio si può ripetere.
+
+        Args:
+            key: Chiave riservata
+        """
+        with self._lock:
+            self._records.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def close(self) -> None:
+        """Chiude il backend persistente (le chiavi in memoria restano valide)."""
+        if self.backend is not None:
+            self.backend.close()
+
+
+def create_idempotency_store() -> Optional[IdempotencyStore]:
+    """
+    Crea lo store di idempotenza configurato.
+
+    Returns:
+        IdempotencyStore: Store in memoria, su MESSAGE_DEDUP_DB se impostato,
+            oppure None se la de-duplicazione è disattivata (MESSAGE_DEDUP_TTL = 0)
+    """
+    if Config.MESSAGE_DEDUP_TTL <= 0:
+        return None
+    backend = SQLiteIdempotencyBackend(Config.MESSAGE_DEDUP_DB) if Config.MESSAGE_DEDUP_DB else None
+    return IdempotencyStore(backend=backend)
@@ -0,0 +1,418 @@
+"""
+Elaborazione e ri-pubblicazione delle immagini dei prodotti.
+
+Molte immagini dei fornitori sono PNG enormi che Meta scarica lentamente o
+rifiuta. ``ImagePipeline`` scarica le immagini, le ridimensiona e le
+ricomprime con Pillow in un pool di processi (il lavoro è CPU-bound) entro
+``MAX_IMAGE_SIZE_MB`` e nei formati di ``SUPPORTED_IMAGE_FORMATS``, le salva
+in uno store (directory locale o bucket S3-compatibile) e riscrive
+``image_url``/``additional_image_urls`` dei prodotti. Le immagini sono
+indicizzate per hash SHA-256 del contenuto originale: un'immagine già
+elaborata non viene né ricompressa né ricaricata.
+
+Example:
+    store = LocalDirectoryStore('/var/www/images', base_url='https://cdn.example.com/images')
+    with ImagePipeline(store) as pipeline:
+        products, failures = pipeline.process_products(products)
+    manager.batch_add_products(products)
+"""
+
+import hashlib
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .config import Config, logger
+from .image_preflight import product_image_urls
+
+
+# Formato Pillow e Content-Type per ogni formato di output supportato
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+# Qualità minima prima di ridurre ulteriormente le dimensioni dell'immagine
+MIN_QUALITY = 50
+
+
+class ImageStore(ABC):
+    """Interfaccia degli store in cui pubblicare le immagini elaborate."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """True se l'oggetto ``key`` è già presente nello store."""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        """
+        Salva un'immagine nello store.
+
+        Args:
+            key: Nome dell'oggetto (hash del contenuto ed estensione)
+            data: Contenuto dell'immagine
+            content_type: Content-Type dell'immagine
+
+        Returns:
+            str: URL pubblico dell'immagine
+        """
+
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        """URL pubblico dell'oggetto ``key``."""
+
+
+class LocalDirectoryStore(ImageStore):
+    """Store su directory locale servita da un web server o CDN."""
+
+    def __init__(self, directory: str, base_url: str):
+        """
+        Args:
+            directory: Directory in cui salvare le immagini (creata se non esiste)
+            base_url: URL pubblico corrispondente alla directory
+        """
+        self.directory = directory
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(directory, exist_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self.directory, key))
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = os.path.join(self.directory, key)
+        # Scrittura atomica: un lettore non vede mai un file parziale
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as output:
+            output.write(data)
+        os.replace(temp_path, path)
+        return self.url_for(key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class S3Store(ImageStore):
+    """Store su bucket S3 o compatibile (MinIO, R2, ...). Richiede boto3 se non si passa un client."""
+
+    def __init__(self, bucket: str, base_url: Optional[str] = None, prefix: str = '',
+                 client: Any = None, **client_options):
+        """
+        Args:
+            bucket: Nome del bucket
+            base_url: URL pubblico del bucket (default: https://<bucket>.s3.amazonaws.com)
+            prefix: Prefisso delle chiavi degli oggetti
+            client: Client S3 già configurato (default: boto3.client('s3', **client_options))
+            **client_options: Opzioni del client boto3 (es. endpoint_url, region_name)
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("boto3 è richiesto per S3Store: pip install boto3") from None
+            client = boto3.client('s3', **client_options)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.base_url = (base_url or f"https://{bucket}.s3.amazonaws.com").rstrip('/')
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data,
+                               ContentType=content_type, CacheControl='public, max-age=31536000, immutable')
+        return self.url_for(key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{self._object_key(key)}"
+
+
+def process_image(data: bytes, output_format: str = 'jpeg', max_bytes: int = 8 * 1024 * 1024,
+                  max_dimension: int = 2048, quality: int = 85,
+                  supported_formats: Tuple[str, ...] = ('jpg', 'jpeg', 'png', 'webp')) -> Tuple[bytes, str]:
+    """
+    Ridimensiona e ricomprime un'immagine entro i limiti indicati.
+
+    Le immagini già in un formato supportato, entro ``max_bytes`` e
+    ``max_dimension``, vengono restituite senza modifiche. Eseguita nei
+    processi worker, quindi deve restare una funzione di modulo.
+
+    Args:
+        data: Contenuto dell'immagine originale
+        output_format: Formato di output per le immagini da ricomprimere
+        max_bytes: Dimensione massima del risultato in byte
+        max_dimension: Lato massimo in pixel
+        quality: Qualità iniziale di compressione (JPEG/WebP)
+        supported_formats: Formati che possono essere mantenuti così come sono
+
+    Returns:
+        tuple: (contenuto elaborato, Content-Type)
+
+    Raises:
+        ValueError: Se il contenuto non è un'immagine o non rientra nei limiti
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = (image.format or '').lower()
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Immagine non leggibile: {e}") from None
+
+    if (source_format in supported_formats and len(data) <= max_bytes
+            and max(image.size) <= max_dimension):
+        return data, OUTPUT_FORMATS[source_format][1]
+
+    pil_format, content_type = OUTPUT_FORMATS[output_format]
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Il JPEG non ha trasparenza: le aree trasparenti diventano bianche
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+
+    while True:
+        buffer = io.BytesIO()
+        if pil_format == 'PNG':
+            image.save(buffer, format=pil_format, optimize=True)
+        else:
+            image.save(buffer, format=pil_format, quality=quality, optimize=True)
+        if buffer.tell() <= max_bytes:
+            return buffer.getvalue(), content_type
+
+        if pil_format != 'PNG' and quality > MIN_QUALITY:
+            quality = max(quality - 10, MIN_QUALITY)
+        elif min(image.size) > 64:
+            image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.LANCZOS)
+        else:
+            raise ValueError("Impossibile ridurre l'immagine entro la dimensione massima")
+
+
+class ImagePipeline:
+    """Scarica, elabora in un pool di processi e ri-pubblica le immagini dei prodotti."""
+
+    def __init__(self, store: ImageStore, session: Optional[requests.Session] = None,
+                 max_workers: Optional[int] = None, download_workers: int = 8,
+                 output_format: str = 'jpeg', max_dimension: int = 2048, quality: int = 85,
+                 max_size_mb: Optional[float] = None, max_download_mb: float = 50.0,
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            store: Store in cui pubblicare le immagini elaborate
+            session: Sessione HTTP per il download (default: una nuova sessione)
+            max_workers: Processi per l'elaborazione (default: numero di CPU)
+            download_workers: Download in parallelo
+            output_format: Formato delle immagini ricompresse (tra SUPPORTED_IMAGE_FORMATS)
+            max_dimension: Lato massimo in pixel
+            quality: Qualità iniziale di compressione
+            max_size_mb: Dimensione massima del risultato (default: MAX_IMAGE_SIZE_MB)
+            max_download_mb: Dimensione massima di un'immagine sorgente
+            timeout: Timeout del download in secondi (default: REQUEST_TIMEOUT)
+
+        Raises:
+            ValueError: Se output_format non è supportato
+        """
+        output_format = output_format.lower()
+        if output_format not in OUTPUT_FORMATS or output_format not in Config.SUPPORTED_IMAGE_FORMATS:
+            raise ValueError(f"Formato di output non supportato: {output_format}. "
+                             f"Valori ammessi: {', '.join(Config.SUPPORTED_IMAGE_FORMATS)}")
+        self.store = store
+        self.session = session or requests.Session()
+        self.max_workers = max_workers
+        self.download_workers = download_workers
+        self.output_format = output_format
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.max_bytes = int((Config.MAX_IMAGE_SIZE_MB if max_size_mb is None else max_size_mb) * 1024 * 1024)
+        self.max_download_bytes = int(max_download_mb * 1024 * 1024)
+        self.timeout = timeout or Config.REQUEST_TIMEOUT
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # URL sorgente -> URL pubblicato, e hash del contenuto -> URL pubblicato
+        self._published: Dict[str, str] = {}
+        self._by_digest: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def process_products(self, products: List[Any]) -> Tuple[List[Any], Dict[str, str]]:
+        """
+        Elabora le immagini dei prodotti e ne riscrive gli URL.
+
+        Le immagini che non è possibile scaricare o elaborare mantengono
+        l'URL originale e vengono riportate tra gli errori.
+
+        Args:
+            products: Lista di dizionari o Product
+
+        Returns:
+            tuple: (prodotti con gli URL riscritti, errori per URL sorgente)
+        """
+        urls = list(dict.fromkeys(url for product in products for url in product_image_urls(product)))
+        mapping, failures = self.process_urls(urls)
+        return [self._rewrite(product, mapping) for product in products], failures
+
+    def process_urls(self, urls: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Elabora e pubblica un insieme di immagini.
+
+        Args:
+            urls: URL sorgente delle immagini
+
+        Returns:
+            tuple: (URL pubblicato per ogni URL sorgente elaborato, errori per URL sorgente)
+        """
+        mapping: Dict[str, str] = {}
+        failures: Dict[str, str] = {}
+        store_prefix = self.store.url_for('')
+
+        to_download = []
+        for url in dict.fromkeys(urls):
+            if url.startswith(store_prefix):
+                continue  # già pubblicata dalla pipeline
+            with self._lock:
+                published = self._published.get(url)
+            if published is not None:
+                mapping[url] = published
+            else:
+                to_download.append(url)
+        if not to_download:
+            return mapping, failures
+
+        # Download concorrente (I/O) e raggruppamento per contenuto
+        by_digest: Dict[str, List[str]] = {}
+        sources: Dict[str, bytes] = {}
+        with ThreadPoolExecutor(max_workers=min(self.download_workers, len(to_download))) as downloader:
+            for url, outcome in zip(to_download, downloader.map(self._download, to_download)):
+                if isinstance(outcome, Exception):
+                    failures[url] = str(outcome)
+                    continue
+                digest = hashlib.sha256(outcome).hexdigest()
+                by_digest.setdefault(digest, []).append(url)
+                sources.setdefault(digest, outcome)
+
+        # Elaborazione (CPU) solo per i contenuti mai pubblicati
+        pending = {}
+        for digest in by_digest:
+            with self._lock:
+                published = self._by_digest.get(digest)
+            if published is None:
+                existing = self._existing_key(digest)
+                if existing is not None:
+                    published = self.store.url_for(existing)
+            if published is not None:
+                self._remember(digest, by_digest[digest], published, mapping)
+            else:
+                pending[digest] = self._get_executor().submit(
+                    process_image, sources[digest], self.output_format, self.max_bytes,
+                    self.max_dimension, self.quality, tuple(Config.SUPPORTED_IMAGE_FORMATS))
+
+        processed = 0
+        for digest, future in pending.items():
+            try:
+                data, content_type = future.result()
+                key = f"{digest}.{_extension(content_type)}"
+                published = self.store.put(key, data, content_type)
+            except Exception as e:
+                for url in by_digest[digest]:
+                    failures[url] = str(e)
+                continue
+            self._remember(digest, by_digest[digest], published, mapping)
+            processed += 1
+
+        logger.info("Pipeline immagini: %s URL pubblicati (%s immagini elaborate), %s errori",
+                    len(mapping), processed, len(failures))
+        return mapping, failures
+
+    def _existing_key(self, digest: str) -> Optional[str]:
+        """Chiave dello store già occupata da questo contenuto (elaborato in un'esecuzione precedente)."""
+        for extension in dict.fromkeys(_extension(content_type) for _, content_type in OUTPUT_FORMATS.values()):
+            key = f"{digest}.{extension}"
+            if self.store.exists(key):
+                return key
+        return None
+
+    def _remember(self, digest: str, urls: List[str], published: str, mapping: Dict[str, str]) -> None:
+        with self._lock:
+            self._by_digest[digest] = published
+            for url in urls:
+                self._published[url] = published
+                mapping[url] = published
+
+    def _download(self, url: str):
+        """Scarica un'immagine. Restituisce il contenuto o l'eccezione (per non interrompere il map)."""
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                chunks, size = [], 0
+                for chunk in response.iter_content(chunk_size=65536):
+                    size += len(chunk)
+                    if size > self.max_download_bytes:
+                        raise ValueError(f"Immagine sorgente oltre {self.max_download_bytes // (1024 * 1024)} MB")
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Download dell'immagine %s fallito: %s", url, e)
+            return e
+
+    @staticmethod
+    def _rewrite(product: Any, mapping: Dict[str, str]) -> Any:
+        image_url = product.get('image_url')
+        additional = product.get('additional_image_urls')
+        changes = {}
+        if image_url in mapping:
+            changes['image_url'] = mapping[image_url]
+        if isinstance(additional, list) and any(url in mapping for url in additional):
+            changes['additional_image_urls'] = [mapping.get(url, url) for url in additional]
+        elif isinstance(additional, str) and additional:
+            rewritten = ','.join(mapping.get(u.strip(), u.strip()) for u in additional.split(','))
+            if rewritten != additional:
+                changes['additional_image_urls'] = rewritten
+        if not changes:
+            return product
+        if isinstance(product, dict):
+            return {**product, **changes}
+        return type(product).from_dict({**product.to_dict(), **changes})
+
+    def close(self) -> None:
+        """Termina il pool di processi."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> 'ImagePipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def _extension(content_type: str) -> str:
+    return 'jpg' if content_type == 'image/jpeg' else content_type.split('/')[-1]
@@ -0,0 +1,245 @@
+"""
+Verifica preventiva delle immagini dei prodotti.
+
+Meta scarica le immagini in modo asincrono e segnala quelle non valide solo
+ore dopo l'inserimento. ``ImagePreflight`` controlla ``image_url`` e
+``additional_image_urls`` prima dell'invio, con richieste HEAD concorrenti
+(o GET di un solo byte se il server non supporta HEAD), applicando
+``MAX_IMAGE_SIZE_MB`` e ``SUPPORTED_IMAGE_FORMATS``. I risultati vengono
+memorizzati per URL con un TTL, così le immagini condivise da più prodotti
+o ricontrollate a ogni sincronizzazione costano una sola richiesta.
+
+Example:
+    preflight = ImagePreflight(max_workers=16)
+    accepted, rejected = preflight.filter_products(products)
+    manager.batch_add_products(accepted)
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import Config, logger
+
+
+# Content-Type accettati per ogni formato di SUPPORTED_IMAGE_FORMATS
+CONTENT_TYPE_FORMATS = {
+    'image/jpeg': 'jpeg',
+    'image/jpg': 'jpg',
+    'image/pjpeg': 'jpeg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
+# Status che indicano un server che non implementa HEAD correttamente
+HEAD_UNSUPPORTED_STATUSES = frozenset({403, 405, 501})
+
+_CONTENT_RANGE_TOTAL = re.compile(r'/(\d+)\s*$')
+
+
+class ImagePreflight:
+    """Controlla formato e dimensione delle immagini remote con una cache per URL."""
+
+    def __init__(self, session: Optional[requests.Session] = None, max_workers: int = 16,
+                 cache_ttl: float = 3600.0, error_ttl: float = 60.0,
+                 max_size_mb: Optional[float] = None, supported_formats: Optional[Iterable[str]] = None,
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            session: Sessione HTTP da usare (default: una sessione dedicata con max_workers connessioni)
+            max_workers: Numero massimo di controlli in parallelo
+            cache_ttl: Secondi di validità di un risultato in cache
+            error_ttl: Secondi di validità in cache degli errori di rete (di solito transitori)
+            max_size_mb: Dimensione massima dell'immagine (default: MAX_IMAGE_SIZE_MB)
+            supported_formats: Formati accettati (default: SUPPORTED_IMAGE_FORMATS)
+            timeout: Timeout di ogni controllo in secondi (default: REQUEST_TIMEOUT)
+        """
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.max_workers = max_workers
+        self.cache_ttl = cache_ttl
+        self.error_ttl = error_ttl
+        self.max_size_bytes = (Config.MAX_IMAGE_SIZE_MB if max_size_mb is None else max_size_mb) * 1024 * 1024
+        self.supported_formats = frozenset(f.lower() for f in (supported_formats or Config.SUPPORTED_IMAGE_FORMATS))
+        self.timeout = timeout or Config.REQUEST_TIMEOUT
+
+        # url -> (risultato, istante di scadenza)
+        self._cache: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def check_url(self, url: str) -> Dict[str, Any]:
+        """
+        Controlla una singola immagine (usando la cache se possibile).
+
+        Args:
+            url: URL dell'immagine
+
+        Returns:
+            dict: Risultato con 'url', 'valid', 'content_type', 'size' ed eventualmente 'error'
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached is not None and cached[1] > now:
+                self.cache_hits += 1
+                return cached[0]
+            self.cache_misses += 1
+
+        result, transient = self._probe(url)
+        ttl = self.error_ttl if transient else self.cache_ttl
+        with self._lock:
+            self._cache[url] = (result, time.monotonic() + ttl)
+        return result
+
+    def check_urls(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Controlla più immagini in parallelo (gli URL duplicati vengono controllati una volta).
+
+        Args:
+            urls: URL delle immagini
+
+        Returns:
+            dict: Risultato del controllo per ogni URL
+        """
+        unique = list(dict.fromkeys(urls))
+        if len(unique) <= 1:
+            return {url: self.check_url(url) for url in unique}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique))) as executor:
+            return dict(zip(unique, executor.map(self.check_url, unique)))
+
+    def filter_products(self, products: List[Any]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Separa i prodotti con immagini valide da quelli da scartare.
+
+        Args:
+            products: Lista di dizionari o Product
+
+        Returns:
+            tuple: (prodotti accettati, risultati dei prodotti scartati nel formato di
+                batch_add_products con 'success', 'retailer_id' ed 'error')
+        """
+        accepted, rejected = self.filter_product_indices(products)
+        return [products[index] for index in accepted], rejected
+
+    def filter_product_indices(self, products: List[Any]) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """
+        Come filter_products, ma restituisce le posizioni dei prodotti accettati.
+
+        Args:
+            products: Lista di dizionari o Product
+
+        Returns:
+            tuple: (indici in products dei prodotti accettati, risultati dei prodotti scartati)
+        """
+        urls_by_product = [product_image_urls(product) for product in products]
+        results = self.check_urls(url for urls in urls_by_product for url in urls)
+
+        accepted, rejected = [], []
+        for index, (product, urls) in enumerate(zip(products, urls_by_product)):
+            errors = [f"{url}: {results[url]['error']}" for url in urls if not results[url]['valid']]
+            if errors:
+                rejected.append({
+                    'success': False,
+                    'retailer_id': product.get('retailer_id'),
+                    'error': f"Immagini non valide: {'; '.join(errors)}",
+                })
+            else:
+                accepted.append(index)
+
+        if rejected:
+            logger.warning("Pre-flight immagini: %s/%s prodotti scartati", len(rejected), len(products))
+        return accepted, rejected
+
+    def clear_cache(self) -> None:
+        """Svuota la cache dei risultati."""
+        with self._lock:
+            self._cache.clear()
+
+    def _probe(self, url: str) -> Tuple[Dict[str, Any], bool]:
+        """Esegue il controllo remoto. Restituisce (risultato, errore transitorio)."""
+        if urlparse(url).scheme not in ('http', 'https'):
+            return self._result(url, error="URL non valido (schema http/https richiesto)"), False
+
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            size = _content_length(response)
+            if response.status_code in HEAD_UNSUPPORTED_STATUSES or (response.ok and size is None):
+                # Alcuni CDN non supportano HEAD o non indicano la dimensione: basta il primo byte
+                response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True,
+                                            allow_redirects=True, timeout=self.timeout)
+                response.close()
+                size = _content_range_total(response) if response.status_code == 206 else _content_length(response)
+        except requests.RequestException as e:
+            return self._result(url, error=f"Immagine non raggiungibile: {e}"), True
+
+        if not response.ok:
+            transient = response.status_code == 429 or response.status_code >= 500
+            return self._result(url, error=f"Immagine non disponibile: HTTP {response.status_code}"), transient
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        image_format = CONTENT_TYPE_FORMATS.get(content_type)
+        if image_format is None and content_type in ('', 'application/octet-stream', 'binary/octet-stream'):
+            # Storage che non impostano il Content-Type: si usa l'estensione del file
+            image_format = urlparse(url).path.rsplit('.', 1)[-1].lower() if '.' in urlparse(url).path else None
+
+        if image_format not in self.supported_formats:
+            return self._result(url, content_type, size,
+                                f"Formato non supportato: {content_type or 'sconosciuto'}"), False
+        if size is not None and size > self.max_size_bytes:
+            return self._result(url, content_type, size,
+                                f"Immagine troppo grande: {size / (1024 * 1024):.1f} MB "
+                                f"(max {self.max_size_bytes / (1024 * 1024):g} MB)"), False
+        return self._result(url, content_type, size), False
+
+    @staticmethod
+    def _result(url: str, content_type: Optional[str] = None, size: Optional[int] = None,
+                error: Optional[str] = None) -> Dict[str, Any]:
+        result = {'url': url, 'valid': error is None, 'content_type': content_type, 'size': size}
+        if error:
+            result['error'] = error
+        return result
+
+
+def product_image_urls(product: Any) -> List[str]:
+    """
+    Restituisce gli URL delle immagini di un prodotto (principale e aggiuntive).
+
+    Args:
+        product: Dizionario o Product
+
+    Returns:
+        list: URL delle immagini, senza duplicati
+    """
+    urls = []
+    if product.get('image_url'):
+        urls.append(product.get('image_url'))
+    additional = product.get('additional_image_urls') or []
+    if isinstance(additional, str):
+        additional = [u.strip() for u in additional.split(',')]
+    urls.extend(u for u in additional if u)
+    return list(dict.fromkeys(urls))
+
+
+def _content_length(response: requests.Response) -> Optional[int]:
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def _content_range_total(response: requests.Response) -> Optional[int]:
+    match = _CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
@@ -0,0 +1,59 @@
+"""
+Corsia veloce per gli aggiornamenti di giacenza ad alta frequenza.
+
+Il magazzino emette variazioni di stock ogni pochi secondi; inviarle una per
+una con ``update_product`` consuma una chiamata (e quota di rate limit) per
+variazione. ``InventoryUpdater`` accumula gli aggiornamenti per
+``retailer_id`` in una finestra temporale, tenendo solo l'ultimo valore
+(last write wins), e li invia come poche operazioni ``items_batch``
+compatte contenenti solo ``inventory`` (ed eventualmente ``availability``).
+
+Example:
+    with InventoryUpdater(manager, window_seconds=2.0) as updater:
+        for event in warehouse_events():
+            updater.update(event.sku, event.quantity)
+"""
+
+from typing import Optional
+
+from .whatsapp_catalog_manager import ITEMS_BATCH_MAX_SIZE, WhatsAppCatalogManager
+from .write_behind import WriteBehindBuffer
+
+
+class InventoryUpdater(WriteBehindBuffer):
+    """Accumula e invia in batch gli aggiornamenti di giacenza."""
+
+    metrics_prefix = 'inventory'
+
+    def __init__(self, manager: WhatsAppCatalogManager, window_seconds: float = 2.0,
+                 max_batch_size: int = ITEMS_BATCH_MAX_SIZE):
+        """
+        Args:
+            manager: Manager usato per inviare le batch
+            window_seconds: Ritardo massimo di un aggiornamento prima del flush automatico
+            max_batch_size: Flush anticipato quando gli item in attesa raggiungono questa soglia
+        """
+        super().__init__(manager, max_items=min(max_batch_size, ITEMS_BATCH_MAX_SIZE),
+                         max_age_seconds=window_seconds)
+
+    @property
+    def window_seconds(self) -> float:
+        return self.max_age_seconds
+
+    @property
+    def max_batch_size(self) -> int:
+        return self.max_items
+
+    def update(self, retailer_id: str, quantity: int, availability: Optional[str] = None) -> None:
+        """
+        Registra una variazione di giacenza; sostituisce quella in attesa per lo stesso prodotto.
+
+        Args:
+            retailer_id: ID univoco del prodotto
+            quantity: Nuova quantità disponibile
+            availability: Nuovo stato di disponibilità (opzionale, es. 'out of stock')
+        """
+        patch = {'inventory': int(quantity)}
+        if availability:
+            patch['availability'] = availability
+        self.put(retailer_id, patch)
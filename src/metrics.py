@@ -0,0 +1,291 @@
+"""
+Strumentazione delle chiamate API: hook per metriche e tracing.
+
+Il manager notifica a un ``MetricsHook`` le durate delle fasi di ogni
+richiesta (connessione TCP, handshake TLS, attesa del server), l'attesa
+del rate limiter, il tempo di validazione, i retry, i byte trasferiti e gli
+status code. Il default ``NoOpMetrics`` non registra nulla;
+``InMemoryMetrics`` mantiene istogrammi e contatori in memoria e
+``to_prometheus_text`` li esporta nel formato testuale di Prometheus.
+
+Example:
+    metrics = InMemoryMetrics()
+    manager = WhatsAppCatalogManager(metrics=metrics)
+    ...
+    print(to_prometheus_text(metrics))
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .dns_cache import DEFAULT_DNS_CACHE
+
+
+# Bucket di default per gli istogrammi di durata (secondi)
+DEFAULT_SECONDS_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# Bucket di default per gli istogrammi di dimensione (byte)
+DEFAULT_BYTES_BUCKETS: Tuple[float, ...] = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsHook:
+    """
+    Interfaccia degli hook di strumentazione.
+
+    L'implementazione di base non fa nulla: le sottoclassi ridefiniscono
+    solo i metodi che interessano.
+    """
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Registra un'osservazione (durata, dimensione) per l'istogramma ``name``."""
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Incrementa il contatore ``name``."""
+
+
+class NoOpMetrics(MetricsHook):
+    """Hook di default: nessuna metrica registrata."""
+
+
+NOOP_METRICS = NoOpMetrics()
+
+
+class _Histogram:
+    """Istogramma cumulativo a bucket fissi."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Stima il quantile ``q`` come limite superiore del bucket che lo contiene."""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+
+class InMemoryMetrics(MetricsHook):
+    """
+    Collector thread-safe che mantiene istogrammi e contatori in memoria.
+
+    Gli istogrammi il cui nome termina con ``_bytes`` usano bucket di
+    dimensione, tutti gli altri bucket di durata in secondi.
+    """
+
+    def __init__(self, seconds_buckets: Tuple[float, ...] = DEFAULT_SECONDS_BUCKETS,
+                 bytes_buckets: Tuple[float, ...] = DEFAULT_BYTES_BUCKETS):
+        self.seconds_buckets = tuple(sorted(seconds_buckets))
+        self.bytes_buckets = tuple(sorted(bytes_buckets))
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                bounds = self.bytes_buckets if name.endswith('_bytes') else self.seconds_buckets
+                histogram = series[key] = _Histogram(bounds)
+            histogram.add(value)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Valore corrente di un contatore (0 se mai incrementato)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Riepilogo per istogramma (aggregato su tutte le label).
+
+        Returns:
+            dict: ``{nome: {'count', 'sum', 'avg', 'p50', 'p95', 'p99'}}``
+        """
+        result = {}
+        with self._lock:
+            for name, series in self._histograms.items():
+                merged = None
+                for histogram in series.values():
+                    if merged is None:
+                        merged = _Histogram(histogram.bounds)
+                    merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                    merged.sum += histogram.sum
+                    merged.count += histogram.count
+                if merged is None or not merged.count:
+                    continue
+                result[name] = {
+                    'count': merged.count,
+                    'sum': merged.sum,
+                    'avg': merged.sum / merged.count,
+                    'p50': merged.quantile(0.50),
+                    'p95': merged.quantile(0.95),
+                    'p99': merged.quantile(0.99),
+                }
+        return result
+
+    def reset(self) -> None:
+        """Azzera tutte le metriche raccolte."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+
+def to_prometheus_text(metrics: InMemoryMetrics, prefix: str = 'whatsapp_catalog_') -> str:
+    """
+    Esporta le metriche nel formato testuale di Prometheus (exposition format 0.0.4).
+
+    Args:
+        metrics: Collector da esportare
+        prefix: Prefisso applicato al nome di ogni metrica
+
+    Returns:
+        str: Testo pronto per essere servito su un endpoint ``/metrics``
+    """
+    lines: List[str] = []
+    with metrics._lock:
+        for name, series in sorted(metrics._histograms.items()):
+            full_name = prefix + name
+            lines.append(f'# TYPE {full_name} histogram')
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{full_name}_bucket{_format_labels(key, ("le", repr(float(bound))))} {cumulative}')
+                lines.append(f'{full_name}_bucket{_format_labels(key, ("le", "+Inf"))} {histogram.count}')
+                lines.append(f'{full_name}_sum{_format_labels(key)} {histogram.sum}')
+                lines.append(f'{full_name}_count{_format_labels(key)} {histogram.count}')
+        for name, series in sorted(metrics._counters.items()):
+            full_name = prefix + name
+            lines.append(f'# TYPE {full_name} counter')
+            for key, value in sorted(series.items()):
+                lines.append(f'{full_name}_total{_format_labels(key)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Tempi di connessione a livello urllib3
+# ---------------------------------------------------------------------------
+
+_phase_timings = threading.local()
+
+
+def start_phase_capture() -> None:
+    """Inizia a raccogliere i tempi di connessione per la richiesta del thread corrente."""
+    _phase_timings.values = {}
+
+
+def collect_phase_timings() -> Dict[str, float]:
+    """Restituisce (e azzera) i tempi di connessione raccolti nel thread corrente."""
+    values = getattr(_phase_timings, 'values', None) or {}
+    _phase_timings.values = None
+    return values
+
+
+def _record_phase(name: str, value: float) -> None:
+    values = getattr(_phase_timings, 'values', None)
+    if values is not None:
+        values[name] = values.get(name, 0.0) + value
+
+
+class _TimedConnectionMixin:
+    """Misura connessione TCP (inclusa la risoluzione DNS) e handshake TLS."""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        # Risoluzione tramite la cache DNS del processo: solo _dns_host cambia durante
+        # la connessione, host (usato per SNI e verifica del certificato) resta il nome
+        hostname = self._dns_host
+        address = DEFAULT_DNS_CACHE.resolve(hostname, self.port) if DEFAULT_DNS_CACHE.enabled else None
+        if address is not None:
+            self._dns_host = address
+        try:
+            return super()._new_conn()
+        except Exception:
+            if address is not None:
+                DEFAULT_DNS_CACHE.invalidate(hostname)
+            raise
+        finally:
+            self._dns_host = hostname
+            self._tcp_seconds = time.perf_counter() - start
+            _record_phase('connect_seconds', self._tcp_seconds)
+
+    def connect(self):
+        self._tcp_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            if isinstance(self, HTTPSConnection):
+                _record_phase('tls_seconds', max(time.perf_counter() - start - self._tcp_seconds, 0.0))
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter che registra i tempi di connessione e handshake TLS delle nuove connessioni."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
@@ -0,0 +1,196 @@
+"""
+Modelli tipizzati e compatti per gli item del catalogo.
+
+I modelli usano ``__slots__`` invece di un ``__dict__`` per istanza: su import
+da milioni di righe questo riduce sensibilmente la memoria per item. Possono
+essere costruiti da dizionari (JSON/CSV) o da righe posizionali (tuple di
+database o CSV senza header) e vengono serializzati direttamente nel body
+delle richieste tramite ``src.serialization``.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from .config import ProductValidationRules
+from .serialization import dumps
+
+
+class _SlotModel:
+    """Base comune per i modelli slot-based del catalogo."""
+
+    __slots__ = ('extra',)
+
+    # Campi noti del modello, nell'ordine usato da from_row()
+    FIELDS: Tuple[str, ...] = ()
+    # Campo che identifica univocamente l'item nel catalogo
+    ID_FIELD: str = ''
+    _FIELD_SET: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, **fields: Any):
+        for name in self.FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        self.extra = fields or None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> '_SlotModel':
+        """
+        Costruisce il modello da un dizionario senza copiarlo.
+
+        I campi non previsti dal modello vengono conservati in ``extra``
+        e inclusi nella serializzazione.
+
+        Args:
+            data: Dizionario con i dati dell'item
+
+        Returns:
+            Istanza del modello
+        """
+        obj = cls.__new__(cls)
+        get = data.get
+        for name in cls.FIELDS:
+            setattr(obj, name, get(name))
+        if cls._FIELD_SET.issuperset(data):
+            obj.extra = None
+        else:
+            obj.extra = {k: v for k, v in data.items() if k not in cls._FIELD_SET}
+        return obj
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any], columns: Optional[Sequence[str]] = None) -> '_SlotModel':
+        """
+        Costruisce il modello da una riga posizionale.
+
+        Args:
+            row: Valori della riga (es. tupla da cursore DB o lista da csv.reader)
+            columns: Nomi delle colonne; se omessi si usa l'ordine di ``FIELDS``
+
+        Returns:
+            Istanza del modello
+        """
+        obj = cls.__new__(cls)
+        for name in cls.FIELDS:
+            setattr(obj, name, None)
+        obj.extra = None
+        for name, value in zip(columns or cls.FIELDS, row):
+            if value == '':
+                value = None
+            if name in cls._FIELD_SET:
+                setattr(obj, name, value)
+            elif value is not None:
+                if obj.extra is None:
+                    obj.extra = {}
+                obj.extra[name] = value
+        return obj
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]], columns: Optional[Sequence[str]] = None):
+        """
+        Costruisce lazy una sequenza di modelli da righe posizionali.
+
+        Args:
+            rows: Iterabile di righe
+            columns: Nomi delle colonne (vedi from_row)
+
+        Yields:
+            Istanze del modello
+        """
+        for row in rows:
+            yield cls.from_row(row, columns)
+
+    @property
+    def item_id(self) -> Optional[str]:
+        """Identificativo univoco dell'item nel catalogo."""
+        return getattr(self, self.ID_FIELD)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Accesso in stile dict, per compatibilità con il codice che usa dizionari."""
+        if key in self._FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Restituisce il payload dell'item, omettendo i campi non valorizzati.
+
+        Returns:
+            dict: Nuovo dizionario con i dati dell'item
+        """
+        data = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_json(self) -> bytes:
+        """
+        Serializza l'item in JSON pronto per il body della richiesta.
+
+        Returns:
+            bytes: JSON codificato in UTF-8
+        """
+        return dumps(self.to_dict())
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.ID_FIELD}={self.item_id!r})"
+
+
+class Product(_SlotModel):
+    """
+    Prodotto di un catalogo commerce.
+
+    Example:
+        product = Product(retailer_id="PROD_001", name="iPhone 15 Pro",
+                          description="Ultimo modello iPhone", price="1199.00",
+                          currency="EUR", availability="in stock", condition="new")
+        manager.add_product(product)
+    """
+
+    FIELDS = tuple(ProductValidationRules.REQUIRED_FIELDS + ProductValidationRules.OPTIONAL_FIELDS)
+    ID_FIELD = 'retailer_id'
+    __slots__ = FIELDS
+
+
+class HomeListing(_SlotModel):
+    """
+    Listing immobiliare di un catalogo ``home_listings``.
+
+    ``address`` è un dizionario con street_address, city, region, country,
+    postal_code, latitude e longitude; ``images`` è una lista di
+    dizionari ``{"image_url": ...}``.
+    """
+
+    FIELDS = (
+        'home_listing_id',
+        'name',
+        'description',
+        'price',
+        'currency',
+        'url',
+        'address',
+        'images',
+        'availability',
+        'year_built',
+        'num_beds',
+        'num_baths',
+        'num_rooms',
+        'property_type',
+        'listing_type',
+        'area_size',
+        'area_unit',
+    )
+    ID_FIELD = 'home_listing_id'
+    __slots__ = FIELDS
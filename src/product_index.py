@@ -0,0 +1,405 @@
+"""
+Indice locale dei prodotti del catalogo per ricerca e composizione dei messaggi.
+
+Scegliere quali prodotti inserire in un messaggio non richiede di scaricare
+l'intero catalogo a ogni invio: ``ProductIndex`` mantiene una replica locale
+in SQLite (libreria standard) con indici secondari su categoria, marca,
+disponibilità e prezzo e, se SQLite include FTS5, un indice full-text su
+nome, descrizione, marca e categoria. Le query restituiscono i retailer_id
+in pochi millisecondi anche con centinaia di migliaia di prodotti.
+
+L'indice si costruisce con ``rebuild`` (lettura in streaming del catalogo) e
+si mantiene aggiornato applicando le stesse operazioni inviate a
+``items_batch`` (``apply_item_requests``), ad esempio come callback
+``on_synced`` di ``DeltaSync``, o con ``upsert``/``apply_patch``/``delete``
+da un handler dei webhook.
+
+Example:
+    index = ProductIndex('catalog.db')
+    index.rebuild(manager)
+    retailer_ids = index.query('scarpe running', brand='Acme', availability='in stock',
+                               max_price=120, limit=30)
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+from .config import logger
+from .serialization import dumps, loads
+from .verticals import parse_amount
+
+
+# Colonne indicizzate (il prodotto completo è conservato serializzato in 'data')
+INDEXED_FIELDS = ('name', 'description', 'brand', 'category', 'availability', 'currency')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    retailer_id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    brand TEXT,
+    category TEXT,
+    availability TEXT,
+    price REAL,
+    currency TEXT,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, price);
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products (brand, price);
+CREATE INDEX IF NOT EXISTS idx_products_availability ON products (availability, price);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (price);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, description, brand, category, content='products', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description, brand, category)
+    VALUES ('delete', old.rowid, old.name, old.description, old.brand, old.category);
+    INSERT INTO products_fts (rowid, name, description, brand, category)
+    VALUES (new.rowid, new.name, new.description, new.brand, new.category);
+END;
+"""
+
+# Tabella temporanea (della sola connessione) in cui rebuild scrive il nuovo contenuto
+_STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS products_staging (
+    retailer_id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    brand TEXT,
+    category TEXT,
+    availability TEXT,
+    price REAL,
+    currency TEXT,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+DELETE FROM temp.products_staging;
+"""
+
+_STAGING_INSERT = "INSERT OR REPLACE INTO temp.products_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Le righe scritte durante la ricostruzione (updated_at >= inizio) sono più recenti della lettura
+_SWAP_DELETE = "DELETE FROM products WHERE updated_at < ?"
+
+_SWAP_INSERT = """
+INSERT INTO products (retailer_id, name, description, brand, category, availability, price, currency,
+                      data, updated_at)
+SELECT s.retailer_id, s.name, s.description, s.brand, s.category, s.availability, s.price, s.currency,
+       s.data, s.updated_at
+FROM temp.products_staging s
+WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.retailer_id = s.retailer_id)
+"""
+
+_UPSERT = """
+INSERT INTO products (retailer_id, name, description, brand, category, availability, price, currency,
+                      data, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (retailer_id) DO UPDATE SET
+    name = excluded.name, description = excluded.description, brand = excluded.brand,
+    category = excluded.category, availability = excluded.availability, price = excluded.price,
+    currency = excluded.currency, data = excluded.data, updated_at = excluded.updated_at
+"""
+
+
+def _price(value: Any) -> Optional[float]:
+    """Prezzo numerico per l'indice (None se assente o non interpretabile)."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return parse_amount(value)
+    except ValueError:
+        return None
+
+
+def _fts_query(text: str) -> str:
+    """Converte il testo libero in una query FTS5 (AND dei termini, con ricerca per prefisso)."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class ProductIndex:
+    """Replica locale del catalogo con indici secondari e ricerca full-text."""
+
+    def __init__(self, path: str = ':memory:', full_text: bool = True):
+        """
+        Args:
+            path: File del database SQLite (':memory:' = solo in memoria)
+            full_text: Se True crea l'indice full-text (ignorato se SQLite non supporta FTS5)
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        # ID eliminati durante una ricostruzione in corso (None se nessuna è in corso)
+        self._deleted_during_rebuild: Optional[Set[str]] = None
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            self.full_text = False
+            if full_text:
+                try:
+                    self._conn.executescript(_FTS_SCHEMA)
+                    self.full_text = True
+                except sqlite3.OperationalError:
+                    logger.warning("SQLite senza FTS5: la ricerca testuale userà LIKE")
+
+    @staticmethod
+    def _row(product: Dict[str, Any], now: float) -> tuple:
+        return (str(product['retailer_id']), *(product.get(field) for field in INDEXED_FIELDS[:5]),
+                _price(product.get('price')), product.get('currency'), dumps(product), now)
+
+    def upsert(self, products: Iterable[Dict[str, Any]]) -> int:
+        """
+        Inserisce o sostituisce prodotti nell'indice.
+
+        Args:
+            products: Prodotti con 'retailer_id'
+
+        Returns:
+            int: Numero di prodotti scritti
+        """
+        now = time.time()
+        rows = [self._row(product, now) for product in products]
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def apply_patch(self, retailer_id: str, patch: Dict[str, Any]) -> bool:
+        """
+        Aggiorna alcuni campi di un prodotto già indicizzato (es. disponibilità da un webhook).
+
+        Args:
+            retailer_id: ID del prodotto
+            patch: Campi da aggiornare
+
+        Returns:
+            bool: False se il prodotto non è nell'indice
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT data FROM products WHERE retailer_id = ?',
+                                     (str(retailer_id),)).fetchone()
+            if row is None:
+                return False
+            product = {**loads(row[0]), **patch, 'retailer_id': str(retailer_id)}
+            self._conn.execute(_UPSERT, self._row(product, time.time()))
+        return True
+
+    def delete(self, retailer_ids: Iterable[str]) -> int:
+        """
+        Rimuove prodotti dall'indice.
+
+        Args:
+            retailer_ids: ID dei prodotti
+
+        Returns:
+            int: Numero di prodotti rimossi
+        """
+        retailer_ids = [str(rid) for rid in retailer_ids]
+        with self._lock, self._conn:
+            if self._deleted_during_rebuild is not None:
+                self._deleted_during_rebuild.update(retailer_ids)
+            cursor = self._conn.executemany('DELETE FROM products WHERE retailer_id = ?',
+                                            [(rid,) for rid in retailer_ids])
+            return cursor.rowcount
+
+    def apply_item_requests(self, item_requests: List[Dict[str, Any]]) -> None:
+        """
+        Applica all'indice le operazioni inviate a items_batch (CREATE, UPDATE, DELETE).
+
+        Gli UPDATE parziali aggiornano solo i campi presenti; un UPDATE di un
+        prodotto non ancora indicizzato viene inserito così com'è.
+
+        Args:
+            item_requests: Operazioni nel formato items_batch (ID in data['id'])
+        """
+        deleted = []
+        for request in item_requests:
+            data = dict(request.get('data') or {})
+            retailer_id = data.pop('id', None) or data.get('retailer_id')
+            if retailer_id is None:
+                continue
+            if request.get('method') == 'DELETE':
+                deleted.append(retailer_id)
+            elif not self.apply_patch(retailer_id, data):
+                self.upsert([{**data, 'retailer_id': retailer_id}])
+        if deleted:
+            self.delete(deleted)
+
+    def rebuild(self, manager, fields: Union[str, Sequence[str]] = 'full', chunk_size: int = 1000) -> int:
+        """
+        Ricostruisce l'indice leggendo l'intero catalogo in streaming.
+
+        I prodotti vengono scritti a blocchi in una tabella temporanea senza
+        tenere bloccato l'indice: durante la lettura, che può durare minuti,
+        query e aggiornamenti continuano sul contenuto precedente. Al termine
+        il nuovo contenuto sostituisce il precedente in un'unica transazione;
+        le modifiche e le eliminazioni arrivate nel frattempo (es. dai webhook)
+        sono più recenti della lettura e vengono mantenute. Se la lettura
+        fallisce l'indice resta invariato.
+
+        Args:
+            manager: WhatsAppCatalogManager da cui leggere i prodotti
+            fields: Proiezione da richiedere: preset di iter_products o elenco di campi, che deve
+                includere retailer_id (default: 'full'; i campi di default dell'API non bastano)
+            chunk_size: Prodotti scritti per executemany
+
+        Returns:
+            int: Numero di prodotti indicizzati
+        """
+        start = time.perf_counter()
+        count = 0
+        now = time.time()
+        with self._rebuild_lock:
+            with self._lock, self._conn:
+                self._conn.executescript(_STAGING_SCHEMA)
+                self._deleted_during_rebuild = set()
+            try:
+                rows = []
+                for product in manager.iter_products(fields=fields):
+                    rows.append(self._row(product, now))
+                    if len(rows) >= chunk_size:
+                        count += self._stage(rows)
+                        rows = []
+                count += self._stage(rows)
+
+                with self._lock, self._conn:
+                    self._conn.executemany('DELETE FROM temp.products_staging WHERE retailer_id = ?',
+                                           [(rid,) for rid in self._deleted_during_rebuild])
+                    self._conn.execute(_SWAP_DELETE, (now,))
+                    self._conn.execute(_SWAP_INSERT)
+            finally:
+                with self._lock, self._conn:
+                    self._deleted_during_rebuild = None
+                    self._conn.execute('DELETE FROM temp.products_staging')
+        logger.info("Indice prodotti ricostruito: %s prodotti in %.1f secondi", count, time.perf_counter() - start)
+        return count
+
+    def _stage(self, rows: List[tuple]) -> int:
+        """Scrive un blocco della ricostruzione nella tabella temporanea (lock tenuto solo per il blocco)."""
+        with self._lock, self._conn:
+            self._conn.executemany(_STAGING_INSERT, rows)
+        return len(rows)
+
+    def get(self, retailer_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Restituisce il prodotto indicizzato (None se assente).
+
+        Args:
+            retailer_id: ID del prodotto
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM products WHERE retailer_id = ?',
+                                     (str(retailer_id),)).fetchone()
+        return loads(row[0]) if row else None
+
+    def count(self) -> int:
+        """Numero di prodotti nell'indice."""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def query(self, text: Optional[str] = None, category: Optional[str] = None, brand: Optional[str] = None,
+              availability: Optional[str] = None, min_price: Optional[float] = None,
+              max_price: Optional[float] = None, currency: Optional[str] = None,
+              order_by: Optional[str] = None, limit: int = 30, offset: int = 0) -> List[str]:
+        """
+        Cerca prodotti e ne restituisce i retailer_id (es. per send_product_message).
+
+        Args:
+            text: Testo libero cercato in nome, descrizione, marca e categoria
+            category: Categoria esatta
+            brand: Marca esatta
+            availability: Disponibilità esatta (es. 'in stock')
+            min_price: Prezzo minimo (incluso)
+            max_price: Prezzo massimo (incluso)
+            currency: Valuta esatta
+            order_by: 'price', '-price', 'name' oppure None (rilevanza se c'è text)
+            limit: Numero massimo di risultati
+            offset: Risultati da saltare (paginazione)
+
+        Returns:
+            list: retailer_id dei prodotti trovati
+        """
+        order_columns = {'price': 'p.price', '-price': 'p.price DESC', 'name': 'p.name'}
+        if order_by is not None and order_by not in order_columns:
+            raise ValueError(f"Ordinamento non valido: {order_by}. Validi: {', '.join(order_columns)}")
+
+        conditions, params = [], []
+        source = 'products p'
+        order = order_columns.get(order_by)
+        if text and text.strip():
+            if self.full_text:
+                source = 'products_fts JOIN products p ON p.rowid = products_fts.rowid'
+                conditions.append('products_fts MATCH ?')
+                params.append(_fts_query(text))
+                order = order or 'products_fts.rank'
+            else:
+                for term in text.split():
+                    conditions.append('(p.name LIKE ? OR p.description LIKE ? OR p.brand LIKE ? '
+                                      'OR p.category LIKE ?)')
+                    params.extend([f'%{term}%'] * 4)
+        for column, value in (('category', category), ('brand', brand), ('availability', availability),
+                              ('currency', currency)):
+            if value is not None:
+                conditions.append(f'p.{column} = ?')
+                params.append(value)
+        if min_price is not None:
+            conditions.append('p.price >= ?')
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append('p.price <= ?')
+            params.append(max_price)
+
+        sql = f"SELECT p.retailer_id FROM {source}"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        if order:
+            sql += f' ORDER BY {order}'
+        sql += ' LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def facets(self, column: str) -> Dict[str, int]:
+        """
+        Conteggio dei prodotti per valore di una colonna indicizzata.
+
+        Args:
+            column: 'category', 'brand', 'availability' oppure 'currency'
+
+        Returns:
+            dict: Numero di prodotti per valore
+        """
+        if column not in ('category', 'brand', 'availability', 'currency'):
+            raise ValueError(f"Colonna non indicizzata: {column}")
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {column}, COUNT(*) FROM products GROUP BY {column}').fetchall()
+        return {value: count for value, count in rows if value is not None}
+
+    def close(self) -> None:
+        """Chiude il database."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> 'ProductIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
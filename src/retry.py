@@ -0,0 +1,256 @@
+"""
+Politica di retry per le chiamate alla Graph API.
+
+Sostituisce il ``Retry`` di urllib3 montato sulla sessione, che ritentava
+anche le POST (con il rischio di inviare due volte lo stesso messaggio
+WhatsApp) con un backoff fisso uguale per tutti i worker. Qui:
+
+- le operazioni idempotenti (letture, upsert di prodotti identificati dal
+  retailer_id, delete) vengono ritentate su 429, 5xx ed errori di rete;
+- le operazioni non idempotenti (es. invio messaggi) solo quando la
+  richiesta sicuramente non è stata elaborata: 429 o connessione fallita;
+- l'attesa usa il "decorrelated jitter" e rispetta ``Retry-After`` e
+  l'header di throttling di Meta ``X-Business-Use-Case-Usage``;
+- un ``RetryBudget`` condiviso dal processo limita i retry a una frazione
+  del traffico totale, per non amplificare un incidente lato Meta.
+"""
+
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterable, Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .config import Config, logger
+
+
+# Metodi HTTP idempotenti per definizione
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'DELETE', 'PUT'})
+
+# Status code per cui ha senso ritentare un'operazione idempotente
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Status code che garantiscono che la richiesta non è stata elaborata
+NOT_PROCESSED_STATUSES = frozenset({429})
+
+
+class RetryBudget:
+    """
+    Budget di retry condiviso (token bucket).
+
+    Ogni richiesta deposita ``ratio`` token, ogni retry ne preleva uno: nel
+    lungo periodo i retry non superano ``ratio`` volte le richieste, più una
+    riserva iniziale ``min_reserve`` che permette i retry anche a traffico basso.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_reserve: float = 10.0, capacity: float = 100.0):
+        """
+        Args:
+            ratio: Frazione massima di retry rispetto alle richieste (es. 0.1 = 10%)
+            min_reserve: Token disponibili all'avvio
+            capacity: Numero massimo di token accumulabili
+        """
+        self.ratio = ratio
+        self.capacity = max(capacity, min_reserve)
+        self._balance = float(min_reserve)
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        """Registra una richiesta (primo tentativo o retry) effettuata."""
+        with self._lock:
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """
+        Preleva un token per un retry.
+
+        Returns:
+            bool: True se il retry è consentito dal budget
+        """
+        with self._lock:
+            if self._balance >= 1.0:
+                self._balance -= 1.0
+                return True
+            return False
+
+    @property
+    def balance(self) -> float:
+        """Token attualmente disponibili."""
+        return self._balance
+
+
+# Budget condiviso da tutti i manager del processo
+DEFAULT_RETRY_BUDGET = RetryBudget(ratio=Config.RETRY_BUDGET_RATIO)
+
+
+class RetryPolicy:
+    """
+    Decide se e quando ritentare una richiesta fallita.
+
+    Example:
+        policy = RetryPolicy(max_retries=5, base_delay=0.5, max_delay=30)
+        manager = WhatsAppCatalogManager(retry_policy=policy)
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, budget: Optional[RetryBudget] = None,
+                 retry_statuses: Iterable[int] = RETRYABLE_STATUSES):
+        """
+        Args:
+            max_retries: Numero massimo di retry per richiesta (default: MAX_RETRIES)
+            base_delay: Attesa minima tra i tentativi in secondi (default: RETRY_DELAY)
+            max_delay: Attesa massima tra i tentativi in secondi (default: RETRY_MAX_DELAY)
+            budget: Budget di retry (default: budget condiviso dal processo)
+            retry_statuses: Status code ritentabili per le operazioni idempotenti
+        """
+        self.max_retries = Config.MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = Config.RETRY_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.budget = budget or DEFAULT_RETRY_BUDGET
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def is_retryable(self, idempotent: bool, response: Optional[requests.Response] = None,
+                     exception: Optional[Exception] = None) -> bool:
+        """
+        Indica se l'esito di un tentativo è ritentabile, ignorando limiti e budget.
+
+        Args:
+            idempotent: Se l'operazione può essere ripetuta senza effetti collaterali
+            response: Risposta HTTP ricevuta (se presente)
+            exception: Eccezione di rete sollevata (se presente)
+
+        Returns:
+            bool: True se ha senso ritentare
+        """
+        if response is not None:
+            if idempotent:
+                return response.status_code in self.retry_statuses
+            return response.status_code in NOT_PROCESSED_STATUSES
+        if exception is not None:
+            if idempotent:
+                return isinstance(exception, (requests.ConnectionError, requests.Timeout))
+            return _connection_not_established(exception)
+        return False
+
+    def should_retry(self, attempt: int, idempotent: bool, response: Optional[requests.Response] = None,
+                     exception: Optional[Exception] = None) -> bool:
+        """
+        Decide se effettuare un nuovo tentativo, consumando il budget se sì.
+
+        Args:
+            attempt: Numero di retry già effettuati per questa richiesta
+            idempotent: Se l'operazione è idempotente
+            response: Risposta HTTP ricevuta (se presente)
+            exception: Eccezione di rete sollevata (se presente)
+
+        Returns:
+            bool: True se la richiesta va ritentata
+        """
+        if attempt >= self.max_retries:
+            return False
+        if not self.is_retryable(idempotent, response, exception):
+            return False
+        if not self.budget.try_acquire():
+            logger.warning("Budget di retry esaurito: nessun nuovo tentativo")
+            return False
+        return True
+
+    def next_delay(self, previous_delay: Optional[float], response: Optional[requests.Response] = None) -> float:
+        """
+        Calcola l'attesa prima del prossimo tentativo.
+
+        Se il server indica quando riprovare (Retry-After o tempo stimato di
+        ripristino nell'header di throttling di Meta) si usa quel valore,
+        altrimenti il decorrelated jitter:
+        ``min(max_delay, uniform(base_delay, previous_delay * 3))``.
+
+        Args:
+            previous_delay: Attesa usata al tentativo precedente (None al primo retry)
+            response: Risposta che ha causato il retry (se presente)
+
+        Returns:
+            float: Secondi da attendere
+        """
+        if response is not None:
+            hinted = server_retry_delay(response)
+            if hinted is not None:
+                return min(hinted, self.max_delay)
+        previous = previous_delay or self.base_delay
+        return min(self.max_delay, random.uniform(self.base_delay, previous * 3))
+
+
+def _connection_not_established(exception: Exception) -> bool:
+    """True se l'errore è avvenuto prima di inviare la richiesta al server."""
+    if isinstance(exception, requests.ConnectTimeout):
+        return True
+    if isinstance(exception, requests.ConnectionError):
+        reason = exception.args[0] if exception.args else None
+        reason = getattr(reason, 'reason', reason)
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def possibly_processed(error: Exception) -> bool:
+    """
+    Indica se una richiesta non idempotente fallita può essere stata elaborata dal server.
+
+    È il criterio opposto a quello dei retry delle POST: la richiesta sicuramente
+    non è stata elaborata se il server ha risposto con un errore 4xx, se la
+    connessione non è mai stata stabilita o se l'errore è avvenuto prima
+    dell'invio (circuito aperto, scadenza, scheduler).
+
+    Args:
+        error: Eccezione sollevata da _make_request (l'errore di rete originale è in __cause__)
+
+    Returns:
+        bool: True se l'esito è incerto (es. timeout di lettura o risposta 5xx)
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code >= 500
+    cause = error.__cause__
+    if isinstance(cause, requests.RequestException):
+        return not _connection_not_established(cause)
+    return False
+
+
+def server_retry_delay(response: requests.Response) -> Optional[float]:
+    """
+    Estrae dalla risposta l'attesa suggerita dal server.
+
+    Considera ``Retry-After`` (secondi o data HTTP) e il campo
+    ``estimated_time_to_regain_access`` (minuti) di ``X-Business-Use-Case-Usage``.
+
+    Args:
+        response: Risposta HTTP
+
+    Returns:
+        float: Secondi da attendere, o None se il server non dà indicazioni
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+
+    usage = response.headers.get('X-Business-Use-Case-Usage')
+    if usage:
+        try:
+            minutes = max(
+                (entry.get('estimated_time_to_regain_access') or 0)
+                for entries in json.loads(usage).values()
+                for entry in entries
+            )
+        except (ValueError, TypeError, AttributeError):
+            return None
+        if minutes:
+            return float(minutes) * 60
+    return None
@@ -0,0 +1,299 @@
+"""
+Scheduler a priorità tra traffico interattivo e traffico bulk.
+
+Senza scheduler le richieste di un import notturno e quelle rivolte ai
+clienti (``send_product_message``, lookup dei webhook) competono alla pari
+per le connessioni e per il budget di richieste: mille chiamate bulk in coda
+davanti a un messaggio lo ritardano di minuti. ``PriorityScheduler`` si
+pone davanti alla chiamata HTTP di ``_make_request`` e assegna a ogni
+richiesta una corsia (lane):
+
+- ogni corsia ha un peso e le richieste in attesa vengono servite con un
+  weighted fair queuing: a parità di domanda la corsia interattiva (peso 4)
+  ottiene quattro richieste per ogni richiesta bulk (peso 1), mentre una
+  corsia da sola può usare tutta la capacità;
+- le corsie riservate dispongono in esclusiva di ``reserved_concurrency``
+  slot di concorrenza e di una quota ``reserved_rate`` del budget di
+  richieste: il bulk gira a piena velocità sul resto, senza mai occupare
+  la capacità necessaria ai messaggi;
+- con ``requests_per_hour`` il budget è un token bucket condiviso (burst di
+  un minuto di richieste); senza, lo scheduler regola solo la concorrenza.
+
+La corsia della richiesta è quella attivata con ``use_lane`` nel contesto
+corrente (thread o task asyncio) oppure quella di default del metodo del
+manager: bulk per batch, sync ed export, interattiva per i messaggi.
+
+Example:
+    scheduler = PriorityScheduler(max_concurrency=16, reserved_concurrency=4)
+    manager = WhatsAppCatalogManager(scheduler=scheduler)
+
+    with use_lane(BULK):
+        run_nightly_import(manager)
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional
+
+from .config import Config
+
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+_current_lane: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('lane', default=None)
+
+
+def current_lane() -> Optional[str]:
+    """Corsia attivata nel contesto corrente (None se non impostata)."""
+    return _current_lane.get()
+
+
+@contextmanager
+def use_lane(lane: str, replace: bool = True) -> Iterator[str]:
+    """
+    Attiva una corsia dello scheduler per il blocco.
+
+    Args:
+        lane: Nome della corsia
+        replace: Se False mantiene la corsia già attiva (es. una batch chiamata da un
+            handler interattivo resta interattiva)
+
+    Yields:
+        str: Corsia effettiva del blocco
+    """
+    outer = _current_lane.get()
+    if outer is not None and not replace:
+        yield outer
+        return
+    token = _current_lane.set(lane)
+    try:
+        yield lane
+    finally:
+        _current_lane.reset(token)
+
+
+class Lane:
+    """Corsia dello scheduler con la sua coda di richieste in attesa."""
+
+    def __init__(self, name: str, weight: float = 1.0, reserved: bool = False):
+        """
+        Args:
+            name: Nome della corsia
+            weight: Quota relativa della capacità quando più corsie sono in attesa
+            reserved: Se True la corsia può usare anche la capacità riservata
+        """
+        if weight <= 0:
+            raise ValueError(f"Il peso della corsia {name} deve essere positivo")
+        self.name = name
+        self.weight = weight
+        self.reserved = reserved
+        self.queue: Deque['_Ticket'] = deque()
+        self.virtual_time = 0.0
+        self.in_flight = 0
+        self.granted = 0
+        self.wait_seconds = 0.0
+
+
+class _Ticket:
+    __slots__ = ('cost', 'granted', 'enqueued_at')
+
+    def __init__(self, cost: float):
+        self.cost = cost
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class PriorityScheduler:
+    """Ammissione delle richieste per corsia con code pesate e capacità riservata (thread-safe)."""
+
+    def __init__(self, max_concurrency: Optional[int] = None, reserved_concurrency: Optional[int] = None,
+                 requests_per_hour: Optional[int] = None, reserved_rate: Optional[float] = None,
+                 lanes: Optional[Iterable[Lane]] = None, default_lane: str = INTERACTIVE):
+        """
+        Args:
+            max_concurrency: Richieste contemporanee in volo (default: SCHEDULER_MAX_CONCURRENCY,
+                di norma pari alla dimensione del connection pool)
+            reserved_concurrency: Slot utilizzabili solo dalle corsie riservate
+                (default: SCHEDULER_RESERVED_CONCURRENCY)
+            requests_per_hour: Budget di richieste condiviso (default: SCHEDULER_REQUESTS_PER_HOUR,
+                0 = nessun limite di velocità)
+            reserved_rate: Frazione del budget utilizzabile solo dalle corsie riservate
+                (default: SCHEDULER_RESERVED_RATE)
+            lanes: Corsie (default: interattiva riservata con peso SCHEDULER_INTERACTIVE_WEIGHT e bulk)
+            default_lane: Corsia delle richieste senza corsia
+
+        Raises:
+            ValueError: Se la capacità riservata non lascia spazio alle altre corsie
+        """
+        self.max_concurrency = Config.SCHEDULER_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self.reserved_concurrency = (Config.SCHEDULER_RESERVED_CONCURRENCY if reserved_concurrency is None
+                                     else reserved_concurrency)
+        if self.max_concurrency < 1 or not 0 <= self.reserved_concurrency < self.max_concurrency:
+            raise ValueError("Servono max_concurrency >= 1 e 0 <= reserved_concurrency < max_concurrency")
+
+        requests_per_hour = Config.SCHEDULER_REQUESTS_PER_HOUR if requests_per_hour is None else requests_per_hour
+        reserved_rate = Config.SCHEDULER_RESERVED_RATE if reserved_rate is None else reserved_rate
+        if not 0 <= reserved_rate < 1:
+            raise ValueError("reserved_rate deve essere compreso tra 0 (incluso) e 1 (escluso)")
+        self.rate = requests_per_hour / 3600 if requests_per_hour else None
+        # Burst di un minuto di richieste, di cui reserved_rate tenuto per le corsie riservate
+        self.capacity = max(self.rate * 60, 1.0) if self.rate else 0.0
+        self.reserved_tokens = self.capacity * reserved_rate
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+
+        if lanes is None:
+            lanes = (Lane(INTERACTIVE, weight=Config.SCHEDULER_INTERACTIVE_WEIGHT, reserved=True),
+                     Lane(BULK, weight=1.0))
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        if default_lane not in self.lanes:
+            raise ValueError(f"Corsia di default sconosciuta: {default_lane}")
+        self.default_lane = default_lane
+
+        self._in_flight = 0
+        self._virtual_clock = 0.0
+        self._condition = threading.Condition()
+
+    def _lane(self, name: Optional[str]) -> Lane:
+        lane = self.lanes.get(name or current_lane() or self.default_lane)
+        return lane if lane is not None else self.lanes[self.default_lane]
+
+    def _refill(self) -> None:
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _admissible(self, lane: Lane, cost: float) -> bool:
+        """True se la capacità disponibile alla corsia basta per la richiesta."""
+        concurrency = self.max_concurrency if lane.reserved else self.max_concurrency - self.reserved_concurrency
+        if self._in_flight >= concurrency:
+            return False
+        if self.rate is None:
+            return True
+        floor = 0.0 if lane.reserved else self.reserved_tokens
+        return self._tokens - cost >= floor
+
+    def _dispatch(self) -> bool:
+        """Concede la capacità libera alle richieste in attesa, per tempo virtuale crescente."""
+        self._refill()
+        granted = False
+        while True:
+            candidates = [lane for lane in self.lanes.values()
+                          if lane.queue and self._admissible(lane, lane.queue[0].cost)]
+            if not candidates:
+                return granted
+            lane = min(candidates, key=lambda candidate: candidate.virtual_time)
+            ticket = lane.queue.popleft()
+            ticket.granted = True
+            self._virtual_clock = lane.virtual_time
+            lane.virtual_time += ticket.cost / lane.weight
+            lane.in_flight += 1
+            lane.granted += 1
+            lane.wait_seconds += time.monotonic() - ticket.enqueued_at
+            self._in_flight += 1
+            if self.rate is not None:
+                self._tokens -= ticket.cost
+            granted = True
+
+    def _token_wait(self) -> Optional[float]:
+        """Secondi prima che i token bastino alla prima richiesta bloccata solo dal budget."""
+        if self.rate is None:
+            return None
+        waits = []
+        for lane in self.lanes.values():
+            if lane.queue:
+                floor = 0.0 if lane.reserved else self.reserved_tokens
+                waits.append((lane.queue[0].cost + floor - self._tokens) / self.rate)
+        return max(min(waits), 0.001) if waits else None
+
+    def acquire(self, lane: Optional[str] = None, cost: float = 1, timeout: Optional[float] = None) -> str:
+        """
+        Attende il turno della richiesta e ne occupa uno slot.
+
+        Args:
+            lane: Corsia (default: corsia attiva nel contesto o default_lane)
+            cost: Richieste da conteggiare nel budget (es. sotto-richieste di una batch)
+            timeout: Attesa massima in secondi (None = senza limite)
+
+        Returns:
+            str: Corsia assegnata, da passare a release
+
+        Raises:
+            TimeoutError: Se il turno non arriva entro timeout
+        """
+        lane = self._lane(lane)
+        # Una richiesta più costosa dell'intero burst non deve restare bloccata per sempre
+        cost = min(cost, self.capacity - (0.0 if lane.reserved else self.reserved_tokens)) if self.rate else cost
+        ticket = _Ticket(cost)
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            if not lane.queue:
+                # Una corsia inattiva non accumula credito: riparte dal tempo virtuale corrente
+                lane.virtual_time = max(lane.virtual_time, self._virtual_clock)
+            lane.queue.append(ticket)
+            while True:
+                if self._dispatch():
+                    self._condition.notify_all()
+                if ticket.granted:
+                    return lane.name
+                wait = self._token_wait()
+                if give_up_at is not None:
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        lane.queue.remove(ticket)
+                        raise TimeoutError(f"Nessuno slot libero nella corsia {lane.name} entro {timeout:.2f}s")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+    def release(self, lane: str) -> None:
+        """
+        Libera lo slot di una richiesta conclusa.
+
+        Args:
+            lane: Corsia restituita da acquire
+        """
+        with self._condition:
+            self.lanes[lane].in_flight -= 1
+            self._in_flight -= 1
+            self._dispatch()
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, lane: Optional[str] = None, cost: float = 1, timeout: Optional[float] = None) -> Iterator[str]:
+        """Occupa uno slot per la durata del blocco (vedi acquire)."""
+        lane = self.acquire(lane, cost, timeout)
+        try:
+            yield lane
+        finally:
+            self.release(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Stato dello scheduler per corsia.
+
+        Returns:
+            dict: 'in_flight', 'tokens' e per ogni corsia 'waiting', 'in_flight', 'granted'
+                e 'avg_wait_seconds'
+        """
+        with self._condition:
+            self._refill()
+            return {
+                'in_flight': self._in_flight,
+                'tokens': self._tokens if self.rate is not None else None,
+                'lanes': {
+                    name: {
+                        'waiting': len(lane.queue),
+                        'in_flight': lane.in_flight,
+                        'granted': lane.granted,
+                        'avg_wait_seconds': lane.wait_seconds / lane.granted if lane.granted else 0.0,
+                    }
+                    for name, lane in self.lanes.items()
+                },
+            }
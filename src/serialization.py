@@ -0,0 +1,175 @@
+"""
+Serializzazione JSON per i payload delle richieste API.
+
+Usa orjson se installato (encoding in C, produce direttamente bytes) e ripiega
+sul modulo json della libreria standard in caso contrario. Gli oggetti che
+espongono un metodo ``to_dict()`` (es. i modelli di ``src.models``) vengono
+serializzati direttamente, senza costruire copie intermedie nel chiamante.
+"""
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Union
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale
+    orjson = None
+
+
+JSON_BACKEND: str = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj: Any) -> Any:
+    """Converte in tipi JSON nativi gli oggetti non serializzabili di default."""
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Oggetto di tipo {type(obj).__name__} non serializzabile in JSON")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serializza un oggetto in JSON compatto.
+
+    Args:
+        obj: Oggetto da serializzare (dict, list o modello con ``to_dict()``)
+
+    Returns:
+        bytes: JSON codificato in UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Deserializza un documento JSON.
+
+    Args:
+        data: Documento JSON come bytes o stringa
+
+    Returns:
+        Any: Oggetto Python decodificato
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class JSONArrayStream:
+    """
+    Decodifica incrementale di un array contenuto in un oggetto JSON.
+
+    Pensato per le risposte paginate della Graph API (``{"data": [...],
+    "paging": {...}}``): gli elementi di ``data`` vengono prodotti uno alla
+    volta man mano che arrivano i chunk della risposta, senza decodificare
+    l'intero body in una stringa né costruire la lista completa in memoria.
+    Le altre chiavi di primo livello (es. ``paging``) sono disponibili in
+    ``extra`` al termine dell'iterazione.
+
+    Example:
+        stream = JSONArrayStream(response.iter_content(chunk_size=65536))
+        for item in stream:
+            ...
+        next_cursor = stream.extra.get('paging', {}).get('cursors', {}).get('after')
+    """
+
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]], key: str = 'data'):
+        """
+        Args:
+            chunks: Iterabile di chunk (bytes o str) del documento JSON
+            key: Chiave di primo livello che contiene l'array da iterare
+        """
+        self.key = key
+        self.extra: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._exhausted = False
+
+    def _fill(self) -> bool:
+        """Legge il prossimo chunk nel buffer. Restituisce False a fine stream."""
+        if self._exhausted:
+            return False
+        for chunk in self._chunks:
+            if isinstance(chunk, (bytes, bytearray)):
+                chunk = self._utf8.decode(chunk)
+            if not chunk:
+                continue
+            # Scarta la parte già consumata per mantenere il buffer piccolo
+            self._buffer = self._buffer[self._pos:] + chunk
+            self._pos = 0
+            return True
+        self._exhausted = True
+        tail = self._utf8.decode(b'', final=True)
+        if tail:
+            self._buffer = self._buffer[self._pos:] + tail
+            self._pos = 0
+            return True
+        return False
+
+    def _next_char(self) -> str:
+        """Salta gli spazi e restituisce il prossimo carattere significativo senza consumarlo."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self._WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Documento JSON troncato")
+
+    def _expect(self, chars: str) -> str:
+        char = self._next_char()
+        if char not in chars:
+            raise ValueError(f"JSON non valido: atteso uno tra {chars!r}, trovato {char!r}")
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        """Decodifica il prossimo valore JSON completo, leggendo altri chunk se serve."""
+        self._next_char()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Un numero a fine buffer potrebbe continuare nel chunk successivo
+            if end >= len(self._buffer) and not self._exhausted:
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect('{')
+        if self._next_char() == '}':
+            self._pos += 1
+            return
+        while True:
+            name = self._decode_value()
+            self._expect(':')
+            if name == self.key and self._next_char() == '[':
+                self._pos += 1
+                if self._next_char() == ']':
+                    self._pos += 1
+                else:
+                    while True:
+                        yield self._decode_value()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                self.extra[name] = self._decode_value()
+            if self._expect(',}') == '}':
+                return
@@ -0,0 +1,235 @@
+"""
+Pool di manager per scenari multi-tenant (un catalogo e un token per merchant).
+
+Tutti i manager creati dal pool condividono un solo trasporto HTTP (e quindi
+un solo connection pool verso graph.facebook.com; requests o httpx secondo
+HTTP_TRANSPORT), lo stesso hook di metriche,
+la stessa politica di retry, gli stessi circuit breaker e lo scheduler a
+priorità (se attivo) e lo store di idempotenza dei messaggi, così la
+de-duplicazione sopravvive alla rimozione dei manager inattivi. Ogni
+richiesta passa da un rate limiter globale e dai limiter del token e del
+catalogo del tenant.
+I manager inutilizzati da più di ``idle_seconds`` vengono rimossi e chiusi
+(con l'invio delle modifiche write-behind in attesa): memoria e socket
+crescono con la concorrenza, non con il numero di tenant.
+
+Example:
+    with TenantManagerPool(per_token_requests_per_hour=200) as pool:
+        manager = pool.get(access_token=merchant.token, catalog_id=merchant.catalog_id)
+        manager.add_product(product)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .circuit_breaker import CircuitBreakerGroup
+from .config import Config, logger
+from .idempotency import IdempotencyStore, create_idempotency_store
+from .metrics import MetricsHook
+from .retry import RetryPolicy
+from .scheduler import PriorityScheduler
+from .transport import Transport, create_transport
+from .whatsapp_catalog_manager import CompositeRateLimiter, RateLimiter, WhatsAppCatalogManager
+
+
+TenantKey = Tuple[str, str, Optional[str]]
+
+
+class TenantManagerPool:
+    """Crea, riusa ed elimina manager per tenant con trasporto e limiti condivisi."""
+
+    def __init__(self, max_requests_per_hour: Optional[int] = None,
+                 per_token_requests_per_hour: Optional[int] = None,
+                 per_catalog_requests_per_hour: Optional[int] = None,
+                 idle_seconds: float = 600.0, max_tenants: Optional[int] = None,
+                 pool_maxsize: int = 32, metrics: Optional[MetricsHook] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breakers: Optional[CircuitBreakerGroup] = None,
+                 scheduler: Optional[PriorityScheduler] = None,
+                 idempotency_store: Optional[IdempotencyStore] = None,
+                 transport: Optional[Transport] = None):
+        """
+        Args:
+            max_requests_per_hour: Limite globale del processo (default: MAX_REQUESTS_PER_HOUR)
+            per_token_requests_per_hour: Limite per access token (None = nessun limite dedicato)
+            per_catalog_requests_per_hour: Limite per catalogo (None = nessun limite dedicato)
+            idle_seconds: Inattività dopo la quale un manager viene rimosso dal pool
+            max_tenants: Numero massimo di manager attivi (i meno usati di recente vengono rimossi)
+            pool_maxsize: Connessioni HTTP mantenute verso ciascun host (solo per il trasporto del pool)
+            metrics: Hook per metriche condiviso dai manager
+            retry_policy: Politica di retry condivisa dai manager
+            circuit_breakers: Circuit breaker condivisi dai manager
+            scheduler: Scheduler a priorità condiviso dai manager (default: uno condiviso se
+                SCHEDULER_MAX_CONCURRENCY > 0, altrimenti nessuno)
+            idempotency_store: Store di idempotenza dei messaggi condiviso dai manager (default:
+                uno del pool, chiuso da close, se MESSAGE_DEDUP_TTL > 0)
+            transport: Trasporto HTTP condiviso dai manager (default: uno del pool, chiuso da
+                close, creato secondo HTTP_TRANSPORT)
+        """
+        self._owns_transport = transport is None
+        self.transport = create_transport(pool_maxsize=pool_maxsize) if transport is None else transport
+        # Sessione requests del trasporto (None con httpx), per compatibilità
+        self.session = getattr(self.transport, 'session', None)
+        self.global_limiter = RateLimiter(max_requests_per_hour or Config.MAX_REQUESTS_PER_HOUR)
+        self.per_token_requests_per_hour = per_token_requests_per_hour
+        self.per_catalog_requests_per_hour = per_catalog_requests_per_hour
+        self.idle_seconds = idle_seconds
+        self.max_tenants = max_tenants
+        self.metrics = metrics
+        self.retry_policy = retry_policy
+        self.circuit_breakers = circuit_breakers
+        # Un solo scheduler per il pool: le priorità valgono sull'intero connection pool
+        if scheduler is None and Config.SCHEDULER_MAX_CONCURRENCY > 0:
+            scheduler = PriorityScheduler()
+        self.scheduler = scheduler
+        # Uno store per il pool: con un manager rimosso e ricreato le chiavi dei messaggi restano
+        self._owns_idempotency_store = idempotency_store is None
+        self.idempotency_store = create_idempotency_store() if idempotency_store is None else idempotency_store
+
+        # Manager attivi in ordine di ultimo utilizzo (il meno recente per primo)
+        self._managers: 'OrderedDict[TenantKey, Tuple[WhatsAppCatalogManager, float]]' = OrderedDict()
+        self._token_limiters: Dict[str, RateLimiter] = {}
+        self._catalog_limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, access_token: str, catalog_id: str, phone_number_id: Optional[str] = None) -> WhatsAppCatalogManager:
+        """
+        Restituisce il manager del tenant, creandolo se non è nel pool.
+
+        Args:
+            access_token: Token di accesso del tenant
+            catalog_id: ID del catalogo del tenant
+            phone_number_id: ID del numero WhatsApp del tenant (opzionale)
+
+        Returns:
+            WhatsAppCatalogManager: Manager che usa il trasporto condiviso del pool
+        """
+        key = (access_token, catalog_id, phone_number_id)
+        with self._lock:
+            manager = self._touch_locked(key)
+            if manager is not None:
+                return manager
+            rate_limiter = self._limiter_for(access_token, catalog_id)
+
+        # Creato fuori dal lock: il warm-up delle connessioni non deve bloccare gli altri tenant
+        manager = WhatsAppCatalogManager(
+            access_token=access_token,
+            catalog_id=catalog_id,
+            phone_number_id=phone_number_id,
+            metrics=self.metrics,
+            retry_policy=self.retry_policy,
+            circuit_breakers=self.circuit_breakers,
+            transport=self.transport,
+            rate_limiter=rate_limiter,
+            scheduler=self.scheduler,
+            idempotency_store=self.idempotency_store,
+        )
+
+        with self._lock:
+            existing = self._touch_locked(key)
+            if existing is None:
+                # I limiter potrebbero essere stati rimossi nel frattempo: il manager usa quelli del pool
+                manager.rate_limiter = self._limiter_for(access_token, catalog_id)
+                self._managers[key] = (manager, time.monotonic())
+                evicted = self._evict_locked(time.monotonic())
+            else:
+                # Un'altra richiesta ha creato il manager dello stesso tenant: si usa il suo
+                evicted = [manager]
+        self._close_managers(evicted)
+        return existing or manager
+
+    def _touch_locked(self, key: TenantKey) -> Optional[WhatsAppCatalogManager]:
+        """Restituisce il manager nel pool aggiornandone l'ultimo utilizzo (None se assente)."""
+        entry = self._managers.get(key)
+        if entry is None:
+            return None
+        self._managers[key] = (entry[0], time.monotonic())
+        self._managers.move_to_end(key)
+        return entry[0]
+
+    def _limiter_for(self, access_token: str, catalog_id: str) -> CompositeRateLimiter:
+        limiters = [self.global_limiter]
+        if self.per_token_requests_per_hour:
+            limiter = self._token_limiters.get(access_token)
+            if limiter is None:
+                limiter = self._token_limiters[access_token] = RateLimiter(self.per_token_requests_per_hour)
+            limiters.append(limiter)
+        if self.per_catalog_requests_per_hour:
+            limiter = self._catalog_limiters.get(catalog_id)
+            if limiter is None:
+                limiter = self._catalog_limiters[catalog_id] = RateLimiter(self.per_catalog_requests_per_hour)
+            limiters.append(limiter)
+        return CompositeRateLimiter(*limiters)
+
+    def evict_idle(self) -> int:
+        """
+        Rimuove i manager inattivi da più di ``idle_seconds``.
+
+        Returns:
+            int: Numero di manager rimossi
+        """
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic())
+        self._close_managers(evicted)
+        return len(evicted)
+
+    def _evict_locked(self, now: float) -> List[WhatsAppCatalogManager]:
+        """Toglie dal pool i manager da rimuovere, che il chiamante chiude fuori dal lock."""
+        evicted = []
+        while self._managers:
+            key, (manager, last_used) = next(iter(self._managers.items()))
+            over_capacity = self.max_tenants is not None and len(self._managers) > self.max_tenants
+            if not over_capacity and now - last_used < self.idle_seconds:
+                break
+            del self._managers[key]
+            evicted.append(manager)
+
+        if evicted:
+            self._prune_limiters({key[0] for key in self._managers}, self._token_limiters)
+            self._prune_limiters({key[1] for key in self._managers}, self._catalog_limiters)
+            logger.debug("Rimossi %s manager inattivi dal pool", len(evicted))
+        return evicted
+
+    @staticmethod
+    def _close_managers(managers: List[WhatsAppCatalogManager]) -> None:
+        """Chiude i manager rimossi (invio del write-behind; trasporto e store di idempotenza restano al pool)."""
+        for manager in managers:
+            try:
+                manager.close()
+            except Exception as e:
+                logger.error("Errore nella chiusura del manager del catalogo %s: %s", manager.catalog_id, e)
+
+    @staticmethod
+    def _prune_limiters(active_keys, limiters: Dict[str, RateLimiter]) -> None:
+        """Elimina i limiter non più usati la cui finestra oraria è scaduta (nessuna quota da ricordare)."""
+        now = time.time()
+        for key in [k for k, limiter in limiters.items() if k not in active_keys and now >= limiter.reset_time]:
+            del limiters[key]
+
+    def __len__(self) -> int:
+        return len(self._managers)
+
+    def close(self) -> None:
+        """Chiude e rimuove tutti i manager, poi lo store di idempotenza e il trasporto HTTP del pool."""
+        with self._lock:
+            managers = [manager for manager, _ in self._managers.values()]
+            self._managers.clear()
+            self._token_limiters.clear()
+            self._catalog_limiters.clear()
+        self._close_managers(managers)
+        try:
+            if self._owns_idempotency_store and self.idempotency_store is not None:
+                self._owns_idempotency_store = False
+                self.idempotency_store.close()
+        finally:
+            if self._owns_transport:
+                self._owns_transport = False
+                self.transport.close()
+
+    def __enter__(self) -> 'TenantManagerPool':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
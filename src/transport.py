@@ -0,0 +1,330 @@
+"""
+Trasporti HTTP intercambiabili sotto ``WhatsAppCatalogManager._make_request``.
+
+Il manager non chiama direttamente ``requests``: ogni richiesta passa da un
+``Transport``, che riceve gli stessi argomenti di ``requests.Session.request``
+e restituisce un oggetto con l'interfaccia di ``requests.Response``. Rate
+limiting, retry, circuit breaker e metriche restano nel manager e funzionano
+allo stesso modo con qualsiasi trasporto.
+
+- ``RequestsTransport`` (default): HTTP/1.1 con ``requests``, una connessione
+  TCP/TLS per ogni richiesta concorrente
+- ``HTTPXTransport``: HTTP/2 con ``httpx``; le richieste concorrenti di più
+  thread vengono multiplexate su un'unica connessione
+
+Le eccezioni di httpx vengono convertite nelle corrispondenti di ``requests``,
+così la ``RetryPolicy`` distingue nello stesso modo gli errori di connessione
+(ripetibili sempre) da quelli avvenuti dopo l'invio.
+
+Example:
+    manager = WhatsAppCatalogManager(transport=HTTPXTransport())
+    # oppure HTTP_TRANSPORT=httpx nel file .env
+
+    python examples/transport_benchmark.py  # confronto su un server h2 locale
+"""
+
+import asyncio
+import datetime
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, MutableMapping, Optional
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .config import Config
+from .metrics import InstrumentedHTTPAdapter
+from .serialization import loads
+
+try:
+    import httpx
+except ImportError:  # httpx è opzionale
+    httpx = None
+
+
+def create_session(pool_maxsize: int = 10) -> requests.Session:
+    """
+    Crea una sessione HTTP configurata per la Graph API.
+
+    Args:
+        pool_maxsize: Numero massimo di connessioni mantenute per host
+
+    Returns:
+        requests.Session: Sessione con adapter strumentato e senza retry automatici
+    """
+    session = requests.Session()
+    adapter = InstrumentedHTTPAdapter(max_retries=0, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class Transport(ABC):
+    """Interfaccia dei trasporti HTTP usati dal manager."""
+
+    name = 'base'
+
+    @property
+    @abstractmethod
+    def headers(self) -> MutableMapping[str, str]:
+        """Header inviati con ogni richiesta."""
+
+    @property
+    @abstractmethod
+    def pool_size(self) -> int:
+        """Connessioni che conviene aprire in anticipo con il warm-up."""
+
+    @abstractmethod
+    def request(self, method: str, url: str, **kwargs) -> Any:
+        """
+        Esegue una richiesta.
+
+        Args:
+            method: Metodo HTTP
+            url: URL della richiesta
+            **kwargs: Argomenti di requests.Session.request (headers, params, data,
+                timeout, stream, allow_redirects)
+
+        Returns:
+            Risposta con l'interfaccia di requests.Response
+
+        Raises:
+            requests.RequestException: Per gli errori di rete
+        """
+
+    def close(self) -> None:
+        """Chiude le connessioni."""
+
+
+class RequestsTransport(Transport):
+    """Trasporto HTTP/1.1 basato su una requests.Session."""
+
+    name = 'requests'
+
+    def __init__(self, session: Optional[requests.Session] = None, pool_maxsize: int = 10):
+        """
+        Args:
+            session: Sessione da usare (default: una nuova sessione con create_session)
+            pool_maxsize: Connessioni per host della nuova sessione
+        """
+        self.session = session or create_session(pool_maxsize=pool_maxsize)
+
+    @property
+    def headers(self) -> MutableMapping[str, str]:
+        return self.session.headers
+
+    @property
+    def pool_size(self) -> int:
+        adapter = self.session.get_adapter('https://')
+        return getattr(adapter, '_pool_maxsize', 10)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session.request(method, url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class _HTTPXRequestInfo:
+    """Sottoinsieme di requests.PreparedRequest usato dal manager (metriche)."""
+
+    __slots__ = ('method', 'url', 'body')
+
+    def __init__(self, method: str, url: str, body: Any):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class HTTPXResponse:
+    """Risposta httpx con l'interfaccia di requests.Response usata dal manager."""
+
+    def __init__(self, transport: 'HTTPXTransport', response: 'httpx.Response', body: Any, elapsed: float):
+        self._transport = transport
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.reason = response.reason_phrase
+        self.http_version = response.http_version
+        self.request = _HTTPXRequestInfo(response.request.method, self.url, body)
+        # Come in requests: tempo fino alla ricezione degli header
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def content(self) -> bytes:
+        return self._transport._run(self._response.aread())
+
+    @property
+    def text(self) -> str:
+        self._transport._run(self._response.aread())
+        return self._response.text
+
+    def json(self, **kwargs) -> Any:
+        return loads(self.content)
+
+    def iter_content(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        chunks = self._response.aiter_bytes(chunk_size)
+        while True:
+            try:
+                yield self._transport._run(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} {self.reason} per {self.url}", response=self)
+
+    def close(self) -> None:
+        self._transport._run(self._response.aclose())
+
+    def __enter__(self) -> 'HTTPXResponse':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def _to_requests_exception(error: Exception) -> requests.RequestException:
+    """Converte un'eccezione httpx nell'equivalente di requests."""
+    if isinstance(error, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return requests.ConnectTimeout(str(error))
+    if isinstance(error, httpx.ConnectError):
+        # Stessa forma di requests: la richiesta non è mai partita
+        try:
+            target = error.request.url.host
+        except RuntimeError:
+            target = 'host'
+        return requests.ConnectionError(NewConnectionError(target, str(error)))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.ReadTimeout(str(error))
+    if isinstance(error, httpx.TransportError):
+        return requests.ConnectionError(str(error))
+    return requests.RequestException(str(error))
+
+
+class HTTPXTransport(Transport):
+    """
+    Trasporto HTTP/2 basato su httpx, con multiplexing delle richieste concorrenti.
+
+    Il client sincrono di httpx non è sicuro con HTTP/2 se più thread inviano
+    richieste sulla stessa connessione (lo stato HPACK è condiviso senza lock):
+    il trasporto usa quindi un ``httpx.AsyncClient`` servito da un event loop
+    in un thread dedicato. I thread chiamanti restano sincroni e attendono il
+    proprio stream, mentre tutte le richieste condividono la stessa connessione.
+    """
+
+    name = 'httpx'
+
+    def __init__(self, http2: bool = True, max_connections: int = 10, prior_knowledge: bool = False):
+        """
+        Args:
+            http2: Se True negozia HTTP/2 (ALPN su HTTPS)
+            max_connections: Connessioni massime per host (con HTTP/2 di norma ne basta una)
+            prior_knowledge: Se True usa HTTP/2 anche su http:// senza negoziazione (h2c, es. test locali)
+
+        Raises:
+            ImportError: Se httpx (o h2 per HTTP/2) non è installato
+        """
+        if httpx is None:
+            raise ImportError("HTTPXTransport richiede httpx: pip install 'httpx[http2]'")
+        self.max_connections = max_connections
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='httpx-transport', daemon=True)
+        self._thread.start()
+        self.client = httpx.AsyncClient(
+            http1=not prior_knowledge, http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def _run(self, coroutine) -> Any:
+        """Esegue una coroutine nel loop del trasporto e ne attende il risultato."""
+        try:
+            return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+        except httpx.HTTPError as e:
+            raise _to_requests_exception(e) from e
+
+    @property
+    def headers(self) -> MutableMapping[str, str]:
+        return self.client.headers
+
+    @property
+    def pool_size(self) -> int:
+        # Con HTTP/2 una connessione trasporta tutte le richieste concorrenti
+        return 1
+
+    def request(self, method: str, url: str, **kwargs) -> HTTPXResponse:
+        body = kwargs.get('data')
+        headers: Dict[str, str] = dict(kwargs.get('headers') or {})
+        content = body
+        if body is not None and not isinstance(body, (bytes, str)):
+            # Body in streaming (es. MultipartFileBody): letto a chunk fuori dal loop
+            if hasattr(body, '__len__'):
+                headers.setdefault('Content-Length', str(len(body)))
+            content = self._read_chunks(iter(body))
+
+        timeout = kwargs.get('timeout', Config.REQUEST_TIMEOUT)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+        request = self.client.build_request(method, url, params=kwargs.get('params'), headers=headers,
+                                            content=content, timeout=timeout)
+        stream = kwargs.get('stream', False)
+        follow_redirects = kwargs.get('allow_redirects', True)
+        start = time.perf_counter()
+
+        async def send():
+            response = await self.client.send(request, stream=True, follow_redirects=follow_redirects)
+            elapsed = time.perf_counter() - start
+            if not stream:
+                try:
+                    await response.aread()
+                finally:
+                    await response.aclose()
+            return response, elapsed
+
+        response, elapsed = self._run(send())
+        return HTTPXResponse(self, response, body, elapsed)
+
+    async def _read_chunks(self, chunks: Iterator[bytes]):
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def create_transport(name: Optional[str] = None, pool_maxsize: int = 10) -> Transport:
+    """
+    Crea il trasporto indicato (default: Config.HTTP_TRANSPORT).
+
+    Args:
+        name: 'requests' oppure 'httpx'
+        pool_maxsize: Connessioni massime per host
+
+    Returns:
+        Transport: Trasporto configurato
+
+    Raises:
+        ValueError: Se il trasporto non esiste
+    """
+    name = (name or Config.HTTP_TRANSPORT).lower()
+    if name == 'requests':
+        return RequestsTransport(pool_maxsize=pool_maxsize)
+    if name == 'httpx':
+        return HTTPXTransport(max_connections=pool_maxsize)
+    raise ValueError(f"Trasporto HTTP non supportato: {name}. Validi: requests, httpx")
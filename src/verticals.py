@@ -0,0 +1,369 @@
+"""
+Registro dei vertical di catalogo Meta e dei relativi schemi.
+
+Ogni vertical (commerce, home_listings, vehicles, hotels, flights) è descritto
+da uno ``VerticalSchema``: endpoint della Graph API, campo identificativo,
+tipo di item per ``items_batch`` e regole di validazione dei campi. Le regole
+vengono compilate una sola volta in una lista di controlli, riusata da SDK,
+importer e Lambda: un nuovo vertical si aggiunge con ``register_vertical`` e
+ottiene subito batch, delta-sync e validazione senza nuovo codice di richiesta.
+
+Il modulo usa solo la libreria standard e nessun import del pacchetto, così
+può essere copiato così com'è nel layer della Lambda (vedi cloud/create_layer.py).
+
+Example:
+    schema = get_vertical('vehicles')
+    is_valid, errors = schema.validate(vehicle_data)
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+# Valori ammessi condivisi tra i vertical
+SUPPORTED_CURRENCIES = ('EUR', 'USD', 'GBP', 'JPY', 'CNY', 'CAD', 'AUD')
+PRODUCT_AVAILABILITY = ('in stock', 'out of stock', 'preorder', 'available for order', 'discontinued')
+PRODUCT_CONDITIONS = ('new', 'refurbished', 'used', 'open_box')
+HOME_LISTING_AVAILABILITY = ('for_sale', 'for_rent', 'sale_pending', 'recently_sold', 'off_market',
+                             'available_soon')
+VEHICLE_STATES = ('new', 'used', 'cpo')
+
+MAX_NAME_LENGTH = 150
+MAX_DESCRIPTION_LENGTH = 9999
+
+Check = Callable[[Dict[str, Any]], Iterable[str]]
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+def parse_amount(value: Any) -> float:
+    """
+    Converte un importo (es. "19,90 EUR" o "€ 19.90") in numero.
+
+    Raises:
+        ValueError: Se il valore non contiene un numero valido
+    """
+    amount = str(value).replace(',', '.')
+    # Rimuove simboli di valuta e spazi
+    return float(''.join(c for c in amount if c.isdigit() or c == '.'))
+
+
+def format_amount(value: Any, currency: Optional[str] = None) -> str:
+    """
+    Formatta un importo come lo vogliono items_batch e i feed (es. "19.90 EUR").
+
+    Raises:
+        ValueError: Se il valore non contiene un numero valido
+    """
+    amount = f"{parse_amount(value):.2f}"
+    return f"{amount} {currency.upper()}" if currency else amount
+
+
+class VerticalSchema:
+    """Schema di un vertical con validatore compilato alla creazione."""
+
+    def __init__(self, name: str, endpoint: str, id_field: Union[str, Tuple[str, ...]], item_type: str,
+                 required_fields: Sequence[str], optional_fields: Sequence[str] = (),
+                 nested_required: Optional[Dict[str, Sequence[str]]] = None,
+                 enums: Optional[Dict[str, Sequence[str]]] = None,
+                 max_lengths: Optional[Dict[str, int]] = None,
+                 positive_numbers: Sequence[str] = (), integers: Sequence[str] = (),
+                 ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+                 object_lists: Optional[Dict[str, str]] = None,
+                 batch_id_field: Optional[str] = None, group_errors: bool = False):
+        """
+        Args:
+            name: Nome del vertical (valore 'vertical' del catalogo)
+            endpoint: Edge del catalogo per le operazioni singole (es. 'products')
+            id_field: Campo identificativo dell'item (o tupla di campi per ID composti)
+            item_type: Tipo di item per items_batch
+            required_fields: Campi obbligatori (non vuoti)
+            optional_fields: Campi facoltativi riconosciuti
+            nested_required: Campi obbligatori degli oggetti annidati (es. address)
+            enums: Valori ammessi per campo (confronto senza distinzione di maiuscole per 'currency')
+            max_lengths: Lunghezza massima per campo testuale
+            positive_numbers: Campi numerici che devono essere maggiori di zero
+            integers: Campi che devono essere interi
+            ranges: Intervalli ammessi, anche per campi annidati ('address.latitude')
+            object_lists: Campi lista di oggetti con la chiave obbligatoria di ogni oggetto
+            batch_id_field: Campo dell'ID nei dati items_batch (default: id_field)
+            group_errors: Se True i campi mancanti sono riportati in un unico messaggio
+        """
+        self.name = name
+        self.endpoint = endpoint
+        self.id_fields = (id_field,) if isinstance(id_field, str) else tuple(id_field)
+        self.id_field = id_field
+        self.item_type = item_type
+        self.batch_id_field = batch_id_field or (id_field if isinstance(id_field, str) else None)
+        self.required_fields = tuple(required_fields)
+        self.optional_fields = tuple(optional_fields)
+        self.fields = self.required_fields + tuple(f for f in self.optional_fields if f not in self.required_fields)
+        self.nested_required = {k: tuple(v) for k, v in (nested_required or {}).items()}
+        self.enums = {k: tuple(v) for k, v in (enums or {}).items()}
+        self._checks = self._compile(max_lengths or {}, positive_numbers, integers, ranges or {},
+                                     object_lists or {}, group_errors)
+
+    def _compile(self, max_lengths: Dict[str, int], positive_numbers: Sequence[str], integers: Sequence[str],
+                 ranges: Dict[str, Tuple[float, float]], object_lists: Dict[str, str],
+                 group_errors: bool) -> List[Check]:
+        """Traduce le regole in una lista di funzioni di controllo (eseguita una volta per schema)."""
+        checks: List[Check] = []
+        required = self.required_fields
+        required_set = frozenset(required)
+
+        if group_errors:
+            def check_required(data):
+                missing = required_set.difference(k for k, v in data.items() if not _is_empty(v))
+                if missing:
+                    yield f"Campi obbligatori mancanti: {', '.join(f for f in required if f in missing)}"
+        else:
+            def check_required(data):
+                for field in required:
+                    if _is_empty(data.get(field)):
+                        yield f"Campo obbligatorio mancante: {field}"
+        checks.append(check_required)
+
+        for parent, fields in self.nested_required.items():
+            nested_set = frozenset(fields)
+
+            def check_nested(data, parent=parent, fields=fields, nested_set=nested_set):
+                value = data.get(parent)
+                if value is None:
+                    return
+                if not isinstance(value, dict):
+                    yield f"{parent} deve essere un oggetto"
+                    return
+                missing = nested_set.difference(k for k, v in value.items() if not _is_empty(v))
+                if missing:
+                    yield f"Campi {parent} obbligatori mancanti: {', '.join(f for f in fields if f in missing)}"
+            checks.append(check_nested)
+
+        for field, limit in max_lengths.items():
+            label = {'name': 'Nome troppo lungo', 'description': 'Descrizione troppo lunga',
+                     'title': 'Titolo troppo lungo'}.get(field, f"{field} troppo lungo")
+
+            def check_length(data, field=field, limit=limit, label=label):
+                value = data.get(field)
+                if isinstance(value, str) and len(value) > limit:
+                    yield f"{label}: {len(value)} caratteri (max {limit})"
+            checks.append(check_length)
+
+        for field, allowed in self.enums.items():
+            case_insensitive = field == 'currency'
+            allowed_set = frozenset(allowed)
+            label = {'currency': 'Valuta non supportata', 'availability': 'Status disponibilità non valido',
+                     'condition': 'Condizione non valida'}.get(field, f"Valore non valido per {field}")
+            valid_label = 'Supportate' if field == 'currency' else 'Validi'
+
+            def check_enum(data, field=field, allowed=allowed, allowed_set=allowed_set,
+                           case_insensitive=case_insensitive, label=label, valid_label=valid_label):
+                value = data.get(field)
+                if _is_empty(value):
+                    return
+                normalized = str(value).upper() if case_insensitive else value
+                if normalized not in allowed_set:
+                    yield f"{label}: {normalized}. {valid_label}: {', '.join(allowed)}"
+            checks.append(check_enum)
+
+        for field in positive_numbers:
+            def check_positive(data, field=field):
+                if _is_empty(data.get(field)):
+                    return
+                try:
+                    number = parse_amount(data[field])
+                except ValueError:
+                    yield f"Formato prezzo non valido: {data[field]}" if field == 'price' \
+                        else f"{field} non numerico: {data[field]}"
+                    return
+                if number <= 0:
+                    yield "Il prezzo deve essere maggiore di zero" if field == 'price' \
+                        else f"{field} deve essere maggiore di zero"
+            checks.append(check_positive)
+
+        for field in integers:
+            def check_integer(data, field=field):
+                if _is_empty(data.get(field)):
+                    return
+                try:
+                    int(data[field])
+                except (TypeError, ValueError):
+                    yield f"{field} non valido: {data[field]}"
+            checks.append(check_integer)
+
+        for path, (low, high) in ranges.items():
+            parent, _, field = path.rpartition('.')
+
+            def check_range(data, parent=parent, field=field, low=low, high=high):
+                container = data.get(parent) if parent else data
+                if not isinstance(container, dict) or _is_empty(container.get(field)):
+                    return
+                try:
+                    number = float(container[field])
+                except (TypeError, ValueError):
+                    yield f"{field} non numerica: {container[field]}"
+                    return
+                if not low <= number <= high:
+                    yield f"{field} fuori intervallo: {container[field]}"
+            checks.append(check_range)
+
+        for field, key in object_lists.items():
+            def check_objects(data, field=field, key=key):
+                value = data.get(field)
+                if value is None:
+                    return
+                if not isinstance(value, list) or not all(isinstance(i, dict) and i.get(key) for i in value):
+                    yield f"{field} deve essere una lista di oggetti {{\"{key}\": ...}}"
+            checks.append(check_objects)
+
+        return checks
+
+    def validate(self, data: Dict[str, Any]) -> Tuple[bool, List[str]]:
+        """
+        Valida i dati di un item.
+
+        Args:
+            data: Dati dell'item
+
+        Returns:
+            tuple: (is_valid: bool, errors: list[str])
+        """
+        errors = [error for check in self._checks for error in check(data)]
+        return len(errors) == 0, errors
+
+    def validate_many(self, items: Iterable[Any]) -> List[Tuple[bool, List[str]]]:
+        """Valida molti item (dizionari o modelli con to_dict) con lo stesso validatore compilato."""
+        validate = self.validate
+        return [validate(item if isinstance(item, dict) else item.to_dict()) for item in items]
+
+    def item_id(self, data: Dict[str, Any]) -> str:
+        """ID dell'item (per ID composti i valori sono uniti da ':')."""
+        return ':'.join(str(data.get(field)) for field in self.id_fields)
+
+    def id_data(self, item_id: str) -> Dict[str, str]:
+        """Campi identificativi per items_batch a partire dall'ID (es. per DELETE)."""
+        if self.batch_id_field:
+            return {self.batch_id_field: item_id}
+        return dict(zip(self.id_fields, item_id.split(':', len(self.id_fields) - 1)))
+
+    def __repr__(self) -> str:
+        return f"VerticalSchema(name='{self.name}', item_type='{self.item_type}')"
+
+
+_REGISTRY: Dict[str, VerticalSchema] = {}
+
+
+def register_vertical(schema: VerticalSchema) -> VerticalSchema:
+    """
+    Registra (o sostituisce) lo schema di un vertical.
+
+    Args:
+        schema: Schema del vertical
+
+    Returns:
+        VerticalSchema: Lo schema registrato
+    """
+    _REGISTRY[schema.name] = schema
+    return schema
+
+
+def get_vertical(name: Optional[str]) -> VerticalSchema:
+    """
+    Restituisce lo schema di un vertical ('commerce' se name è vuoto).
+
+    Raises:
+        ValueError: Se il vertical non è registrato
+    """
+    schema = _REGISTRY.get(name or 'commerce')
+    if schema is None:
+        raise ValueError(f"Vertical non supportato: {name}. Registrati: {', '.join(sorted(_REGISTRY))}")
+    return schema
+
+
+def registered_verticals() -> List[str]:
+    """Nomi dei vertical registrati."""
+    return sorted(_REGISTRY)
+
+
+_ADDRESS_FIELDS = ('addr1', 'city', 'region', 'country', 'postal_code')
+
+COMMERCE = register_vertical(VerticalSchema(
+    name='commerce',
+    endpoint='products',
+    id_field='retailer_id',
+    batch_id_field='id',
+    item_type='PRODUCT_ITEM',
+    required_fields=('retailer_id', 'name', 'description', 'price', 'currency', 'availability', 'condition'),
+    optional_fields=('brand', 'category', 'image_url', 'additional_image_urls', 'url', 'size', 'color',
+                     'material', 'pattern', 'gender', 'age_group', 'inventory', 'sale_price',
+                     'sale_price_effective_date'),
+    max_lengths={'name': MAX_NAME_LENGTH, 'description': MAX_DESCRIPTION_LENGTH},
+    enums={'currency': SUPPORTED_CURRENCIES, 'availability': PRODUCT_AVAILABILITY,
+           'condition': PRODUCT_CONDITIONS},
+    positive_numbers=('price',),
+))
+
+HOME_LISTINGS = register_vertical(VerticalSchema(
+    name='home_listings',
+    endpoint='home_listings',
+    id_field='home_listing_id',
+    item_type='HOME_LISTING',
+    required_fields=('home_listing_id', 'name', 'description', 'price', 'currency', 'url', 'address',
+                     'images', 'availability', 'year_built'),
+    optional_fields=('num_beds', 'num_baths', 'num_rooms', 'property_type', 'listing_type', 'area_size',
+                     'area_unit'),
+    nested_required={'address': ('street_address', 'city', 'region', 'country', 'postal_code',
+                                 'latitude', 'longitude')},
+    enums={'currency': SUPPORTED_CURRENCIES, 'availability': HOME_LISTING_AVAILABILITY},
+    positive_numbers=('price',),
+    integers=('year_built',),
+    ranges={'address.latitude': (-90, 90), 'address.longitude': (-180, 180)},
+    object_lists={'images': 'image_url'},
+    group_errors=True,
+))
+
+VEHICLES = register_vertical(VerticalSchema(
+    name='vehicles',
+    endpoint='vehicles',
+    id_field='vehicle_id',
+    item_type='VEHICLE',
+    required_fields=('vehicle_id', 'title', 'description', 'url', 'make', 'model', 'year', 'mileage',
+                     'images', 'price', 'currency', 'state_of_vehicle', 'address'),
+    optional_fields=('body_style', 'exterior_color', 'interior_color', 'fuel_type', 'transmission',
+                     'drivetrain', 'trim', 'vin', 'condition', 'availability'),
+    nested_required={'address': _ADDRESS_FIELDS, 'mileage': ('value', 'unit')},
+    enums={'currency': SUPPORTED_CURRENCIES, 'state_of_vehicle': VEHICLE_STATES},
+    max_lengths={'title': MAX_NAME_LENGTH, 'description': MAX_DESCRIPTION_LENGTH},
+    positive_numbers=('price',),
+    integers=('year',),
+    object_lists={'images': 'url'},
+    group_errors=True,
+))
+
+HOTELS = register_vertical(VerticalSchema(
+    name='hotels',
+    endpoint='hotels',
+    id_field='hotel_id',
+    item_type='HOTEL',
+    required_fields=('hotel_id', 'name', 'description', 'url', 'address', 'latitude', 'longitude', 'images'),
+    optional_fields=('brand', 'star_rating', 'base_price', 'currency', 'phone', 'guest_ratings',
+                     'neighborhood'),
+    nested_required={'address': _ADDRESS_FIELDS},
+    enums={'currency': SUPPORTED_CURRENCIES},
+    max_lengths={'name': MAX_NAME_LENGTH, 'description': MAX_DESCRIPTION_LENGTH},
+    ranges={'latitude': (-90, 90), 'longitude': (-180, 180), 'star_rating': (0, 5)},
+    object_lists={'images': 'url'},
+    group_errors=True,
+))
+
+FLIGHTS = register_vertical(VerticalSchema(
+    name='flights',
+    endpoint='flights',
+    id_field=('origin_airport', 'destination_airport'),
+    item_type='FLIGHT',
+    required_fields=('origin_airport', 'destination_airport', 'description', 'url', 'images'),
+    optional_fields=('origin_city', 'destination_city', 'price', 'currency', 'one_way_price'),
+    enums={'currency': SUPPORTED_CURRENCIES},
+    object_lists={'images': 'url'},
+    group_errors=True,
+))
@@ -0,0 +1,502 @@
+"""
+Ricezione dei webhook WhatsApp (messaggi, ordini, stati di consegna).
+
+Il percorso di ricezione fa solo il minimo indispensabile prima di rispondere
+a Meta: verifica della firma ``X-Hub-Signature-256`` in tempo costante,
+decodifica del payload con ``serialization.loads`` e inserimento degli eventi
+in una coda asyncio. Gli handler vengono eseguiti dai worker della coda,
+quindi un handler lento non ritarda l'ack del webhook neanche sotto carico.
+
+Le righe degli ordini vengono arricchite con i dati dei prodotti tramite
+``ProductCache``: i prodotti mancanti sono letti con una sola chiamata
+``get_products`` (richiesta batch) invece di un ``get_product`` per riga.
+
+Sono disponibili due punti di ingresso:
+
+- ``WebhookApp`` è un'applicazione ASGI (uvicorn, hypercorn, ...)
+- ``WebhookApp.lambda_handler`` gestisce gli eventi API Gateway di AWS Lambda
+
+Example:
+    dispatcher = WebhookDispatcher(product_cache=ProductCache(manager))
+
+    @dispatcher.on('order')
+    async def handle_order(event):
+        for line in event['data']['order']['product_items']:
+            print(line['product_retailer_id'], line.get('product', {}).get('name'))
+
+    app = WebhookApp(dispatcher)  # uvicorn module:app
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+from .config import Config, logger
+from .deadline import Deadline, use_deadline
+from .scheduler import INTERACTIVE, use_lane
+from .serialization import dumps, loads
+
+
+Handler = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+SIGNATURE_HEADER = 'x-hub-signature-256'
+
+
+def verify_signature(app_secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """
+    Verifica la firma HMAC-SHA256 di un webhook Meta in tempo costante.
+
+    Args:
+        app_secret: App secret dell'app Meta
+        body: Body della richiesta così come ricevuto (bytes non decodificati)
+        signature: Valore dell'header X-Hub-Signature-256 ("sha256=<hex>")
+
+    Returns:
+        bool: True se la firma è valida
+    """
+    if not app_secret or not signature:
+        return False
+    expected = 'sha256=' + hmac.new(app_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected.encode('ascii'), signature.strip().encode('utf-8', 'replace'))
+
+
+def parse_events(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Estrae gli eventi da un payload webhook di WhatsApp Business.
+
+    Ogni messaggio e ogni aggiornamento di stato diventa un evento con 'type'
+    (tipo del messaggio, es. 'order' o 'text', oppure 'status'), 'field',
+    'data' (il messaggio o lo stato), 'metadata' e 'contacts'. Le altre
+    modifiche sono riportate con il nome del campo come tipo.
+
+    Args:
+        payload: Payload decodificato ({'object': ..., 'entry': [...]})
+
+    Returns:
+        list: Eventi nell'ordine in cui compaiono nel payload
+    """
+    events = []
+    for entry in payload.get('entry') or []:
+        for change in entry.get('changes') or []:
+            field = change.get('field')
+            value = change.get('value') or {}
+            common = {'field': field, 'entry_id': entry.get('id'), 'metadata': value.get('metadata') or {},
+                      'contacts': value.get('contacts') or []}
+            found = False
+            for message in value.get('messages') or []:
+                events.append({'type': message.get('type', 'unknown'), 'data': message, **common})
+                found = True
+            for status in value.get('statuses') or []:
+                events.append({'type': 'status', 'data': status, **common})
+                found = True
+            if not found:
+                events.append({'type': field or 'unknown', 'data': value, **common})
+    return events
+
+
+class ProductCache:
+    """Cache locale (LRU con TTL) dei prodotti del catalogo per l'arricchimento degli ordini."""
+
+    def __init__(self, manager, ttl_seconds: float = 300.0, max_size: int = 10000,
+                 fields: Optional[List[str]] = None):
+        """
+        Args:
+            manager: WhatsAppCatalogManager usato per leggere i prodotti mancanti
+            ttl_seconds: Durata di validità di un prodotto in cache
+            max_size: Numero massimo di prodotti in cache (i meno usati vengono rimossi)
+            fields: Campi da richiedere per i prodotti (default: campi di default dell'API)
+        """
+        self.manager = manager
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.fields = fields
+        self._cache: 'OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, retailer_id: str, product: Optional[Dict[str, Any]]) -> None:
+        self._cache[retailer_id] = (product, time.monotonic() + self.ttl_seconds)
+        self._cache.move_to_end(retailer_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def prime(self, products: Iterable[Dict[str, Any]]) -> None:
+        """
+        Precarica la cache (es. all'avvio o da un export del catalogo).
+
+        Args:
+            products: Prodotti con 'retailer_id'
+        """
+        with self._lock:
+            for product in products:
+                self._store(str(product['retailer_id']), product)
+
+    def invalidate(self, retailer_id: Optional[str] = None) -> None:
+        """
+        Rimuove un prodotto dalla cache (o tutti se retailer_id è None).
+
+        Args:
+            retailer_id: ID del prodotto da rimuovere
+        """
+        with self._lock:
+            if retailer_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(retailer_id), None)
+
+    def get_many(self, retailer_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Restituisce i prodotti richiesti, leggendo i mancanti con un'unica richiesta batch.
+
+        Args:
+            retailer_ids: ID dei prodotti
+
+        Returns:
+            dict: Prodotto per ID (None se il prodotto non esiste o non è leggibile)
+        """
+        requested = list(dict.fromkeys(str(rid) for rid in retailer_ids))
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for retailer_id in requested:
+                cached = self._cache.get(retailer_id)
+                if cached is not None and cached[1] > now:
+                    self._cache.move_to_end(retailer_id)
+                    found[retailer_id] = cached[0]
+                else:
+                    missing.append(retailer_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            # Lookup per un ordine in arrivo: precede il traffico bulk nello scheduler
+            with use_lane(INTERACTIVE):
+                results = self.manager.get_products(missing, fields=self.fields)
+            with self._lock:
+                for result in results:
+                    retailer_id = str(result['retailer_id'])
+                    if result['success']:
+                        found[retailer_id] = result['result']
+                        self._store(retailer_id, result['result'])
+                    else:
+                        # Gli errori non vengono messi in cache: il prossimo ordine riprova
+                        logger.warning("Prodotto %s non disponibile per l'arricchimento: %s",
+                                       retailer_id, result.get('error'))
+                        found[retailer_id] = None
+        return found
+
+
+class WebhookDispatcher:
+    """Smista gli eventi webhook agli handler registrati tramite una coda asyncio."""
+
+    def __init__(self, product_cache: Optional[ProductCache] = None, workers: int = 4,
+                 max_queue_size: int = 10000):
+        """
+        Args:
+            product_cache: Cache usata per arricchire le righe degli ordini (None = nessun arricchimento)
+            workers: Numero di worker che eseguono gli handler
+            max_queue_size: Eventi massimi in attesa; oltre il limite i webhook ricevono 503
+                e Meta li ritrasmette
+        """
+        self.product_cache = product_cache
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+
+    def on(self, event_type: str) -> Callable[[Handler], Handler]:
+        """
+        Decoratore che registra un handler per un tipo di evento ('*' = tutti).
+
+        Gli handler possono essere funzioni normali (eseguite in un thread) o coroutine.
+
+        Args:
+            event_type: Tipo di evento (es. 'order', 'text', 'status')
+        """
+        def register(handler: Handler) -> Handler:
+            self.add_handler(event_type, handler)
+            return handler
+        return register
+
+    def add_handler(self, event_type: str, handler: Handler) -> None:
+        """
+        Registra un handler per un tipo di evento ('*' = tutti).
+
+        Args:
+            event_type: Tipo di evento
+            handler: Funzione o coroutine che riceve l'evento
+        """
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def start(self) -> None:
+        """Crea la coda e avvia i worker nel loop corrente."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [asyncio.create_task(self._worker(), name=f'webhook-worker-{i}')
+                       for i in range(self.workers)]
+
+    async def stop(self, drain: bool = True) -> None:
+        """
+        Ferma i worker.
+
+        Args:
+            drain: Se True attende prima l'elaborazione degli eventi in coda
+        """
+        if self._queue is not None and drain:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        Mette in coda gli eventi senza attendere gli handler.
+
+        Args:
+            events: Eventi da elaborare
+
+        Returns:
+            bool: False se la coda non ha spazio per tutti gli eventi (nessuno viene accodato)
+        """
+        if self._queue is None:
+            raise RuntimeError("WebhookDispatcher non avviato: chiamare start() nel loop dell'app")
+        if self._queue.maxsize and self._queue.qsize() + len(events) > self._queue.maxsize:
+            logger.warning("Coda webhook piena (%s eventi in attesa): richiesta rifiutata", self._queue.qsize())
+            return False
+        for event in events:
+            self._queue.put_nowait(event)
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self._queue.get()
+            try:
+                await self.handle(event)
+            finally:
+                self._queue.task_done()
+
+    async def dispatch(self, events: List[Dict[str, Any]]) -> None:
+        """
+        Elabora subito gli eventi in parallelo (senza coda), es. in una Lambda.
+
+        Args:
+            events: Eventi da elaborare
+        """
+        await asyncio.gather(*(self.handle(event) for event in events))
+
+    async def handle(self, event: Dict[str, Any]) -> None:
+        """
+        Arricchisce l'evento (se è un ordine) e lo passa agli handler registrati.
+
+        Gli errori degli handler vengono registrati nel log senza interrompere gli altri.
+
+        Args:
+            event: Evento prodotto da parse_events
+        """
+        handlers = self._handlers.get(event['type'], []) + self._handlers.get('*', [])
+        if not handlers:
+            return
+        if event['type'] == 'order' and self.product_cache is not None:
+            try:
+                await self._enrich_order(event)
+            except Exception as e:
+                logger.error("Errore nell'arricchimento dell'ordine %s: %s", event['data'].get('id'), e)
+
+        for handler in handlers:
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(event)
+                else:
+                    await asyncio.to_thread(handler, event)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error("Errore nell'handler %s per l'evento %s: %s",
+                             getattr(handler, '__name__', handler), event['type'], e)
+
+    async def _enrich_order(self, event: Dict[str, Any]) -> None:
+        """Aggiunge 'product' a ogni riga dell'ordine leggendo i prodotti dalla cache."""
+        items = (event['data'].get('order') or {}).get('product_items') or []
+        retailer_ids = [item['product_retailer_id'] for item in items if item.get('product_retailer_id')]
+        if not retailer_ids:
+            return
+        # La cache può dover leggere dall'API: la chiamata bloccante resta fuori dal loop
+        products = await asyncio.to_thread(self.product_cache.get_many, retailer_ids)
+        for item in items:
+            item['product'] = products.get(str(item.get('product_retailer_id')))
+
+
+class WebhookApp:
+    """Applicazione ASGI (e handler Lambda) che riceve i webhook e li passa al dispatcher."""
+
+    def __init__(self, dispatcher: WebhookDispatcher, app_secret: Optional[str] = None,
+                 verify_token: Optional[str] = None, path: str = '/webhook',
+                 lambda_timeout_seconds: float = 10.0):
+        """
+        Args:
+            dispatcher: Dispatcher degli eventi
+            app_secret: App secret per la verifica delle firme (default: Config.META_APP_SECRET)
+            verify_token: Token della verifica dell'iscrizione (default: Config.META_WEBHOOK_VERIFY_TOKEN)
+            path: Percorso HTTP del webhook (solo ASGI)
+            lambda_timeout_seconds: Tempo massimo di elaborazione degli eventi in una Lambda
+                prima di rispondere 503 (Meta ritrasmette il webhook)
+        """
+        self.dispatcher = dispatcher
+        self.app_secret = app_secret if app_secret is not None else Config.META_APP_SECRET
+        self.verify_token = verify_token if verify_token is not None else Config.META_WEBHOOK_VERIFY_TOKEN
+        self.path = path
+        self.lambda_timeout_seconds = lambda_timeout_seconds
+        self._started = False
+
+    def verify_subscription(self, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """
+        Risponde alla verifica dell'iscrizione (GET con hub.mode, hub.verify_token, hub.challenge).
+
+        Returns:
+            tuple: (status HTTP, body)
+        """
+        if (params.get('hub.mode') == 'subscribe' and self.verify_token
+                and hmac.compare_digest(params.get('hub.verify_token', '').encode('utf-8'),
+                                        self.verify_token.encode('utf-8'))):
+            return 200, params.get('hub.challenge', '').encode('utf-8')
+        return 403, b'Forbidden'
+
+    def parse_request(self, body: bytes, signature: Optional[str]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Verifica la firma e decodifica il payload.
+
+        Returns:
+            tuple: (status HTTP, eventi); gli eventi sono vuoti se lo status non è 200
+        """
+        if not verify_signature(self.app_secret, body, signature):
+            logger.warning("Webhook con firma non valida rifiutato")
+            return 403, []
+        try:
+            payload = loads(body)
+        except ValueError:
+            logger.warning("Webhook con payload JSON non valido rifiutato")
+            return 400, []
+        return 200, parse_events(payload) if isinstance(payload, dict) else []
+
+    # --- ASGI -------------------------------------------------------------
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if not self._started:
+            # Server senza eventi lifespan: i worker partono alla prima richiesta
+            await self.dispatcher.start()
+            self._started = True
+
+        if scope['path'].rstrip('/') != self.path.rstrip('/'):
+            await self._respond(send, 404, b'Not Found')
+            return
+
+        if scope['method'] == 'GET':
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            status, body = self.verify_subscription({key: values[0] for key, values in query.items()})
+            await self._respond(send, status, body)
+            return
+        if scope['method'] != 'POST':
+            await self._respond(send, 405, b'Method Not Allowed')
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+
+        status, events = self.parse_request(b''.join(chunks), headers.get(SIGNATURE_HEADER))
+        if status == 200 and events and not self.dispatcher.enqueue(events):
+            status = 503
+        await self._respond(send, status, b'OK' if status == 200 else b'')
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.dispatcher.start()
+                self._started = True
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispatcher.stop()
+                self._started = False
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _respond(send, status: int, body: bytes) -> None:
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # --- AWS Lambda -------------------------------------------------------
+
+    def lambda_handler(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        """
+        Handler per gli eventi API Gateway (REST v1 e HTTP v2).
+
+        Una Lambda non può continuare a lavorare dopo la risposta: gli eventi
+        vengono elaborati in parallelo prima di rispondere, entro
+        ``lambda_timeout_seconds`` (e comunque entro il tempo rimasto alla Lambda).
+        Se il tempo non basta la risposta è 503 e Meta ritrasmette il webhook,
+        quindi gli handler devono essere idempotenti (es. sull'ID del messaggio).
+
+        Args:
+            event: Evento API Gateway
+            context: Contesto della Lambda
+
+        Returns:
+            dict: Risposta per API Gateway
+        """
+        method = event.get('httpMethod') or (event.get('requestContext') or {}).get('http', {}).get('method')
+        if method == 'GET':
+            status, body = self.verify_subscription(event.get('queryStringParameters') or {})
+            return {'statusCode': status, 'body': body.decode('utf-8')}
+
+        raw_body = event.get('body') or ''
+        body = base64.b64decode(raw_body) if event.get('isBase64Encoded') else raw_body.encode('utf-8')
+        headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+        status, events = self.parse_request(body, headers.get(SIGNATURE_HEADER))
+
+        if status == 200 and events:
+            # La scadenza più vicina tra lambda_timeout_seconds e il tempo rimasto alla Lambda
+            # (meno il margine per la risposta) vale anche per le chiamate del manager negli handler
+            with use_deadline(Deadline.from_lambda_context(context)), \
+                    use_deadline(self.lambda_timeout_seconds) as deadline:
+                timeout = deadline.remaining()
+                # Loop dedicato: allo scadere non si attende la fine degli handler sincroni nei thread
+                loop = asyncio.new_event_loop()
+                executor = ThreadPoolExecutor(max_workers=self.dispatcher.workers)
+                loop.set_default_executor(executor)
+                try:
+                    loop.run_until_complete(asyncio.wait_for(self.dispatcher.dispatch(events),
+                                                             timeout=max(timeout, 0.1)))
+                except asyncio.TimeoutError:
+                    logger.error("Elaborazione di %s eventi webhook non conclusa entro %.1f secondi",
+                                 len(events), timeout)
+                    status = 503
+                finally:
+                    executor.shutdown(wait=False)
+                    loop.close()
+        return {'statusCode': status, 'body': dumps({'success': status == 200}).decode('utf-8')}
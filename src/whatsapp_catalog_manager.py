@@ -5,56 +5,153 @@ Questo modulo fornisce un'interfaccia completa per interagire con l'API Graph di
 per gestire cataloghi WhatsApp Business, inclusi prodotti e messaggistica.
 """
 
+import gzip
 import json
+import logging
+import threading
 import time
-from typing import Dict, List, Optional, Union, Any
-from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union, Any
+from urllib.parse import quote, urljoin, urlsplit
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
-from .config import Config, ProductValidationRules, logger
+from .circuit_breaker import DEFAULT_CIRCUIT_BREAKERS, CircuitBreakerGroup
+from .config import Config, HomeListingValidationRules, ProductValidationRules, logger
+from .deadline import Deadline, current_deadline, decode_continuation, encode_continuation, use_deadline
+from .delta_sync import DeltaSync
+from .dns_cache import DEFAULT_DNS_CACHE
+from .exceptions import CircuitOpenError, DeadlineExceeded, DuplicateMessageError, MetaAPIException
+from .feeds import MultipartFileBody
+from .idempotency import SENT, IdempotencyStore, create_idempotency_store, message_key
+from .image_preflight import ImagePreflight
+from .metrics import NOOP_METRICS, MetricsHook, NoOpMetrics, collect_phase_timings, start_phase_capture
+from .models import HomeListing, Product
+from .retry import IDEMPOTENT_METHODS, RetryPolicy, possibly_processed
+from .scheduler import BULK, INTERACTIVE, PriorityScheduler, current_lane, use_lane
+from .serialization import JSONArrayStream, dumps, loads
+# create_session è riesportata per compatibilità con il codice che la importava da qui
+from .transport import RequestsTransport, Transport, create_session, create_transport
+from .verticals import COMMERCE, HOME_LISTINGS, VerticalSchema, format_amount, get_vertical, parse_amount
+from .write_behind import WriteBehindBuffer
 
 
-class MetaAPIException(Exception):
-    """Eccezione personalizzata per errori dell'API Meta."""
-    
-    def __init__(self, message: str, status_code: Optional[int] = None, response_data: Optional[dict] = None):
-        self.message = message
-        self.status_code = status_code
-        self.response_data = response_data
-        super().__init__(self.message)
+# Numero massimo di sotto-richieste in una richiesta batch della Graph API
+GRAPH_BATCH_MAX_SIZE = 50
+
+# Numero massimo di item per chiamata all'endpoint items_batch del catalogo
+ITEMS_BATCH_MAX_SIZE = 5000
+
+# Proiezioni predefinite per il parametro fields delle letture, per tipo di oggetto:
+# 'ids' per i job di sincronizzazione, 'pricing' per prezzi e disponibilità, 'full' per tutti i campi
+FIELD_PRESETS: Dict[str, Dict[str, Sequence[str]]] = {
+    'product': {
+        'ids': ('id', 'retailer_id'),
+        'pricing': ('id', 'retailer_id', 'price', 'sale_price', 'currency', 'availability', 'inventory'),
+        'full': ('id',) + tuple(f for f in COMMERCE.fields if f != 'sale_price_effective_date'),
+    },
+    'home_listing': {
+        'ids': ('id', 'home_listing_id'),
+        'pricing': ('id', 'home_listing_id', 'price', 'currency', 'availability'),
+        'full': ('id',) + HOME_LISTINGS.fields,
+    },
+    'catalog': {
+        'ids': ('id',),
+        'full': ('id', 'name', 'product_count', 'vertical', 'business', 'da_display_settings'),
+    },
+    'feed': {
+        'ids': ('id',),
+        'full': ('id', 'name', 'schedule', 'product_count', 'latest_upload'),
+    },
+}
+
+# Campi dei metodi che finora richiedevano campi fissi (restano il default)
+DEFAULT_CATALOG_FIELDS = 'id,name,product_count,vertical'
+DEFAULT_FEED_FIELDS = 'id,name'
+DEFAULT_UPLOAD_SESSION_FIELDS = ('id,start_time,end_time,url,error_count,warning_count,'
+                                 'num_detected_items,num_invalid_items,num_persisted_items')
+
+Fields = Union[str, Sequence[str]]
+
+
+def resolve_fields(fields: Optional[Fields], kind: str = 'product') -> Optional[str]:
+    """
+    Converte una proiezione nel valore del parametro fields della Graph API.
+    
+    Args:
+        fields: Nome di un preset ('ids', 'pricing', 'full'), elenco di campi
+            separati da virgola oppure lista di campi (None = campi di default dell'API)
+        kind: Tipo di oggetto dei preset ('product', 'home_listing', 'catalog', 'feed')
+        
+    Returns:
+        str: Campi separati da virgola, oppure None
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        preset = FIELD_PRESETS.get(kind, {}).get(fields)
+        return ','.join(preset) if preset is not None else fields
+    return ','.join(fields)
 
 
 class RateLimiter:
-    """Gestisce il rate limiting per le chiamate API."""
+    """Gestisce il rate limiting per le chiamate API (thread-safe, condivisibile tra manager)."""
     
     def __init__(self, max_requests_per_hour: int = 180):
         self.max_requests = max_requests_per_hour
         self.requests_made = 0
         self.reset_time = time.time() + 3600  # 1 ora da ora
+        self._lock = threading.Lock()
     
     def wait_if_needed(self) -> None:
         """Aspetta se necessario per rispettare il rate limit."""
-        current_time = time.time()
-        
-        # Reset del contatore ogni ora
-        if current_time >= self.reset_time:
-            self.requests_made = 0
-            self.reset_time = current_time + 3600
-        
-        # Se abbiamo raggiunto il limite, aspetta
-        if self.requests_made >= self.max_requests:
-            sleep_time = self.reset_time - current_time
-            if sleep_time > 0:
-                logger.warning(f"Rate limit raggiunto. Aspetto {sleep_time:.2f} secondi...")
-                time.sleep(sleep_time)
-                self.requests_made = 0
-                self.reset_time = time.time() + 3600
-    
-    def record_request(self) -> None:
-        """Registra una richiesta effettuata."""
-        self.requests_made += 1
+        while True:
+            with self._lock:
+                current_time = time.time()
+                
+                # Reset del contatore ogni ora
+                if current_time >= self.reset_time:
+                    self.requests_made = 0
+                    self.reset_time = current_time + 3600
+                
+                if self.requests_made < self.max_requests:
+                    return
+                sleep_time = self.reset_time - current_time
+            
+            # Limite raggiunto: aspetta fuori dal lock, poi ricontrolla
+            logger.warning("Rate limit raggiunto. Aspetto %.2f secondi...", sleep_time)
+            time.sleep(sleep_time)
+    
+    def record_request(self, count: int = 1) -> None:
+        """
+        Registra una richiesta effettuata.
+        
+        Args:
+            count: Chiamate da conteggiare (una batch Graph API vale quanto le sue sotto-richieste)
+        """
+        with self._lock:
+            self.requests_made += count
+
+
+class CompositeRateLimiter:
+    """
+    Applica più rate limiter insieme (es. globale, per token, per catalogo).
+    
+    Espone la stessa interfaccia di RateLimiter: una richiesta parte solo
+    quando tutti i limiter lo consentono e viene registrata su ciascuno.
+    """
+    
+    def __init__(self, *limiters: RateLimiter):
+        self.limiters = limiters
+    
+    def wait_if_needed(self) -> None:
+        """Aspetta finché tutti i limiter consentono una nuova richiesta."""
+        for limiter in self.limiters:
+            limiter.wait_if_needed()
+    
+    def record_request(self, count: int = 1) -> None:
+        """Registra la richiesta su tutti i limiter."""
+        for limiter in self.limiters:
+            limiter.record_request(count)
 
 
 class WhatsAppCatalogManager:
@@ -69,7 +166,16 @@ class WhatsAppCatalogManager:
     """
     
     def __init__(self, access_token: Optional[str] = None, catalog_id: Optional[str] = None, 
-                 phone_number_id: Optional[str] = None):
+                 phone_number_id: Optional[str] = None, metrics: Optional[MetricsHook] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breakers: Optional[CircuitBreakerGroup] = None,
+                 session: Optional[requests.Session] = None,
+                 rate_limiter: Optional[Union[RateLimiter, CompositeRateLimiter]] = None,
+                 warmup_connections: Optional[int] = None,
+                 transport: Optional[Transport] = None,
+                 gzip_min_bytes: Optional[int] = None,
+                 scheduler: Optional[PriorityScheduler] = None,
+                 idempotency_store: Optional[IdempotencyStore] = None):
         """
         Inizializza il manager del catalogo WhatsApp Business.
         
@@ -77,6 +183,20 @@ class WhatsAppCatalogManager:
             access_token: Token di accesso Meta (usa quello in .env se non specificato)
             catalog_id: ID del catalogo (usa quello in .env se non specificato)
             phone_number_id: ID del numero WhatsApp (usa quello in .env se non specificato)
+            metrics: Hook per metriche e tracing (default: nessuna metrica)
+            retry_policy: Politica di retry (default: RetryPolicy con budget condiviso)
+            circuit_breakers: Circuit breaker per classe di endpoint (default: condivisi dal processo)
+            session: Sessione HTTP condivisa (default: una nuova sessione dedicata al manager)
+            transport: Trasporto HTTP condiviso, alternativo a session (default: HTTP_TRANSPORT)
+            gzip_min_bytes: Dimensione oltre la quale i body delle scritture batch vengono
+                compressi con gzip (default: REQUEST_GZIP_MIN_BYTES, 0 = mai)
+            rate_limiter: Rate limiter condiviso (default: uno dedicato con MAX_REQUESTS_PER_HOUR)
+            warmup_connections: Connessioni da aprire subito con warmup() (default:
+                WARMUP_CONNECTIONS, 0 = nessun warm-up)
+            scheduler: Scheduler a priorità tra traffico interattivo e bulk, condivisibile tra
+                manager (default: uno dedicato se SCHEDULER_MAX_CONCURRENCY > 0, altrimenti nessuno)
+            idempotency_store: Chiavi di idempotenza per la de-duplicazione dei messaggi (default:
+                uno store in memoria se MESSAGE_DEDUP_TTL > 0, su MESSAGE_DEDUP_DB se impostato)
         """
         self.config = Config()
         self.access_token = access_token or self.config.META_ACCESS_TOKEN
@@ -89,29 +209,119 @@ class WhatsAppCatalogManager:
             raise ValueError("Access token è richiesto. Forniscilo nel costruttore o nel file .env")
         
         # Rate limiter
-        self.rate_limiter = RateLimiter(self.config.MAX_REQUESTS_PER_HOUR)
+        self.rate_limiter = rate_limiter or RateLimiter(self.config.MAX_REQUESTS_PER_HOUR)
+        
+        # Scheduler a priorità davanti al trasporto (None = richieste ammesse in ordine di arrivo)
+        if scheduler is None and self.config.SCHEDULER_MAX_CONCURRENCY > 0:
+            scheduler = PriorityScheduler()
+        self.scheduler = scheduler
         
-        # Configura session HTTP con retry automatico
-        self.session = requests.Session()
-        retry_strategy = Retry(
-            total=self.config.MAX_RETRIES,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"],
-            backoff_factor=self.config.RETRY_DELAY
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        # Strumentazione (il no-op evita qualsiasi lavoro extra sul percorso caldo)
+        self.metrics = metrics or NOOP_METRICS
+        self._metrics_enabled = not isinstance(self.metrics, NoOpMetrics)
         
-        logger.info(f"WhatsAppCatalogManager inizializzato con catalog_id: {self.catalog_id}")
+        # Politica di retry: i tentativi sono gestiti da _make_request, non dall'adapter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breakers = circuit_breakers or DEFAULT_CIRCUIT_BREAKERS
+        
+        # Trasporto HTTP (una sessione o un trasporto iniettati sono condivisi e gestiti da chi li fornisce)
+        self._owns_session = session is None and transport is None
+        if transport is None:
+            transport = RequestsTransport(session) if session is not None else create_transport()
+        self.transport = transport
+        # Sessione requests sottostante (None con trasporti non basati su requests)
+        self.session = getattr(transport, 'session', None)
+        self._install_headers()
+        
+        # Compressione dei body delle scritture batch (Content-Encoding: gzip)
+        self.gzip_min_bytes = self.config.REQUEST_GZIP_MIN_BYTES if gzip_min_bytes is None else gzip_min_bytes
+        
+        # De-duplicazione dei messaggi inviati (None = ogni chiamata invia il messaggio)
+        self._owns_idempotency_store = idempotency_store is None
+        if idempotency_store is None:
+            idempotency_store = create_idempotency_store()
+        self.idempotency_store = idempotency_store
+        
+        # Buffer write-behind per gli aggiornamenti (disattivato di default, vedi enable_write_behind)
+        self.write_behind: Optional[WriteBehindBuffer] = None
+        
+        logger.info("WhatsAppCatalogManager inizializzato con catalog_id: %s", self.catalog_id)
+        
+        if warmup_connections is None:
+            warmup_connections = self.config.WARMUP_CONNECTIONS
+        if warmup_connections > 0:
+            self.warmup(warmup_connections)
+    
+    def warmup(self, connections: Optional[int] = None, url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Apre in anticipo le connessioni del pool (DNS, TCP e TLS) con richieste HEAD parallele.
+        
+        Le richieste non passano da rate limiter e circuit breaker e non usano
+        il token: l'esito HTTP non conta, solo la connessione che resta nel pool.
+        
+        Args:
+            connections: Connessioni da aprire (default: dimensione del pool del trasporto,
+                1 con HTTP/2)
+            url: URL da contattare (default: radice di META_BASE_URL)
+            
+        Returns:
+            dict: 'connections' aperte, 'errors', 'dns_seconds' e 'seconds' totali
+        """
+        parts = urlsplit(url or self.config.META_BASE_URL)
+        target = f"{parts.scheme}://{parts.netloc}/"
+        if connections is None:
+            connections = self.transport.pool_size
+        
+        start = time.perf_counter()
+        dns_seconds = 0.0
+        if DEFAULT_DNS_CACHE.enabled:
+            try:
+                DEFAULT_DNS_CACHE.resolve(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+            except OSError as e:
+                logger.warning("Risoluzione DNS di %s non riuscita nel warm-up: %s", parts.hostname, e)
+            dns_seconds = time.perf_counter() - start
+        
+        def open_connection(_):
+            response = self.transport.request('HEAD', target, timeout=self.config.REQUEST_TIMEOUT,
+                                              allow_redirects=False)
+            response.close()
+        
+        errors = []
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            futures = [executor.submit(open_connection, i) for i in range(connections)]
+            for future in futures:
+                try:
+                    future.result()
+                except requests.exceptions.RequestException as e:
+                    errors.append(str(e))
+        
+        seconds = time.perf_counter() - start
+        if self._metrics_enabled:
+            self.metrics.observe('warmup_seconds', seconds)
+        logger.info("Warm-up completato: %s/%s connessioni verso %s in %.3f secondi (DNS %.3f)",
+                    connections - len(errors), connections, parts.netloc, seconds, dns_seconds)
+        return {'connections': connections - len(errors), 'errors': errors,
+                'dns_seconds': dns_seconds, 'seconds': seconds}
     
-    def _make_request(self, method: str, url: str, **kwargs) -> requests.Response:
+    def _make_request(self, method: str, url: str, idempotent: Optional[bool] = None,
+                      endpoint: Optional[str] = None, cost: int = 1, compress: bool = False,
+                      lane: Optional[str] = None, **kwargs) -> requests.Response:
         """
         Effettua una richiesta HTTP con gestione rate limiting e retry.
         
+        Se è attiva una scadenza (vedi deadline.use_deadline) il timeout di ogni
+        tentativo viene ridotto al tempo rimasto e i retry che finirebbero oltre
+        la scadenza non vengono effettuati.
+        
         Args:
             method: Metodo HTTP (GET, POST, PUT, DELETE)
             url: URL della richiesta
+            idempotent: Se l'operazione può essere ripetuta senza effetti collaterali
+                (default: dedotto dal metodo HTTP, le POST non sono idempotenti)
+            endpoint: Classe di endpoint per metriche e circuit breaker (default: dedotta da metodo e URL)
+            cost: Chiamate da conteggiare nel rate limit (es. sotto-richieste di una batch)
+            compress: Se True comprime con gzip il body JSON oltre gzip_min_bytes
+            lane: Corsia dello scheduler se il contesto non ne ha attivata una (vedi scheduler.use_lane)
             **kwargs: Parametri aggiuntivi per requests
             
         Returns:
@@ -119,53 +329,285 @@ class WhatsAppCatalogManager:
             
         Raises:
             MetaAPIException: Se la richiesta fallisce
+            CircuitOpenError: Se il circuit breaker dell'endpoint è aperto
+            DeadlineExceeded: Se la scadenza attiva non lascia tempo per un (nuovo) tentativo
         """
-        # Aspetta se necessario per rate limiting
-        self.rate_limiter.wait_if_needed()
+        endpoint = endpoint or self._endpoint_class(method, url)
+        deadline = current_deadline()
+        lane = current_lane() or lane
+        breaker = self.circuit_breakers.get(endpoint)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
         
-        # Prepara headers
-        headers = self.config.get_headers()
-        if 'headers' in kwargs:
-            headers.update(kwargs['headers'])
-        kwargs['headers'] = headers
+        # Headers: quelli di autenticazione sono precalcolati (vedi _install_headers)
+        extra_headers = kwargs.get('headers')
+        if self._request_headers is not None:
+            kwargs['headers'] = {**self._request_headers, **extra_headers} if extra_headers else self._request_headers
         
         # Timeout di default
         kwargs.setdefault('timeout', self.config.REQUEST_TIMEOUT)
+        timeout = kwargs['timeout']
         
-        try:
-            logger.debug(f"Richiesta {method} a {url}")
-            response = self.session.request(method, url, **kwargs)
-            self.rate_limiter.record_request()
+        # Serializza il body con l'encoder JSON veloce (accetta anche i modelli)
+        if kwargs.get('json') is not None:
+            kwargs['data'] = dumps(kwargs.pop('json'))
+            if compress and self.gzip_min_bytes and len(kwargs['data']) >= self.gzip_min_bytes:
+                kwargs['data'] = gzip.compress(kwargs['data'], compresslevel=5)
+                kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Content-Type': 'application/json',
+                                     'Content-Encoding': 'gzip'}
+        
+        # Body in streaming da file (es. upload di feed): va riletto dall'inizio a ogni tentativo
+        body = kwargs.get('data')
+        rewindable = hasattr(body, 'seek') and hasattr(body, 'read')
+        
+        attempt = 0
+        delay = None
+        while True:
+            if deadline is not None:
+                if deadline.expired:
+                    raise DeadlineExceeded(f"Scadenza raggiunta prima della richiesta {method} a {endpoint}")
+                kwargs['timeout'] = deadline.clamp_timeout(timeout)
             
-            # Log della risposta
-            logger.debug(f"Risposta {response.status_code}: {response.text[:500]}")
+            # Fallisce subito, senza consumare rate limit né attendere timeout, se il circuito è aperto
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                if self._metrics_enabled:
+                    self.metrics.increment('circuit_rejections', endpoint=endpoint)
+                raise
             
-            # Gestione errori HTTP
-            if not response.ok:
-                error_data = None
+            try:
+                # Aspetta se necessario per rate limiting
+                wait_start = time.perf_counter()
+                self.rate_limiter.wait_if_needed()
+                if self._metrics_enabled:
+                    self.metrics.observe('limiter_wait_seconds', time.perf_counter() - wait_start,
+                                         endpoint=endpoint)
+                
+                # Turno dello scheduler: lo slot resta occupato fino all'arrivo della risposta
+                slot = self._acquire_slot(lane, cost, endpoint, deadline) if self.scheduler is not None else None
+            except BaseException:
+                # La richiesta non partirà: l'eventuale prova half-open torna disponibile
+                breaker.cancel_call()
+                raise
+            
+            try:
+                logger.debug("Richiesta %s a %s", method, url)
+                if self._metrics_enabled:
+                    start_phase_capture()
+                request_start = time.perf_counter()
+                if rewindable and attempt:
+                    body.seek(0)
                 try:
-                    error_data = response.json()
-                except json.JSONDecodeError:
-                    pass
+                    response = self.transport.request(method, url, **kwargs)
+                finally:
+                    if slot is not None:
+                        self.scheduler.release(slot)
+            except requests.RequestException as e:
+                breaker.record_failure()
+                self.rate_limiter.record_request(cost)
+                self.retry_policy.budget.record_request()
+                if self._metrics_enabled:
+                    collect_phase_timings()
+                    self.metrics.increment('request_errors', endpoint=endpoint, error=type(e).__name__)
                 
-                error_message = f"Errore API Meta: {response.status_code}"
-                if error_data and 'error' in error_data:
-                    error_message += f" - {error_data['error'].get('message', 'Errore sconosciuto')}"
+                if self.retry_policy.should_retry(attempt, idempotent, exception=e):
+                    delay = self.retry_policy.next_delay(delay)
+                    self._check_retry_deadline(deadline, delay, endpoint, f"Errore di connessione: {e}")
+                    self._wait_before_retry(attempt, delay, endpoint, str(e))
+                    attempt += 1
+                    continue
                 
-                raise MetaAPIException(error_message, response.status_code, error_data)
+                logger.error("Errore nella richiesta HTTP: %s", e)
+                if deadline is not None and deadline.expired and isinstance(e, requests.Timeout):
+                    raise DeadlineExceeded(f"Scadenza raggiunta durante la richiesta {method} a {endpoint}") from e
+                raise MetaAPIException(f"Errore di connessione: {e}") from e
+            
+            duration = time.perf_counter() - request_start
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success(duration)
+            self.rate_limiter.record_request(cost)
+            self.retry_policy.budget.record_request()
+            if self._metrics_enabled:
+                self._record_request_metrics(method, endpoint, response, duration, kwargs.get('stream', False))
+            
+            # Log della risposta: il body viene letto solo se il livello DEBUG è attivo
+            # e mai per le risposte in streaming, che verrebbero altrimenti consumate
+            if logger.isEnabledFor(logging.DEBUG):
+                if kwargs.get('stream'):
+                    logger.debug("Risposta %s (streaming)", response.status_code)
+                else:
+                    logger.debug("Risposta %s: %s", response.status_code, response.text[:500])
+            
+            if response.ok:
+                return response
+            
+            if self.retry_policy.should_retry(attempt, idempotent, response=response):
+                response.close()
+                delay = self.retry_policy.next_delay(delay, response)
+                self._check_retry_deadline(deadline, delay, endpoint, f"Errore API Meta: {response.status_code}",
+                                           response.status_code)
+                self._wait_before_retry(attempt, delay, endpoint, f"status {response.status_code}")
+                attempt += 1
+                continue
+            
+            # Gestione errori HTTP
+            error_data = None
+            try:
+                error_data = response.json()
+            except json.JSONDecodeError:
+                pass
+            
+            error_message = f"Errore API Meta: {response.status_code}"
+            if error_data and 'error' in error_data:
+                error_message += f" - {error_data['error'].get('message', 'Errore sconosciuto')}"
+            
+            raise MetaAPIException(error_message, response.status_code, error_data)
+    
+    def _acquire_slot(self, lane: Optional[str], cost: int, endpoint: str, deadline: Optional[Deadline]) -> str:
+        """
+        Attende il turno della richiesta nello scheduler a priorità.
+        
+        Args:
+            lane: Corsia della richiesta (None = corsia di default dello scheduler)
+            cost: Chiamate da conteggiare nel budget dello scheduler
+            endpoint: Classe di endpoint della richiesta
+            deadline: Scadenza attiva (limita l'attesa)
+            
+        Returns:
+            str: Corsia assegnata, da passare a scheduler.release
+            
+        Raises:
+            DeadlineExceeded: Se il turno non arriva prima della scadenza
+        """
+        wait_start = time.perf_counter()
+        try:
+            slot = self.scheduler.acquire(lane, cost, timeout=deadline.remaining() if deadline is not None else None)
+        except TimeoutError:
+            raise DeadlineExceeded(f"Scadenza raggiunta in attesa dello scheduler ({endpoint})")
+        if self._metrics_enabled:
+            self.metrics.observe('scheduler_wait_seconds', time.perf_counter() - wait_start,
+                                 endpoint=endpoint, lane=slot)
+        return slot
+    
+    @staticmethod
+    def _check_retry_deadline(deadline: Optional[Deadline], delay: float, endpoint: str, error: str,
+                              status_code: Optional[int] = None) -> None:
+        """
+        Verifica che dopo l'attesa del retry resti tempo prima della scadenza.
+        
+        Args:
+            deadline: Scadenza attiva (None = nessun limite)
+            delay: Secondi di attesa prima del retry
+            endpoint: Classe di endpoint della richiesta
+            error: Errore del tentativo fallito
+            status_code: Status code del tentativo fallito (se presente)
             
-            return response
+        Raises:
+            DeadlineExceeded: Se il retry finirebbe oltre la scadenza
+        """
+        if deadline is None or deadline.has_time_for(delay):
+            return
+        logger.warning("Retry su %s non effettuato: %.2f secondi rimasti, attesa di %.2f secondi",
+                       endpoint, deadline.remaining(), delay)
+        raise DeadlineExceeded(f"{error} (retry oltre la scadenza)", status_code)
+    
+    def _wait_before_retry(self, attempt: int, delay: float, endpoint: str, reason: str) -> None:
+        """
+        Attende prima di un nuovo tentativo e lo registra nelle metriche.
+        
+        Args:
+            attempt: Numero di retry già effettuati
+            delay: Secondi da attendere
+            endpoint: Classe di endpoint della richiesta
+            reason: Motivo del retry (per il log)
+        """
+        logger.warning("Retry %s/%s tra %.2f secondi (%s)", attempt + 1, self.retry_policy.max_retries,
+                       delay, reason)
+        if self._metrics_enabled:
+            self.metrics.increment('retries', endpoint=endpoint)
+            self.metrics.observe('retry_delay_seconds', delay, endpoint=endpoint)
+        time.sleep(delay)
+    
+    def _install_headers(self) -> None:
+        """
+        Precalcola gli header di autenticazione del manager.
+        
+        Se il trasporto è di proprietà del manager gli header vengono impostati
+        direttamente sul trasporto; con una sessione condivisa tra più token
+        vengono passati a ogni richiesta senza ricostruirli.
+        """
+        headers = self.config.get_headers(self.access_token)
+        if self._owns_session:
+            self.transport.headers.update(headers)
+            self._request_headers = None
+        else:
+            self._request_headers = headers
+    
+    def set_access_token(self, access_token: str) -> None:
+        """
+        Sostituisce il token di accesso (es. rotazione) senza ricreare il manager.
+        
+        Le richieste già in corso completano con il token precedente.
+        
+        Args:
+            access_token: Nuovo token di accesso Meta
+        """
+        if not access_token:
+            raise ValueError("Access token è richiesto")
+        self.access_token = access_token
+        self._install_headers()
+        logger.info("Access token aggiornato per catalog_id: %s", self.catalog_id)
+    
+    @staticmethod
+    def _endpoint_class(method: str, url: str) -> str:
+        """
+        Classifica una richiesta per le metriche: messaggi, letture o scritture di catalogo.
+        
+        Args:
+            method: Metodo HTTP
+            url: URL della richiesta
             
-        except requests.RequestException as e:
-            logger.error(f"Errore nella richiesta HTTP: {e}")
-            raise MetaAPIException(f"Errore di connessione: {e}")
+        Returns:
+            str: 'messages', 'catalog_read' o 'catalog_write'
+        """
+        if url.endswith('/messages'):
+            return 'messages'
+        if method.upper() in ('GET', 'HEAD'):
+            return 'catalog_read'
+        return 'catalog_write'
     
-    def validate_product_data(self, product_data: dict) -> Dict[str, Any]:
+    def _record_request_metrics(self, method: str, endpoint: str, response: requests.Response,
+                                duration: float, stream: bool) -> None:
+        """Notifica all'hook metriche durate, retry, byte e status code di una richiesta."""
+        metrics = self.metrics
+        labels = {'method': method.upper(), 'endpoint': endpoint}
+        
+        metrics.observe('request_seconds', duration, **labels)
+        # elapsed: dall'invio della richiesta alla ricezione degli header (attesa del server)
+        metrics.observe('server_seconds', response.elapsed.total_seconds(), **labels)
+        for phase, value in collect_phase_timings().items():
+            metrics.observe(phase, value, endpoint=endpoint)
+        
+        body = response.request.body
+        if isinstance(body, (bytes, str)):
+            metrics.observe('request_bytes', len(body), endpoint=endpoint)
+        if stream:
+            received = int(response.headers.get('Content-Length') or 0)
+        else:
+            received = len(response.content)
+        metrics.observe('response_bytes', received, endpoint=endpoint)
+        
+        metrics.increment('requests', status=str(response.status_code), **labels)
+    
+    def validate_product_data(self, product_data: Union[dict, Product]) -> Dict[str, Any]:
         """
         Valida e normalizza i dati del prodotto.
         
         Args:
-            product_data: Dati del prodotto da validare
+            product_data: Dati del prodotto da validare (dict o Product)
             
         Returns:
             dict: Dati del prodotto validati e normalizzati
@@ -173,16 +615,21 @@ class WhatsAppCatalogManager:
         Raises:
             ValueError: Se i dati non sono validi
         """
-        is_valid, errors = ProductValidationRules.validate_product_data(product_data)
+        validation_start = time.perf_counter()
+        
+        # Un Product produce già un dizionario nuovo: nessuna copia aggiuntiva
+        if isinstance(product_data, Product):
+            normalized_data = product_data.to_dict()
+        else:
+            normalized_data = product_data.copy()
+        
+        is_valid, errors = ProductValidationRules.validate_product_data(normalized_data)
         
         if not is_valid:
             error_message = "Errori di validazione prodotto:\\n" + "\\n".join(errors)
             logger.error(error_message)
             raise ValueError(error_message)
         
-        # Normalizza i dati
-        normalized_data = product_data.copy()
-        
         # Normalizza il prezzo (rimuovi simboli di valuta e converti in formato numerico)
         if 'price' in normalized_data:
             price_str = str(normalized_data['price'])
@@ -206,15 +653,18 @@ class WhatsAppCatalogManager:
         normalized_data.setdefault('condition', self.config.DEFAULT_CONDITION)
         normalized_data.setdefault('currency', self.config.DEFAULT_CURRENCY)
         
-        logger.debug(f"Dati prodotto validati: {normalized_data['retailer_id']}")
+        if self._metrics_enabled:
+            self.metrics.observe('validation_seconds', time.perf_counter() - validation_start)
+        
+        logger.debug("Dati prodotto validati: %s", normalized_data['retailer_id'])
         return normalized_data
     
-    def add_product(self, product_data: dict) -> Dict[str, Any]:
+    def add_product(self, product_data: Union[dict, Product]) -> Dict[str, Any]:
         """
         Aggiunge un nuovo prodotto al catalogo.
         
         Args:
-            product_data: Dizionario con i dati del prodotto
+            product_data: Dizionario o Product con i dati del prodotto
             
         Returns:
             dict: Risposta dell'API con i dettagli del prodotto creato
@@ -243,26 +693,31 @@ class WhatsAppCatalogManager:
         
         # Effettua la richiesta
         try:
-            response = self._make_request('POST', url, json=validated_data)
+            # L'upsert per retailer_id è ripetibile senza creare duplicati
+            response = self._make_request('POST', url, json=validated_data, idempotent=True)
             result = response.json()
             
-            logger.info(f"Prodotto aggiunto al catalogo: {validated_data['retailer_id']}")
+            logger.info("Prodotto aggiunto al catalogo: %s", validated_data['retailer_id'])
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nell'aggiunta del prodotto: {e.message}")
+            logger.error("Errore nell'aggiunta del prodotto: %s", e.message)
             raise
     
     def update_product(self, retailer_id: str, updated_data: dict) -> Dict[str, Any]:
         """
         Aggiorna un prodotto esistente nel catalogo.
         
+        Se il write-behind è attivo (vedi enable_write_behind) la modifica viene
+        validata subito ma inviata in batch insieme alle altre.
+        
         Args:
             retailer_id: ID univoco del prodotto da aggiornare
             updated_data: Dati da aggiornare
             
         Returns:
-            dict: Risposta dell'API
+            dict: Risposta dell'API, oppure {'success': True, 'buffered': True}
+                se la modifica è stata accodata nel buffer write-behind
         """
         if not self.catalog_id:
             raise ValueError("Catalog ID è richiesto per aggiornare prodotti")
@@ -270,43 +725,97 @@ class WhatsAppCatalogManager:
         # URL specifico del prodotto
         url = f"{self.config.get_catalog_url(self.catalog_id)}/{retailer_id}"
         
-        # Valida solo i dati forniti (update parziale)
-        if updated_data:
-            # Crea un prodotto temporaneo con dati minimi per la validazione
-            temp_product = {
-                'retailer_id': retailer_id,
-                'name': 'temp',
-                'description': 'temp',
-                'price': '1.00',
-                'currency': 'EUR',
-                'availability': 'in stock',
-                'condition': 'new'
-            }
-            temp_product.update(updated_data)
-            validated_temp = self.validate_product_data(temp_product)
-            
-            # Estrai solo i campi aggiornati
-            validated_data = {k: v for k, v in validated_temp.items() if k in updated_data}
-        else:
-            validated_data = updated_data
+        validated_data = self._validate_partial_update(retailer_id, updated_data)
+        
+        if self.write_behind is not None:
+            # Il buffer invia con items_batch, che vuole l'importo e non i centesimi dell'endpoint
+            # del singolo prodotto: così anche ProductIndex riceve i prezzi nella stessa unità di DeltaSync
+            if 'price' in validated_data:
+                # Una patch del solo prezzo non porta la valuta: items_batch rifiuta l'importo senza
+                currency = validated_data.get('currency') or self.config.DEFAULT_CURRENCY
+                validated_data['price'] = format_amount(updated_data['price'], currency)
+            self.write_behind.put(retailer_id, validated_data)
+            logger.debug("Aggiornamento del prodotto %s accodato nel buffer write-behind", retailer_id)
+            return {'success': True, 'buffered': True}
         
         try:
-            response = self._make_request('POST', url, json=validated_data)
+            response = self._make_request('POST', url, json=validated_data, idempotent=True)
             result = response.json()
             
-            logger.info(f"Prodotto aggiornato: {retailer_id}")
+            logger.info("Prodotto aggiornato: %s", retailer_id)
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nell'aggiornamento del prodotto {retailer_id}: {e.message}")
+            logger.error("Errore nell'aggiornamento del prodotto %s: %s", retailer_id, e.message)
             raise
     
-    def get_product(self, retailer_id: str) -> Dict[str, Any]:
+    def _validate_partial_update(self, retailer_id: str, updated_data: dict) -> Dict[str, Any]:
+        """Valida solo i campi forniti per un update parziale."""
+        if not updated_data:
+            return updated_data
+        
+        # Crea un prodotto temporaneo con dati minimi per la validazione
+        temp_product = {
+            'retailer_id': retailer_id,
+            'name': 'temp',
+            'description': 'temp',
+            'price': '1.00',
+            'currency': 'EUR',
+            'availability': 'in stock',
+            'condition': 'new'
+        }
+        temp_product.update(updated_data)
+        validated_temp = self.validate_product_data(temp_product)
+        
+        # Estrai solo i campi aggiornati
+        return {k: v for k, v in validated_temp.items() if k in updated_data}
+    
+    def enable_write_behind(self, max_items: int = 1000, max_age_seconds: float = 5.0) -> WriteBehindBuffer:
+        """
+        Attiva il buffer write-behind per update_product.
+        
+        Gli aggiornamenti allo stesso prodotto vengono uniti e inviati con
+        items_batch quando il buffer contiene max_items prodotti o la modifica
+        più vecchia in attesa ha max_age_seconds. get_product e get_products
+        restituiscono già le modifiche in attesa.
+        
+        Args:
+            max_items: Prodotti in attesa che forzano il flush
+            max_age_seconds: Ritardo massimo di una modifica prima del flush
+            
+        Returns:
+            WriteBehindBuffer: Buffer attivo (già avviato)
+        """
+        if self.write_behind is None:
+            self.write_behind = WriteBehindBuffer(self, max_items=max_items, max_age_seconds=max_age_seconds)
+            self.write_behind.start()
+        return self.write_behind
+    
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        Invia subito le modifiche in attesa nel buffer write-behind.
+        
+        Returns:
+            list: Risposte dell'API items_batch (vuota se il buffer non è attivo)
+        """
+        if self.write_behind is None:
+            return []
+        return self.write_behind.flush()
+    
+    def _apply_pending(self, retailer_id: str, product: Dict[str, Any]) -> Dict[str, Any]:
+        """Sovrappone ai dati letti dall'API le modifiche ancora nel buffer write-behind."""
+        if self.write_behind is None or not isinstance(product, dict):
+            return product
+        pending = self.write_behind.get_pending(retailer_id)
+        return {**product, **pending} if pending else product
+    
+    def get_product(self, retailer_id: str, fields: Optional[Fields] = None) -> Dict[str, Any]:
         """
         Ottiene i dettagli di un prodotto specifico.
         
         Args:
             retailer_id: ID univoco del prodotto
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
             
         Returns:
             dict: Dettagli del prodotto
@@ -317,23 +826,181 @@ class WhatsAppCatalogManager:
         url = f"{self.config.get_catalog_url(self.catalog_id)}/{retailer_id}"
         
         try:
-            response = self._make_request('GET', url)
-            result = response.json()
+            fields = resolve_fields(fields)
+            response = self._make_request('GET', url, params={'fields': fields} if fields else None)
+            result = self._apply_pending(retailer_id, response.json())
             
-            logger.debug(f"Prodotto ottenuto: {retailer_id}")
+            logger.debug("Prodotto ottenuto: %s", retailer_id)
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nel recupero del prodotto {retailer_id}: {e.message}")
+            logger.error("Errore nel recupero del prodotto %s: %s", retailer_id, e.message)
             raise
     
-    def list_products(self, limit: int = 100, after: Optional[str] = None) -> Dict[str, Any]:
+    def get_many(self, relative_urls: List[str], chunk_size: int = GRAPH_BATCH_MAX_SIZE,
+                 deadline: Union[float, Deadline, None] = None,
+                 continuation: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Esegue più letture con le richieste batch della Graph API.
+        
+        Le letture vengono raggruppate in chiamate da al massimo 50
+        sotto-richieste: 10.000 lookup diventano 200 chiamate HTTP.
+        
+        Args:
+            relative_urls: Percorsi relativi alla versione dell'API (es. "123/products?fields=id")
+            chunk_size: Sotto-richieste per chiamata batch (max 50)
+            deadline: Scadenza dell'operazione (Deadline o secondi; default: quella attiva)
+            continuation: Token di una chiamata interrotta dalla scadenza, per riprendere
+            
+        Returns:
+            list: Un risultato per URL, nello stesso ordine, con 'success', 'status_code'
+                e 'data' oppure 'error'
+            
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe le letture ('partial' contiene i
+                risultati degli URL letti in questa chiamata)
+        """
+        chunk_size = min(chunk_size, GRAPH_BATCH_MAX_SIZE)
+        start = decode_continuation(continuation, 'get_many').get('offset', 0)
+        results = []
+        slowest = 0.0
+        
+        with use_deadline(deadline) as deadline:
+            for i in range(start, len(relative_urls), chunk_size):
+                self._check_step_deadline(deadline, slowest, 'get_many', results, offset=i)
+                step_start = time.monotonic()
+                chunk = relative_urls[i:i + chunk_size]
+                batch = [{'method': 'GET', 'relative_url': relative_url} for relative_url in chunk]
+                
+                try:
+                    response = self._make_request('POST', self.config.META_BASE_URL, json={'batch': batch},
+                                                  idempotent=True, endpoint='catalog_read', cost=len(chunk),
+                                                  lane=BULK)
+                    entries = response.json()
+                except DeadlineExceeded as e:
+                    raise self._interrupted(e, 'get_many', results, offset=i)
+                except MetaAPIException as e:
+                    logger.error("Errore nella richiesta batch (%s letture): %s", len(chunk), e.message)
+                    results.extend({'success': False, 'status_code': e.status_code, 'error': e.message}
+                                   for _ in chunk)
+                    continue
+                
+                for entry in entries:
+                    results.append(self._parse_batch_entry(entry))
+                slowest = max(slowest, time.monotonic() - step_start)
+        
+        failed = sum(1 for r in results if not r['success'])
+        logger.debug("Letture batch completate: %s/%s riuscite", len(results) - failed, len(results))
+        return results
+    
+    @staticmethod
+    def _parse_batch_entry(entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Converte una risposta di sotto-richiesta batch nel formato dei risultati."""
+        if entry is None:
+            # Sotto-richiesta non completata entro il timeout della batch: va ripetuta
+            return {'success': False, 'status_code': None, 'error': 'Sotto-richiesta batch non completata'}
+        
+        status_code = entry.get('code')
+        try:
+            body = loads(entry['body']) if entry.get('body') else None
+        except ValueError:
+            body = entry.get('body')
+        
+        if status_code is not None and 200 <= status_code < 300:
+            return {'success': True, 'status_code': status_code, 'data': body}
+        
+        error_message = f"Errore API Meta: {status_code}"
+        if isinstance(body, dict) and 'error' in body:
+            error_message += f" - {body['error'].get('message', 'Errore sconosciuto')}"
+        return {'success': False, 'status_code': status_code, 'error': error_message}
+    
+    @staticmethod
+    def _check_step_deadline(deadline: Optional[Deadline], step_seconds: float, operation: str,
+                             partial: Any, **state: Any) -> None:
+        """
+        Interrompe un'operazione a più passi se il tempo rimasto non basta per il prossimo.
+        
+        Args:
+            deadline: Scadenza attiva (None = nessun limite)
+            step_seconds: Durata stimata del prossimo passo (il più lento finora)
+            operation: Nome dell'operazione (per il token di continuazione)
+            partial: Risultati ottenuti finora
+            **state: Stato per riprendere dal prossimo passo
+            
+        Raises:
+            DeadlineExceeded: Con i risultati parziali e il token di continuazione
+        """
+        if deadline is None or deadline.has_time_for(step_seconds):
+            return
+        logger.warning("%s interrotta: %.2f secondi rimasti, passo stimato %.2f secondi",
+                       operation, deadline.remaining(), step_seconds)
+        raise DeadlineExceeded(f"Tempo insufficiente per proseguire {operation}", partial=partial,
+                               continuation=encode_continuation(operation, **state))
+    
+    @staticmethod
+    def _interrupted(error: DeadlineExceeded, operation: str, partial: Any, **state: Any) -> DeadlineExceeded:
+        """Completa con risultati parziali e token una scadenza raggiunta durante un passo."""
+        logger.warning("%s interrotta dalla scadenza: %s", operation, error.message)
+        error.partial = partial
+        error.continuation = encode_continuation(operation, **state)
+        return error
+    
+    def get_products(self, retailer_ids: List[str], fields: Optional[Fields] = None,
+                     deadline: Union[float, Deadline, None] = None,
+                     continuation: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Ottiene i dettagli di più prodotti con richieste batch.
+        
+        Args:
+            retailer_ids: ID univoci dei prodotti
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
+            deadline: Scadenza dell'operazione (Deadline o secondi; default: quella attiva)
+            continuation: Token di una chiamata interrotta dalla scadenza, per riprendere
+            
+        Returns:
+            list: Un risultato per prodotto con 'success', 'retailer_id' e 'result' oppure 'error'
+            
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe le letture ('partial' contiene i
+                risultati dei prodotti letti in questa chiamata)
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per ottenere prodotti")
+        
+        fields = resolve_fields(fields)
+        query = f"?fields={fields}" if fields else ''
+        relative_urls = [f"{self.catalog_id}/products/{quote(str(rid), safe='')}{query}" for rid in retailer_ids]
+        
+        # get_many riprende dall'URL indicato nel token: i risultati partono dallo stesso prodotto
+        offset = decode_continuation(continuation, 'get_many').get('offset', 0)
+        try:
+            outcomes = self.get_many(relative_urls, deadline=deadline, continuation=continuation)
+        except DeadlineExceeded as e:
+            e.partial = self._product_results(retailer_ids[offset:], e.partial)
+            raise
+        return self._product_results(retailer_ids[offset:], outcomes)
+    
+    def _product_results(self, retailer_ids: List[str], outcomes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Converte i risultati di get_many nel formato di get_products."""
+        results = []
+        for retailer_id, outcome in zip(retailer_ids, outcomes):
+            result = {'success': outcome['success'], 'retailer_id': retailer_id}
+            if outcome['success']:
+                result['result'] = self._apply_pending(retailer_id, outcome['data'])
+            else:
+                result['error'] = outcome['error']
+            results.append(result)
+        return results
+    
+    def list_products(self, limit: int = 100, after: Optional[str] = None,
+                      fields: Optional[Fields] = None) -> Dict[str, Any]:
         """
         Lista tutti i prodotti nel catalogo.
         
         Args:
             limit: Numero massimo di prodotti da restituire (max 100)
             after: Cursor per paginazione
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
             
         Returns:
             dict: Lista dei prodotti con metadata di paginazione
@@ -346,18 +1013,132 @@ class WhatsAppCatalogManager:
         
         if after:
             params['after'] = after
+        fields = resolve_fields(fields)
+        if fields:
+            params['fields'] = fields
         
         try:
             response = self._make_request('GET', url, params=params)
             result = response.json()
             
-            logger.debug(f"Recuperati {len(result.get('data', []))} prodotti dal catalogo")
+            logger.debug("Recuperati %s prodotti dal catalogo", len(result.get('data', [])))
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nel recupero della lista prodotti: {e.message}")
+            logger.error("Errore nel recupero della lista prodotti: %s", e.message)
             raise
     
+    def iter_products(self, page_size: int = 100, fields: Optional[Fields] = None,
+                      chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+        """
+        Itera su tutti i prodotti del catalogo seguendo la paginazione.
+        
+        Ogni pagina viene letta in streaming e decodificata in modo incrementale:
+        i prodotti vengono restituiti man mano che arrivano, senza tenere in
+        memoria il body completo della risposta né la lista della pagina.
+        
+        Args:
+            page_size: Numero di prodotti per pagina (max 100)
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
+            chunk_size: Dimensione in byte dei chunk letti dalla connessione
+            
+        Yields:
+            dict: Dati di un singolo prodotto
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per listare prodotti")
+        
+        url = self.config.get_catalog_url(self.catalog_id)
+        params = {'limit': min(page_size, 100)}
+        fields = resolve_fields(fields)
+        if fields:
+            params['fields'] = fields
+        
+        while True:
+            response = self._make_request('GET', url, params=params, stream=True, lane=BULK)
+            try:
+                stream = JSONArrayStream(response.iter_content(chunk_size=chunk_size))
+                yield from stream
+            finally:
+                response.close()
+            
+            after = self._next_cursor(stream)
+            if not after:
+                return
+            params['after'] = after
+    
+    @staticmethod
+    def _next_cursor(stream: JSONArrayStream) -> Optional[str]:
+        """Cursore della pagina successiva di una lista letta in streaming (None se è l'ultima)."""
+        paging = stream.extra.get('paging') or {}
+        after = (paging.get('cursors') or {}).get('after')
+        return after if after and paging.get('next') else None
+    
+    def export_products(self, output_path: str, fields: Optional[Fields] = None,
+                        deadline: Union[float, Deadline, None] = None,
+                        continuation: Optional[str] = None) -> int:
+        """
+        Esporta tutti i prodotti del catalogo in un file JSON Lines.
+        
+        Le pagine vengono lette in streaming e scritte una alla volta, quindi
+        la memoria occupata non dipende dalla dimensione del catalogo. Con una
+        continuazione l'export riprende dalla pagina successiva all'ultima
+        scritta, in coda allo stesso file.
+        
+        Args:
+            output_path: Percorso del file di destinazione (un prodotto per riga)
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
+            deadline: Scadenza dell'operazione (Deadline o secondi; default: quella attiva)
+            continuation: Token di una chiamata interrotta dalla scadenza, per riprendere
+            
+        Returns:
+            int: Numero di prodotti esportati (comprese le chiamate precedenti)
+            
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe l'export ('partial' contiene il
+                numero di prodotti scritti finora)
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per listare prodotti")
+        
+        state = decode_continuation(continuation, 'export_products')
+        count = state.get('count', 0)
+        url = self.config.get_catalog_url(self.catalog_id)
+        params = {'limit': 100}
+        fields = resolve_fields(fields)
+        if fields:
+            params['fields'] = fields
+        if state.get('after'):
+            params['after'] = state['after']
+        slowest = 0.0
+        
+        with use_deadline(deadline) as deadline, open(output_path, 'ab' if continuation else 'wb') as output:
+            while True:
+                self._check_step_deadline(deadline, slowest, 'export_products', count,
+                                          after=params.get('after'), count=count)
+                step_start = time.monotonic()
+                try:
+                    response = self._make_request('GET', url, params=params, stream=True, lane=BULK)
+                    try:
+                        stream = JSONArrayStream(response.iter_content(chunk_size=65536))
+                        # Una pagina interrotta a metà non viene scritta: la continuazione la rilegge
+                        lines = [dumps(product) + b'\n' for product in stream]
+                    finally:
+                        response.close()
+                except DeadlineExceeded as e:
+                    raise self._interrupted(e, 'export_products', count, after=params.get('after'), count=count)
+                
+                output.writelines(lines)
+                count += len(lines)
+                slowest = max(slowest, time.monotonic() - step_start)
+                after = self._next_cursor(stream)
+                if not after:
+                    break
+                params['after'] = after
+        
+        logger.info("Esportati %s prodotti in %s", count, output_path)
+        return count
+    
     def delete_product(self, retailer_id: str) -> bool:
         """
         Elimina un prodotto dal catalogo.
@@ -373,74 +1154,530 @@ class WhatsAppCatalogManager:
         
         url = f"{self.config.get_catalog_url(self.catalog_id)}/{retailer_id}"
         
+        # Le modifiche in attesa non devono ricreare il prodotto dopo l'eliminazione
+        if self.write_behind is not None:
+            self.write_behind.discard(retailer_id)
+        
         try:
             response = self._make_request('DELETE', url)
             
-            logger.info(f"Prodotto eliminato: {retailer_id}")
+            logger.info("Prodotto eliminato: %s", retailer_id)
             return True
             
         except MetaAPIException as e:
-            logger.error(f"Errore nell'eliminazione del prodotto {retailer_id}: {e.message}")
+            logger.error("Errore nell'eliminazione del prodotto %s: %s", retailer_id, e.message)
             raise
     
-    def batch_add_products(self, products_data: List[dict], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    def batch_add_products(self, products_data: List[Union[dict, Product]], 
+                           chunk_size: Optional[int] = None,
+                           image_preflight: Optional[ImagePreflight] = None,
+                           deadline: Union[float, Deadline, None] = None,
+                           continuation: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Aggiunge più prodotti in batch per migliorare le performance.
         
         Args:
-            products_data: Lista di dizionari con i dati dei prodotti
+            products_data: Lista di dizionari o Product con i dati dei prodotti
             chunk_size: Dimensione dei chunk per elaborazione (default: MAX_BATCH_SIZE)
+            image_preflight: Se fornito, i prodotti con immagini non valide vengono
+                scartati prima dell'invio, senza consumare quota API
+            deadline: Scadenza dell'operazione (Deadline o secondi; default: quella attiva)
+            continuation: Token di una chiamata interrotta dalla scadenza, per riprendere
             
         Returns:
             list: Lista delle risposte per ogni prodotto
+            
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe la batch ('partial' contiene le
+                risposte dei prodotti elaborati in questa chiamata)
         """
         chunk_size = chunk_size or self.config.MAX_BATCH_SIZE
+        start = decode_continuation(continuation, 'batch_add_products').get('offset', 0)
+        remaining = products_data[start:]
         results = []
+        total = len(remaining)
         
-        logger.info(f"Inizio aggiunta batch di {len(products_data)} prodotti")
+        logger.info("Inizio aggiunta batch di %s prodotti", total)
         
-        for i in range(0, len(products_data), chunk_size):
-            chunk = products_data[i:i + chunk_size]
-            logger.debug(f"Elaborazione chunk {i//chunk_size + 1}: prodotti {i+1}-{min(i+chunk_size, len(products_data))}")
-            
-            for product_data in chunk:
-                try:
-                    result = self.add_product(product_data)
-                    results.append({
-                        'success': True,
-                        'retailer_id': product_data.get('retailer_id'),
-                        'result': result
-                    })
-                except Exception as e:
-                    logger.error(f"Errore nell'aggiunta del prodotto {product_data.get('retailer_id', 'unknown')}: {e}")
-                    results.append({
-                        'success': False,
-                        'retailer_id': product_data.get('retailer_id'),
-                        'error': str(e)
-                    })
-            
-            # Piccola pausa tra i chunk per evitare rate limiting
-            if i + chunk_size < len(products_data):
-                time.sleep(1)
+        # Coppie (posizione nella lista originale, prodotto): il pre-flight può scartare prodotti
+        # e l'offset del token di continuazione si riferisce sempre a products_data
+        pending = list(enumerate(remaining, start))
+        if image_preflight is not None:
+            accepted, results = image_preflight.filter_product_indices(remaining)
+            pending = [pending[k] for k in accepted]
+        
+        slowest = 0.0
+        # add_product non conosce la batch: la corsia bulk passa dal contesto
+        with use_deadline(deadline) as deadline, use_lane(BULK, replace=False):
+            for i in range(0, len(pending), chunk_size):
+                chunk = pending[i:i + chunk_size]
+                logger.debug("Elaborazione chunk %s: prodotti %s-%s", i//chunk_size + 1, i+1, min(i+chunk_size, len(pending)))
+                
+                for offset, product_data in chunk:
+                    self._check_step_deadline(deadline, slowest, 'batch_add_products', results, offset=offset)
+                    step_start = time.monotonic()
+                    try:
+                        result = self.add_product(product_data)
+                        results.append({
+                            'success': True,
+                            'retailer_id': product_data.get('retailer_id'),
+                            'result': result
+                        })
+                    except DeadlineExceeded as e:
+                        raise self._interrupted(e, 'batch_add_products', results, offset=offset)
+                    except Exception as e:
+                        logger.error("Errore nell'aggiunta del prodotto %s: %s", product_data.get('retailer_id', 'unknown'), e)
+                        results.append({
+                            'success': False,
+                            'retailer_id': product_data.get('retailer_id'),
+                            'error': str(e)
+                        })
+                    slowest = max(slowest, time.monotonic() - step_start)
+                
+                # Piccola pausa tra i chunk per evitare rate limiting
+                if i + chunk_size < len(pending):
+                    self._check_step_deadline(deadline, 1 + slowest, 'batch_add_products', results,
+                                              offset=pending[i + chunk_size][0])
+                    time.sleep(1)
         
         successful = sum(1 for r in results if r['success'])
-        logger.info(f"Batch completato: {successful}/{len(products_data)} prodotti aggiunti con successo")
+        logger.info("Batch completato: %s/%s prodotti aggiunti con successo", successful, total)
         
         return results
     
+    def submit_items_batch(self, item_requests: List[Dict[str, Any]], item_type: str = 'PRODUCT_ITEM',
+                           chunk_size: int = ITEMS_BATCH_MAX_SIZE, deadline: Union[float, Deadline, None] = None,
+                           continuation: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Invia operazioni sugli item del catalogo tramite l'endpoint items_batch.
+        
+        Le operazioni vengono elaborate da Meta in modo asincrono: la risposta
+        contiene gli handle con cui verificare l'esito dei singoli item.
+        
+        Args:
+            item_requests: Operazioni nel formato items_batch, es.
+                {"method": "UPDATE", "data": {"id": "SKU_1", "inventory": 5}}
+            item_type: Tipo di item (PRODUCT_ITEM, HOME_LISTING, ...)
+            chunk_size: Operazioni per chiamata (max 5000)
+            deadline: Scadenza dell'operazione (Deadline o secondi; default: quella attiva)
+            continuation: Token di una chiamata interrotta dalla scadenza, per riprendere
+            
+        Returns:
+            list: Una risposta dell'API per chunk (con la chiave 'handles')
+            
+        Raises:
+            DeadlineExceeded: Se la scadenza interrompe l'invio ('partial' contiene le
+                risposte dei chunk inviati in questa chiamata)
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per le operazioni batch")
+        
+        chunk_size = min(chunk_size, ITEMS_BATCH_MAX_SIZE)
+        url = f"{self.config.META_BASE_URL}/{self.catalog_id}/items_batch"
+        start = decode_continuation(continuation, 'submit_items_batch').get('offset', 0)
+        responses = []
+        slowest = 0.0
+        
+        with use_deadline(deadline) as deadline:
+            for i in range(start, len(item_requests), chunk_size):
+                self._check_step_deadline(deadline, slowest, 'submit_items_batch', responses, offset=i)
+                step_start = time.monotonic()
+                chunk = item_requests[i:i + chunk_size]
+                # Le operazioni sono identificate dall'id dell'item: ripeterle non crea duplicati
+                try:
+                    response = self._make_request('POST', url, json={'item_type': item_type, 'requests': chunk},
+                                                  idempotent=True, compress=True, lane=BULK)
+                except DeadlineExceeded as e:
+                    raise self._interrupted(e, 'submit_items_batch', responses, offset=i)
+                result = response.json()
+                responses.append(result)
+                slowest = max(slowest, time.monotonic() - step_start)
+                logger.debug("items_batch inviato: %s operazioni, handle %s", len(chunk), result.get('handles'))
+        
+        return responses
+    
+    def validate_home_listing(self, listing_data: Union[dict, HomeListing]) -> Dict[str, Any]:
+        """
+        Valida e normalizza i dati di un listing immobiliare.
+        
+        Args:
+            listing_data: Dati del listing (dict o HomeListing)
+            
+        Returns:
+            dict: Dati del listing validati e normalizzati (prezzo e anno interi, valuta maiuscola)
+            
+        Raises:
+            ValueError: Se i dati non sono validi
+        """
+        validation_start = time.perf_counter()
+        
+        if isinstance(listing_data, HomeListing):
+            normalized_data = listing_data.to_dict()
+        else:
+            normalized_data = listing_data.copy()
+        
+        is_valid, errors = HomeListingValidationRules.validate_listing_data(normalized_data)
+        if not is_valid:
+            error_message = f"Errori di validazione listing {normalized_data.get('home_listing_id')}: " + "; ".join(errors)
+            logger.error(error_message)
+            raise ValueError(error_message)
+        
+        normalized_data['price'] = int(parse_amount(normalized_data['price']))
+        normalized_data['currency'] = normalized_data['currency'].upper()
+        normalized_data['year_built'] = int(normalized_data['year_built'])
+        
+        if self._metrics_enabled:
+            self.metrics.observe('validation_seconds', time.perf_counter() - validation_start)
+        return normalized_data
+    
+    def add_home_listing(self, listing_data: Union[dict, HomeListing]) -> Dict[str, Any]:
+        """
+        Aggiunge un listing immobiliare a un catalogo home_listings.
+        
+        Args:
+            listing_data: Dati del listing (dict o HomeListing)
+            
+        Returns:
+            dict: Risposta dell'API
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per aggiungere listing")
+        
+        validated_data = self.validate_home_listing(listing_data)
+        url = f"{self.config.META_BASE_URL}/{self.catalog_id}/home_listings"
+        
+        try:
+            # Il listing è identificato da home_listing_id: ripetere l'invio non crea duplicati
+            response = self._make_request('POST', url, json=validated_data, idempotent=True)
+            result = response.json()
+            logger.info("Listing aggiunto al catalogo: %s", validated_data['home_listing_id'])
+            return result
+        except MetaAPIException as e:
+            logger.error("Errore nell'aggiunta del listing: %s", e.message)
+            raise
+    
+    def list_home_listings(self, limit: int = 100, after: Optional[str] = None,
+                           fields: Optional[Fields] = None) -> Dict[str, Any]:
+        """
+        Lista i listing di un catalogo home_listings.
+        
+        Args:
+            limit: Numero massimo di listing da restituire (max 100)
+            after: Cursor per paginazione
+            fields: Proiezione: preset ('ids', 'pricing', 'full') o campi (default: campi di default dell'API)
+            
+        Returns:
+            dict: Lista dei listing con metadata di paginazione
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per listare i listing")
+        
+        params = {'limit': min(limit, 100)}
+        if after:
+            params['after'] = after
+        fields = resolve_fields(fields, kind='home_listing')
+        if fields:
+            params['fields'] = fields
+        response = self._make_request('GET', f"{self.config.META_BASE_URL}/{self.catalog_id}/home_listings",
+                                      params=params)
+        return response.json()
+    
+    def batch_home_listings(self, listings: List[Union[dict, HomeListing]],
+                            method: str = 'UPDATE') -> Dict[str, Any]:
+        """
+        Crea o aggiorna molti listing con items_batch (elaborazione asincrona lato Meta).
+        
+        I listing non validi vengono scartati prima dell'invio.
+        
+        Args:
+            listings: Listing da inviare (dict o HomeListing)
+            method: 'CREATE' oppure 'UPDATE' (upsert)
+            
+        Returns:
+            dict: 'handles' delle batch inviate, 'submitted' e 'rejected' (con ID ed errore)
+        """
+        return self.batch_catalog_items(listings, vertical='home_listings', method=method,
+                                        prepare=self.validate_home_listing)
+    
+    def validate_catalog_item(self, item_data: Any,
+                              vertical: Union[str, VerticalSchema] = 'commerce') -> Dict[str, Any]:
+        """
+        Valida i dati di un item con lo schema del suo vertical.
+        
+        Args:
+            item_data: Dati dell'item (dict o modello con to_dict)
+            vertical: Nome del vertical registrato o relativo schema
+            
+        Returns:
+            dict: Copia dei dati validati
+            
+        Raises:
+            ValueError: Se il vertical non è registrato o i dati non sono validi
+        """
+        schema = get_vertical(vertical) if isinstance(vertical, str) else vertical
+        data = item_data.copy() if isinstance(item_data, dict) else item_data.to_dict()
+        is_valid, errors = schema.validate(data)
+        if not is_valid:
+            error_message = f"Errori di validazione {schema.name} {schema.item_id(data)}: " + "; ".join(errors)
+            logger.error(error_message)
+            raise ValueError(error_message)
+        return data
+    
+    def batch_catalog_items(self, items: Iterable[Any], vertical: Union[str, VerticalSchema] = 'commerce',
+                            method: str = 'UPDATE', prepare=None) -> Dict[str, Any]:
+        """
+        Crea o aggiorna molti item di qualsiasi vertical registrato con items_batch.
+        
+        Args:
+            items: Item da inviare (dict o modelli con to_dict)
+            vertical: Nome del vertical registrato o relativo schema
+            method: 'CREATE' oppure 'UPDATE' (upsert)
+            prepare: Funzione di validazione e normalizzazione (default: validate_catalog_item)
+            
+        Returns:
+            dict: 'handles' delle batch inviate, 'submitted' e 'rejected' (con ID ed errore)
+        """
+        if method not in ('CREATE', 'UPDATE'):
+            raise ValueError(f"Metodo non valido: {method}. Validi: CREATE, UPDATE")
+        schema = get_vertical(vertical) if isinstance(vertical, str) else vertical
+        if prepare is None:
+            def prepare(item):
+                return self.validate_catalog_item(item, schema)
+        id_key = schema.id_field if isinstance(schema.id_field, str) else 'id'
+        
+        item_requests, rejected = [], []
+        for item in items:
+            try:
+                data = prepare(item)
+            except ValueError as e:
+                item_dict = item if isinstance(item, dict) else item.to_dict()
+                rejected.append({'success': False, id_key: schema.item_id(item_dict), 'error': str(e)})
+                continue
+            if schema.batch_id_field and schema.batch_id_field != schema.id_field:
+                data[schema.batch_id_field] = data.pop(schema.id_field)
+            item_requests.append({'method': method, 'data': data})
+        
+        handles = []
+        if item_requests:
+            responses = self.submit_items_batch(item_requests, item_type=schema.item_type)
+            handles = [handle for response in responses for handle in response.get('handles', [])]
+        
+        logger.info("Batch %s: %s inviati, %s scartati", schema.name, len(item_requests), len(rejected))
+        return {'handles': handles, 'submitted': len(item_requests), 'rejected': rejected}
+    
+    def delete_catalog_items(self, item_ids: List[str],
+                             vertical: Union[str, VerticalSchema] = 'commerce') -> Dict[str, Any]:
+        """
+        Elimina molti item di un vertical con items_batch.
+        
+        Args:
+            item_ids: ID degli item (per ID composti i valori uniti da ':')
+            vertical: Nome del vertical registrato o relativo schema
+            
+        Returns:
+            dict: 'handles' delle batch inviate e 'submitted'
+        """
+        schema = get_vertical(vertical) if isinstance(vertical, str) else vertical
+        item_requests = [{'method': 'DELETE', 'data': schema.id_data(str(item_id))} for item_id in item_ids]
+        responses = self.submit_items_batch(item_requests, item_type=schema.item_type) if item_requests else []
+        return {'handles': [handle for response in responses for handle in response.get('handles', [])],
+                'submitted': len(item_requests)}
+    
+    def sync_catalog_items(self, items: Iterable[Any], vertical: Union[str, VerticalSchema], state_path: str,
+                           delete_missing: bool = True,
+                           deadline: Union[float, Deadline, None] = None) -> Dict[str, Any]:
+        """
+        Sincronizza gli item di un vertical inviando solo le differenze rispetto all'ultima sincronizzazione.
+        
+        Args:
+            items: Tutti gli item della sorgente
+            vertical: Nome del vertical registrato o relativo schema
+            state_path: File in cui conservare gli hash dell'ultima sincronizzazione
+            delete_missing: Se True elimina dal catalogo gli item non più presenti
+            deadline: Scadenza della sincronizzazione (vedi DeltaSync.sync)
+            
+        Returns:
+            dict: Conteggi (created, updated, unchanged, deleted), item scartati e handle
+        """
+        sync = DeltaSync.for_vertical(self, vertical, state_path=state_path)
+        return sync.sync(items, delete_missing=delete_missing, deadline=deadline)
+    
+    def delete_home_listings(self, home_listing_ids: List[str]) -> Dict[str, Any]:
+        """
+        Elimina molti listing con items_batch.
+        
+        Args:
+            home_listing_ids: ID dei listing da eliminare
+            
+        Returns:
+            dict: 'handles' delle batch inviate e 'submitted'
+        """
+        return self.delete_catalog_items(home_listing_ids, vertical='home_listings')
+    
+    def sync_home_listings(self, listings: Iterable[Union[dict, HomeListing]], state_path: str,
+                           delete_missing: bool = True,
+                           deadline: Union[float, Deadline, None] = None) -> Dict[str, Any]:
+        """
+        Sincronizza il catalogo con l'elenco completo dei listing inviando solo le differenze.
+        
+        Args:
+            listings: Tutti i listing della sorgente
+            state_path: File in cui conservare gli hash dell'ultima sincronizzazione
+            delete_missing: Se True elimina dal catalogo i listing non più presenti
+            deadline: Scadenza della sincronizzazione (vedi DeltaSync.sync)
+            
+        Returns:
+            dict: Conteggi (created, updated, unchanged, deleted), listing scartati e handle
+        """
+        sync = DeltaSync.for_vertical(self, 'home_listings', state_path=state_path,
+                                      prepare=self.validate_home_listing)
+        return sync.sync(listings, delete_missing=delete_missing, deadline=deadline)
+    
+    def create_product_feed(self, name: str) -> Dict[str, Any]:
+        """
+        Crea un product feed nel catalogo (destinazione degli upload di feed file).
+        
+        Args:
+            name: Nome del feed
+            
+        Returns:
+            dict: Risposta dell'API con l'ID del feed
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per creare feed")
+        
+        url = f"{self.config.META_BASE_URL}/{self.catalog_id}/product_feeds"
+        try:
+            response = self._make_request('POST', url, json={'name': name})
+            result = response.json()
+            logger.info("Product feed creato: %s (%s)", name, result.get('id'))
+            return result
+        except MetaAPIException as e:
+            logger.error("Errore nella creazione del product feed %s: %s", name, e.message)
+            raise
+    
+    def list_product_feeds(self, fields: Optional[Fields] = None) -> Dict[str, Any]:
+        """
+        Lista i product feed del catalogo.
+        
+        Args:
+            fields: Proiezione: preset ('ids', 'full') o campi (default: id e name)
+            
+        Returns:
+            dict: Feed del catalogo ('data' con id e name)
+        """
+        if not self.catalog_id:
+            raise ValueError("Catalog ID è richiesto per listare i feed")
+        
+        url = f"{self.config.META_BASE_URL}/{self.catalog_id}/product_feeds"
+        response = self._make_request('GET', url,
+                                      params={'fields': resolve_fields(fields, kind='feed') or DEFAULT_FEED_FIELDS})
+        return response.json()
+    
+    def upload_product_feed(self, feed_id: str, file_path: Optional[str] = None, url: Optional[str] = None,
+                            update_only: bool = False) -> Dict[str, Any]:
+        """
+        Avvia una sessione di upload per un product feed.
+        
+        Il file viene inviato in streaming (multipart con Content-Length),
+        senza caricarlo in memoria. In alternativa Meta può scaricare il
+        feed da un URL pubblico.
+        
+        Args:
+            feed_id: ID del product feed
+            file_path: Percorso del feed file (CSV, TSV o XML, anche .gz)
+            url: URL pubblico del feed file (alternativo a file_path)
+            update_only: Se True aggiorna solo gli item presenti nel file
+            
+        Returns:
+            dict: Risposta dell'API con l'ID della sessione di upload
+        """
+        if (file_path is None) == (url is None):
+            raise ValueError("Indicare esattamente uno tra file_path e url")
+        
+        upload_url = f"{self.config.META_BASE_URL}/{feed_id}/uploads"
+        fields = {'update_only': 'true' if update_only else 'false'}
+        
+        try:
+            if url is not None:
+                response = self._make_request('POST', upload_url, json={**fields, 'url': url}, lane=BULK)
+            else:
+                content_type = 'application/gzip' if file_path.endswith('.gz') else 'text/plain'
+                body = MultipartFileBody(file_path, fields, content_type=content_type)
+                try:
+                    # Un upload ripetuto crea una nuova sessione: ritentato solo se non è stato elaborato
+                    response = self._make_request('POST', upload_url, data=body, idempotent=False,
+                                                  headers={'Content-Type': body.content_type}, lane=BULK)
+                finally:
+                    body.close()
+            result = response.json()
+            logger.info("Upload del feed %s avviato: sessione %s", feed_id, result.get('id'))
+            return result
+        except MetaAPIException as e:
+            logger.error("Errore nell'upload del feed %s: %s", feed_id, e.message)
+            raise
+    
+    def get_feed_upload_session(self, session_id: str, fields: Optional[Fields] = None) -> Dict[str, Any]:
+        """
+        Ottiene lo stato di una sessione di upload di feed.
+        
+        Args:
+            session_id: ID della sessione di upload
+            fields: Campi da richiedere (default: stato e conteggi della sessione)
+            
+        Returns:
+            dict: Stato della sessione (end_time valorizzato a elaborazione conclusa)
+        """
+        url = f"{self.config.META_BASE_URL}/{session_id}"
+        fields = resolve_fields(fields, kind='upload_session') or DEFAULT_UPLOAD_SESSION_FIELDS
+        response = self._make_request('GET', url, params={'fields': fields})
+        return response.json()
+    
+    def get_feed_upload_errors(self, session_id: str, limit: int = 100,
+                               fields: Optional[Fields] = None) -> List[Dict[str, Any]]:
+        """
+        Ottiene gli errori di elaborazione di una sessione di upload di feed.
+        
+        Args:
+            session_id: ID della sessione di upload
+            limit: Numero massimo di errori da restituire
+            fields: Campi da richiedere per ogni errore (default: campi di default dell'API)
+            
+        Returns:
+            list: Errori con 'summary', 'description', 'severity' ed esempi di righe
+        """
+        url = f"{self.config.META_BASE_URL}/{session_id}/errors"
+        params = {'limit': limit}
+        fields = resolve_fields(fields, kind='upload_error')
+        if fields:
+            params['fields'] = fields
+        response = self._make_request('GET', url, params=params)
+        return response.json().get('data', [])
+    
     def send_product_message(self, phone_number: str, product_retailer_id: str, 
-                           message: str = "", header_text: str = "") -> Dict[str, Any]:
+                           message: str = "", header_text: str = "",
+                           idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Invia un messaggio WhatsApp con un singolo prodotto.
         
+        Un duplicato di un messaggio già inviato (stessa idempotency_key entro
+        MESSAGE_DEDUP_TTL) non viene inviato di nuovo: il metodo restituisce la
+        risposta dell'invio originale. Senza chiave il messaggio viene sempre
+        inviato, a meno che MESSAGE_DEDUP_BY_CONTENT non attivi la chiave
+        derivata da destinatario e contenuto.
+        
         Args:
             phone_number: Numero di telefono destinatario (formato internazionale)
             product_retailer_id: ID del prodotto nel catalogo
             message: Messaggio di accompagnamento (opzionale)
             header_text: Testo dell'header (opzionale)
+            idempotency_key: Chiave del messaggio (es. ID dell'ordine; default: nessuna de-duplicazione)
             
         Returns:
             dict: Risposta dell'API WhatsApp
+            
+        Raises:
+            DuplicateMessageError: Se lo stesso messaggio è ancora in invio o ha avuto esito incerto
         """
         if not self.phone_number_id:
             raise ValueError("Phone Number ID è richiesto per inviare messaggi")
@@ -475,32 +1712,36 @@ class WhatsAppCatalogManager:
                 "text": header_text
             }
         
-        url = self.config.get_whatsapp_url(self.phone_number_id)
-        
         try:
-            response = self._make_request('POST', url, json=message_data)
-            result = response.json()
+            result = self._send_message(message_data, idempotency_key)
             
-            logger.info(f"Messaggio prodotto inviato a {clean_phone}: {product_retailer_id}")
+            logger.info("Messaggio prodotto inviato a %s: %s", clean_phone, product_retailer_id)
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nell'invio del messaggio prodotto: {e.message}")
+            logger.error("Errore nell'invio del messaggio prodotto: %s", e.message)
             raise
     
     def send_catalog_message(self, phone_number: str, body_text: str = "Guarda il nostro catalogo!", 
-                           header_text: str = "", footer_text: str = "") -> Dict[str, Any]:
+                           header_text: str = "", footer_text: str = "",
+                           idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Invia un messaggio WhatsApp con l'intero catalogo.
         
+        I duplicati vengono soppressi come in send_product_message.
+        
         Args:
             phone_number: Numero di telefono destinatario
             body_text: Testo del corpo del messaggio
             header_text: Testo dell'header (opzionale)
             footer_text: Testo del footer (opzionale)
+            idempotency_key: Chiave del messaggio (default: nessuna de-duplicazione)
             
         Returns:
             dict: Risposta dell'API WhatsApp
+            
+        Raises:
+            DuplicateMessageError: Se lo stesso messaggio è ancora in invio o ha avuto esito incerto
         """
         if not self.phone_number_id:
             raise ValueError("Phone Number ID è richiesto per inviare messaggi")
@@ -543,23 +1784,81 @@ class WhatsAppCatalogManager:
                 "text": footer_text
             }
         
-        url = self.config.get_whatsapp_url(self.phone_number_id)
-        
         try:
-            response = self._make_request('POST', url, json=message_data)
-            result = response.json()
+            result = self._send_message(message_data, idempotency_key)
             
-            logger.info(f"Messaggio catalogo inviato a {clean_phone}")
+            logger.info("Messaggio catalogo inviato a %s", clean_phone)
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nell'invio del messaggio catalogo: {e.message}")
+            logger.error("Errore nell'invio del messaggio catalogo: %s", e.message)
             raise
     
-    def get_catalog_info(self) -> Dict[str, Any]:
+    def _send_message(self, message_data: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Invia un messaggio a /messages sopprimendo i duplicati prima di qualsiasi chiamata.
+        
+        Args:
+            message_data: Body della richiesta
+            idempotency_key: Chiave del messaggio (default: derivata da mittente, destinatario e
+                contenuto se lo store lo prevede, altrimenti nessuna de-duplicazione)
+            
+        Returns:
+            dict: Risposta dell'API WhatsApp (quella dell'invio originale per un duplicato)
+            
+        Raises:
+            DuplicateMessageError: Se il messaggio è ancora in invio o ha avuto esito incerto
+        """
+        url = self.config.get_whatsapp_url(self.phone_number_id)
+        store = self.idempotency_store
+        if store is None:
+            return self._make_request('POST', url, json=message_data, lane=INTERACTIVE).json()
+        
+        key = idempotency_key
+        if key is None and store.derive_keys:
+            key = message_key(self.phone_number_id, message_data)
+        if key is None:
+            return self._make_request('POST', url, json=message_data, lane=INTERACTIVE).json()
+        
+        duplicate = store.reserve(key)
+        if duplicate is not None:
+            if self._metrics_enabled:
+                self.metrics.increment('messages_deduplicated', status=duplicate['status'])
+            if duplicate['status'] == SENT:
+                logger.info("Messaggio %s già inviato a %s: invio duplicato soppresso", key, message_data['to'])
+                return duplicate['response']
+            raise DuplicateMessageError(key, duplicate['status'], max(duplicate['expires_at'] - time.time(), 0.0))
+        
+        try:
+            response = self._make_request('POST', url, json=message_data, lane=INTERACTIVE)
+        except MetaAPIException as e:
+            # Se Meta può averlo elaborato la chiave resta: meglio un messaggio perso che un doppione
+            if possibly_processed(e):
+                store.mark_unknown(key)
+            else:
+                store.release(key)
+            raise
+        except BaseException:
+            # Errore senza risposta HTTP (es. interruzione durante l'attesa del rate limiter):
+            # la prenotazione non deve bloccare il messaggio fino alla sua scadenza
+            store.release(key)
+            raise
+        try:
+            result = response.json()
+        except ValueError:
+            # Meta ha risposto con successo: il messaggio è stato accettato anche se la risposta è illeggibile
+            store.mark_unknown(key)
+            raise
+        store.complete(key, result)
+        return result
+    
+    def get_catalog_info(self, fields: Optional[Fields] = None) -> Dict[str, Any]:
         """
         Ottiene informazioni sul catalogo.
         
+        Args:
+            fields: Proiezione: preset ('ids', 'full') o campi (default: id, name, product_count, vertical)
+            
         Returns:
             dict: Informazioni del catalogo
         """
@@ -568,20 +1867,41 @@ class WhatsAppCatalogManager:
         
         url = f"{self.config.META_BASE_URL}/{self.catalog_id}"
         params = {
-            'fields': 'id,name,product_count,vertical'
+            'fields': resolve_fields(fields, kind='catalog') or DEFAULT_CATALOG_FIELDS
         }
         
         try:
             response = self._make_request('GET', url, params=params)
             result = response.json()
             
-            logger.debug(f"Informazioni catalogo ottenute: {self.catalog_id}")
+            logger.debug("Informazioni catalogo ottenute: %s", self.catalog_id)
             return result
             
         except MetaAPIException as e:
-            logger.error(f"Errore nel recupero informazioni catalogo: {e.message}")
+            logger.error("Errore nel recupero informazioni catalogo: %s", e.message)
             raise
     
+    def close(self) -> None:
+        """Invia le modifiche in attesa e chiude trasporto HTTP e store di idempotenza se sono del manager."""
+        try:
+            if self.write_behind is not None:
+                write_behind, self.write_behind = self.write_behind, None
+                write_behind.stop()
+        finally:
+            try:
+                if self._owns_idempotency_store and self.idempotency_store is not None:
+                    self._owns_idempotency_store = False
+                    self.idempotency_store.close()
+            finally:
+                if self._owns_session:
+                    self.transport.close()
+    
+    def __enter__(self) -> 'WhatsAppCatalogManager':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
     def __str__(self) -> str:
         """Rappresentazione string dell'oggetto."""
         return f"WhatsAppCatalogManager(catalog_id='{self.catalog_id}', phone_id='{self.phone_number_id}')"
@@ -0,0 +1,219 @@
+"""
+Buffer write-behind per le modifiche agli item del catalogo.
+
+Le applicazioni aggiornano spesso lo stesso prodotto più volte in pochi
+secondi (prezzo, poi immagine, poi descrizione). ``WriteBehindBuffer``
+unisce le patch per item e le invia come operazioni ``items_batch``
+quando il buffer raggiunge ``max_items`` item, quando la modifica più
+vecchia in attesa supera ``max_age_seconds`` o con ``flush()`` esplicito.
+Le patch in attesa restano leggibili con ``get_pending`` (read-your-writes).
+
+Example:
+    with WhatsAppCatalogManager() as manager:
+        manager.enable_write_behind(max_age_seconds=5)
+        manager.update_product("SKU_1", {"price": "19.90"})
+        manager.update_product("SKU_1", {"image_url": "https://..."})
+    # all'uscita dal blocco le modifiche sono state inviate in un'unica operazione
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import logger
+from .exceptions import MetaAPIException
+
+
+class WriteBehindBuffer:
+    """Accumula patch per item e le invia in batch in un thread in background."""
+
+    # Prefisso dei nomi delle metriche inviate all'hook del manager
+    metrics_prefix = 'write_behind'
+
+    def __init__(self, manager, max_items: int = 1000, max_age_seconds: float = 5.0,
+                 item_type: str = 'PRODUCT_ITEM'):
+        """
+        Args:
+            manager: WhatsAppCatalogManager usato per inviare le batch
+            max_items: Flush quando gli item in attesa raggiungono questa soglia
+            max_age_seconds: Flush quando la patch più vecchia in attesa raggiunge questa età
+            item_type: Tipo di item per l'endpoint items_batch
+        """
+        self.manager = manager
+        self.max_items = max_items
+        self.max_age_seconds = max_age_seconds
+        self.item_type = item_type
+
+        # id item -> (patch unita, istante della prima modifica non ancora inviata)
+        self._pending: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._updates_received = 0
+        self._items_flushed = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._last_flush_seconds = 0.0
+        self._last_flush_lag_seconds = 0.0
+
+    def put(self, item_id: str, patch: Dict[str, Any]) -> None:
+        """
+        Aggiunge una patch per l'item, unendola a quella eventualmente in attesa.
+
+        Args:
+            item_id: ID univoco dell'item (retailer_id per i prodotti)
+            patch: Campi da aggiornare (i valori più recenti prevalgono)
+        """
+        with self._lock:
+            previous = self._pending.get(item_id)
+            if previous is None:
+                self._pending[item_id] = (dict(patch), time.monotonic())
+            else:
+                previous[0].update(patch)
+            self._updates_received += 1
+            backlog = len(self._pending)
+
+        if backlog >= self.max_items:
+            self._wakeup.set()
+
+    def get_pending(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Restituisce la patch non ancora inviata per l'item.
+
+        Args:
+            item_id: ID univoco dell'item
+
+        Returns:
+            dict: Copia della patch in attesa, o None se non ce ne sono
+        """
+        with self._lock:
+            entry = self._pending.get(item_id)
+            return dict(entry[0]) if entry else None
+
+    def discard(self, item_id: str) -> None:
+        """Scarta la patch in attesa per l'item (es. perché l'item è stato eliminato)."""
+        with self._lock:
+            self._pending.pop(item_id, None)
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        Invia subito tutte le patch in attesa.
+
+        In caso di errore le patch vengono rimesse in coda sotto eventuali
+        modifiche più recenti arrivate nel frattempo.
+
+        Returns:
+            list: Risposte dell'API items_batch (con gli handle)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return []
+                pending, self._pending = self._pending, {}
+
+            oldest = min(first_seen for _, first_seen in pending.values())
+            item_requests = [{'method': 'UPDATE', 'data': {'id': item_id, **patch}}
+                             for item_id, (patch, _) in pending.items()]
+            start = time.monotonic()
+            try:
+                responses = self.manager.submit_items_batch(item_requests, item_type=self.item_type)
+            except (MetaAPIException, ValueError) as e:
+                logger.error("Errore nel flush di %s item (%s): %s", len(pending), self.metrics_prefix, e)
+                with self._lock:
+                    for item_id, (patch, first_seen) in pending.items():
+                        newer = self._pending.get(item_id)
+                        if newer is not None:
+                            patch.update(newer[0])
+                        self._pending[item_id] = (patch, first_seen)
+                    self._failed_flushes += 1
+                raise
+
+            finished = time.monotonic()
+            self._flushes += 1
+            self._items_flushed += len(pending)
+            self._last_flush_seconds = finished - start
+            self._last_flush_lag_seconds = finished - oldest
+
+            metrics = self.manager.metrics
+            metrics.observe(f'{self.metrics_prefix}_flush_seconds', self._last_flush_seconds)
+            metrics.observe(f'{self.metrics_prefix}_update_lag_seconds', self._last_flush_lag_seconds)
+            metrics.increment(f'{self.metrics_prefix}_items_flushed', len(pending))
+
+            logger.debug("Flush %s: %s item in %.3f secondi", self.metrics_prefix, len(pending),
+                         self._last_flush_seconds)
+            return responses
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiche di backlog e latenza del flush.
+
+        Returns:
+            dict: backlog corrente, età della modifica più vecchia in attesa,
+                modifiche ricevute/inviate/accorpate, durata e ritardo dell'ultimo flush
+        """
+        with self._lock:
+            backlog = len(self._pending)
+            oldest = min((first_seen for _, first_seen in self._pending.values()), default=None)
+            received = self._updates_received
+        return {
+            'backlog': backlog,
+            'oldest_pending_seconds': time.monotonic() - oldest if oldest is not None else 0.0,
+            'updates_received': received,
+            'items_flushed': self._items_flushed,
+            'updates_coalesced': max(received - self._items_flushed - backlog, 0),
+            'flushes': self._flushes,
+            'failed_flushes': self._failed_flushes,
+            'last_flush_seconds': self._last_flush_seconds,
+            'last_flush_lag_seconds': self._last_flush_lag_seconds,
+        }
+
+    def _seconds_until_due(self) -> float:
+        """Secondi prima che la patch più vecchia raggiunga max_age_seconds."""
+        with self._lock:
+            if len(self._pending) >= self.max_items:
+                return 0.0
+            oldest = min((first_seen for _, first_seen in self._pending.values()), default=None)
+        if oldest is None:
+            return self.max_age_seconds
+        return max(oldest + self.max_age_seconds - time.monotonic(), 0.0)
+
+    def start(self) -> None:
+        """Avvia il flush automatico (per età e dimensione) in un thread in background."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'{self.metrics_prefix}-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Ferma il thread di flush e invia le modifiche rimaste."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self._seconds_until_due())
+            self._wakeup.clear()
+            if self._stop.is_set():
+                return
+            if self._seconds_until_due() > 0:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                # Le patch sono già state rimesse in coda: si riprova alla prossima scadenza
+                self._wakeup.wait(self.max_age_seconds)
+
+    def __enter__(self) -> 'WriteBehindBuffer':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
@@ -0,0 +1,93 @@
+"""
+Fixture comuni dei test: server HTTP locale che sostituisce i servizi remoti.
+
+I test del pacchetto non devono raggiungere Meta né CDN esterni: il server
+``standin`` ascolta su localhost e risponde con l'handler impostato dal
+test, registrando ogni richiesta ricevuta.
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('META_ACCESS_TOKEN', 'test-token')
+os.environ.setdefault('LOG_FILE', '')
+
+from src.config import Config  # noqa: E402
+from src.retry import RetryPolicy  # noqa: E402
+from src.whatsapp_catalog_manager import RateLimiter, WhatsAppCatalogManager  # noqa: E402
+
+# (metodo, path, header, body) -> (status, header, body)
+Handler = Callable[[str, str, Dict[str, str], bytes], Tuple[int, Dict[str, str], bytes]]
+
+
+class StandInServer:
+    """Server HTTP/1.1 locale con handler intercambiabile e registro delle richieste."""
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.requests: List[Tuple[str, str, Dict[str, str], bytes]] = []
+        stand_in = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                headers = dict(self.headers)
+                stand_in.requests.append((self.command, self.path, headers, body))
+                status, response_headers, payload = stand_in.handler(self.command, self.path, headers, body)
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                # Le HEAD senza Content-Length simulano server che non indicano la dimensione
+                if 'Content-Length' not in response_headers and self.command != 'HEAD':
+                    self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+
+            do_GET = do_HEAD = do_POST = do_DELETE = _handle
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def paths(self, method: Optional[str] = None) -> List[str]:
+        """Path delle richieste ricevute (opzionalmente solo per un metodo)."""
+        return [path for m, path, _, _ in self.requests if method is None or m == method]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def standin():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def manager(standin, monkeypatch):
+    """Manager del catalogo 'CAT' che parla con la Graph API locale, senza retry né attese."""
+    monkeypatch.setattr(Config, 'META_BASE_URL', standin.url('/v18.0'))
+    manager = WhatsAppCatalogManager(catalog_id='CAT', rate_limiter=RateLimiter(10 ** 6),
+                                     retry_policy=RetryPolicy(max_retries=0))
+    yield manager
+    manager.close()
@@ -0,0 +1,167 @@
+"""
+Test delle transizioni del circuit breaker (con un orologio controllato dal test).
+"""
+
+import pytest
+
+from src import circuit_breaker
+from src.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerGroup
+from src.exceptions import CircuitOpenError
+
+
+class Clock:
+    """Sostituto del modulo time per il circuit breaker: il tempo avanza solo con advance."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+def make_breaker(**options):
+    options = {'failure_rate_threshold': 0.5, 'slow_call_seconds': 0, 'window_size': 4, 'min_calls': 4,
+               'open_seconds': 30, **options}
+    return CircuitBreaker('catalog_write', **options)
+
+
+def call(breaker, ok=True, duration=0.0):
+    breaker.before_call()
+    if ok:
+        breaker.record_success(duration)
+    else:
+        breaker.record_failure()
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        call(breaker, ok=False)
+    assert breaker.state == OPEN
+
+
+def test_opens_when_failure_rate_reaches_threshold(clock):
+    breaker = make_breaker()
+    call(breaker, ok=False)
+    call(breaker)
+    call(breaker, ok=False)
+    # Tre chiamate: sotto min_calls la soglia non viene valutata
+    assert breaker.state == CLOSED
+
+    call(breaker, ok=False)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 30
+
+
+def test_stays_closed_below_threshold(clock):
+    breaker = make_breaker()
+    for ok in (True, True, False, True, True, True, False, True):
+        call(breaker, ok=ok)
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker(slow_call_seconds=1)
+    for _ in range(4):
+        call(breaker, duration=2)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_the_circuit(clock):
+    breaker = make_breaker()
+    trip(breaker)
+
+    clock.advance(29)
+    assert breaker.state == OPEN
+    clock.advance(1)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    # Una sola prova alla volta
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    # La finestra riparte vuota: servono di nuovo min_calls chiamate per riaprire
+    call(breaker, ok=False)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_the_circuit(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    clock.advance(29)
+    assert breaker.state == OPEN
+    clock.advance(1)
+    assert breaker.state == HALF_OPEN
+
+
+def test_cancel_call_hands_back_the_half_open_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(30)
+
+    # La prova è stata ammessa ma la richiesta non è mai partita (es. scadenza in coda)
+    breaker.before_call()
+    breaker.cancel_call()
+
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_cancel_call_is_a_no_op_when_closed(clock):
+    breaker = make_breaker()
+    breaker.before_call()
+    breaker.cancel_call()
+    assert breaker.state == CLOSED
+
+
+def test_multiple_probes_must_all_succeed(clock):
+    breaker = make_breaker(half_open_max_calls=2)
+    trip(breaker)
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_reset(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    breaker.reset()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_group_creates_one_breaker_per_endpoint(clock):
+    group = CircuitBreakerGroup(min_calls=1, window_size=1, open_seconds=30)
+    assert group.get('messages') is group.get('messages')
+
+    call(group.get('messages'), ok=False)
+    assert group.states() == {'messages': OPEN}
+    group.get('catalog_read').before_call()
+    assert group.states() == {'messages': OPEN, 'catalog_read': CLOSED}
@@ -0,0 +1,94 @@
+"""
+Test dei token di continuazione: formato e ripresa esatta delle operazioni interrotte dalla scadenza.
+"""
+
+import json
+import time
+
+import pytest
+
+from src.deadline import decode_continuation, encode_continuation
+from src.exceptions import DeadlineExceeded
+
+# Durata di ogni richiesta alla Graph API locale e scadenza che ne lascia completare due
+STEP_SECONDS = 0.3
+DEADLINE_SECONDS = 0.75
+
+
+def test_round_trip():
+    token = encode_continuation('submit_items_batch', offset=5000, handles=['H1'])
+    assert decode_continuation(token, 'submit_items_batch') == {'offset': 5000, 'handles': ['H1']}
+
+
+def test_no_token_starts_from_the_beginning():
+    assert decode_continuation(None, 'batch_add_products') == {}
+
+
+def test_token_of_another_operation_is_rejected():
+    token = encode_continuation('get_products', offset=3)
+    with pytest.raises(ValueError, match='batch_add_products'):
+        decode_continuation(token, 'batch_add_products')
+
+
+@pytest.mark.parametrize('token', ['non-un-token!', 'bm9uIGpzb24=', 'WzEsMl0='])
+def test_malformed_token_is_rejected(token):
+    # Caratteri non base64, base64 di testo non JSON e di un JSON che non è un oggetto
+    with pytest.raises(ValueError):
+        decode_continuation(token, 'batch_add_products')
+
+
+def slow_graph(method, path, headers, body):
+    time.sleep(STEP_SECONDS)
+    payload = {'handles': ['H']} if path.endswith('/items_batch') else {'id': '1'}
+    return 200, {'Content-Type': 'application/json'}, json.dumps(payload).encode('utf-8')
+
+
+def posted(standin):
+    """Body JSON delle POST ricevute, in ordine di arrivo."""
+    return [json.loads(body) for method, _, _, body in standin.requests if method == 'POST']
+
+
+def test_submit_items_batch_resumes_at_the_first_unsent_chunk(standin, manager):
+    standin.handler = slow_graph
+    item_requests = [{'method': 'UPDATE', 'data': {'id': f'SKU{i}', 'inventory': i}} for i in range(5)]
+
+    with pytest.raises(DeadlineExceeded) as error:
+        manager.submit_items_batch(item_requests, chunk_size=2, deadline=DEADLINE_SECONDS)
+    assert len(error.value.partial) == 2
+    assert decode_continuation(error.value.continuation, 'submit_items_batch') == {'offset': 4}
+
+    standin.requests.clear()
+    manager.submit_items_batch(item_requests, chunk_size=2, continuation=error.value.continuation)
+    assert [body['requests'] for body in posted(standin)] == [item_requests[4:]]
+
+
+class RejectBadImages:
+    """Pre-flight finto: scarta i prodotti con 'bad' nell'URL dell'immagine."""
+
+    def filter_product_indices(self, products):
+        accepted = [i for i, product in enumerate(products) if 'bad' not in product['image_url']]
+        rejected = [{'success': False, 'retailer_id': product['retailer_id'], 'error': 'Immagine non valida'}
+                    for product in products if 'bad' in product['image_url']]
+        return accepted, rejected
+
+
+def test_batch_add_products_offset_counts_rejected_and_repeated_products(standin, manager):
+    standin.handler = slow_graph
+    product = {'retailer_id': 'SKU_A', 'name': 'Prodotto', 'description': 'Descrizione', 'price': '10',
+               'currency': 'EUR', 'availability': 'in stock', 'condition': 'new',
+               'url': 'https://shop.example/a', 'image_url': 'https://cdn.example/a.jpg'}
+    rejected = {**product, 'retailer_id': 'SKU_BAD', 'image_url': 'https://cdn.example/bad.jpg'}
+    last = {**product, 'retailer_id': 'SKU_B'}
+    # Lo stesso dict due volte: l'offset deve essere la posizione, non la prima occorrenza
+    products_data = [rejected, product, product, last]
+
+    with pytest.raises(DeadlineExceeded) as error:
+        manager.batch_add_products(products_data, image_preflight=RejectBadImages(), deadline=DEADLINE_SECONDS)
+    assert [r['retailer_id'] for r in error.value.partial] == ['SKU_BAD', 'SKU_A', 'SKU_A']
+    assert decode_continuation(error.value.continuation, 'batch_add_products') == {'offset': 3}
+
+    standin.requests.clear()
+    results = manager.batch_add_products(products_data, image_preflight=RejectBadImages(),
+                                         continuation=error.value.continuation)
+    assert [r['retailer_id'] for r in results] == ['SKU_B']
+    assert [body['retailer_id'] for body in posted(standin)] == ['SKU_B']
@@ -0,0 +1,194 @@
+"""
+Test dei feed file: generazione in streaming e upload verso una Graph API locale (fixture standin).
+"""
+
+import csv
+import gzip
+import json
+import xml.etree.ElementTree as ET
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from src.exceptions import MetaAPIException
+from src.feeds import FeedUploader, write_feed
+
+GOOGLE_NS = '{http://base.google.com/ns/1.0}'
+
+
+def products(count=3):
+    """Generatore di prodotti: write_feed non deve materializzare la sequenza."""
+    for i in range(count):
+        yield {
+            'retailer_id': f'SKU{i}',
+            'name': f'Prodotto {i}',
+            'description': f'Descrizione\tcon tab\ne a capo & <tag> {i}',
+            'price': '19.90',
+            'currency': 'EUR',
+            'availability': 'in stock',
+            'condition': 'new',
+            'url': f'https://shop.example/p/{i}',
+            'image_url': f'https://cdn.example/{i}.jpg',
+            'additional_image_urls': [f'https://cdn.example/{i}-a.jpg', f'https://cdn.example/{i}-b.jpg'],
+        }
+
+
+def test_write_csv_feed_from_generator(tmp_path):
+    path = tmp_path / 'catalog.csv'
+    assert write_feed(products(), str(path)) == 3
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['id'] for row in rows] == ['SKU0', 'SKU1', 'SKU2']
+    assert rows[0]['title'] == 'Prodotto 0'
+    assert rows[0]['price'] == '19.90 EUR'
+    assert rows[0]['additional_image_link'] == 'https://cdn.example/0-a.jpg,https://cdn.example/0-b.jpg'
+    # Nel CSV i valori su più righe restano tra virgolette
+    assert rows[0]['description'].startswith('Descrizione\tcon tab\n')
+
+
+def test_write_tsv_feed_flattens_whitespace(tmp_path):
+    path = tmp_path / 'catalog.tsv'
+    write_feed(products(1), str(path))
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    header, row = (line.split('\t') for line in lines)
+    values = dict(zip(header, row))
+    assert values['description'] == 'Descrizione con tab e a capo & <tag> 0'
+
+
+def test_write_gzipped_xml_feed(tmp_path):
+    path = tmp_path / 'catalog.xml.gz'
+    assert write_feed(products(2), str(path)) == 2
+
+    with gzip.open(path, 'rb') as f:
+        root = ET.fromstring(f.read())
+    items = root.findall('./channel/item')
+    assert [item.find(f'{GOOGLE_NS}id').text for item in items] == ['SKU0', 'SKU1']
+    assert items[0].find(f'{GOOGLE_NS}price').text == '19.90 EUR'
+    assert '& <tag>' in items[0].find(f'{GOOGLE_NS}description').text
+
+
+def test_unknown_feed_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_feed(products(), str(tmp_path / 'catalog.json'))
+
+
+class GraphFeeds:
+    """Graph API locale per product_feeds, uploads e sessioni di upload."""
+
+    def __init__(self, feeds=(), polls_before_end=1, invalid_items=0, upload_status=200):
+        self.feeds = list(feeds)
+        self.polls_before_end = polls_before_end
+        self.invalid_items = invalid_items
+        self.upload_status = upload_status
+        self.uploads = []
+        self.polls = 0
+
+    def __call__(self, method, path, headers, body):
+        route = urlsplit(path).path.split('/')[2:]
+        query = parse_qs(urlsplit(path).query)
+        if route == ['CAT', 'product_feeds']:
+            if method == 'POST':
+                feed = {'id': f'FEED{len(self.feeds) + 1}', 'name': json.loads(body)['name']}
+                self.feeds.append(feed)
+                return self.json({'id': feed['id']})
+            assert query['fields'] == ['id,name']
+            return self.json({'data': self.feeds})
+        if len(route) == 2 and route[1] == 'uploads':
+            if self.upload_status != 200:
+                return self.json({'error': {'message': 'File non valido'}}, self.upload_status)
+            self.uploads.append((route[0], headers['Content-Type'], body))
+            return self.json({'id': 'SESSION1'})
+        if route == ['SESSION1']:
+            self.polls += 1
+            session = {'id': 'SESSION1', 'start_time': '2026-01-01T00:00:00+0000'}
+            if self.polls > self.polls_before_end:
+                session.update(end_time='2026-01-01T00:01:00+0000', num_detected_items=3,
+                               num_invalid_items=self.invalid_items, error_count=self.invalid_items)
+            return self.json(session)
+        if route == ['SESSION1', 'errors']:
+            return self.json({'data': [{'summary': 'Prezzo mancante', 'severity': 'fatal',
+                                        'samples': {'data': [{'row_number': 2, 'retailer_id': 'SKU1'}]}}]})
+        return self.json({'error': {'message': f'Percorso sconosciuto: {path}'}}, 404)
+
+    @staticmethod
+    def json(payload, status=200):
+        return status, {'Content-Type': 'application/json'}, json.dumps(payload).encode('utf-8')
+
+
+def multipart_parts(content_type, body):
+    """Parti di un body multipart/form-data: nome del campo -> contenuto."""
+    boundary = content_type.split('boundary=')[1].encode('ascii')
+    parts = {}
+    for part in body.split(b'--' + boundary)[1:-1]:
+        head, content = part[2:-2].split(b'\r\n\r\n', 1)
+        name = head.split(b'name="')[1].split(b'"')[0].decode('ascii')
+        parts[name] = content
+    return parts
+
+
+def test_refresh_streams_file_and_tracks_session(standin, manager, tmp_path):
+    graph = standin.handler = GraphFeeds(feeds=[{'id': 'FEED9', 'name': 'Catalogo'}], polls_before_end=2)
+    path = tmp_path / 'catalog.csv.gz'
+
+    session = FeedUploader(manager, feed_name='Catalogo').refresh(
+        products(), str(path), update_only=True, poll_interval=0.01)
+
+    # Il feed esistente viene riusato e il file arriva identico, con i campi del form
+    feed_id, content_type, body = graph.uploads[0]
+    assert feed_id == 'FEED9'
+    parts = multipart_parts(content_type, body)
+    assert parts['update_only'] == b'true'
+    assert parts['file'] == path.read_bytes()
+    assert gzip.decompress(parts['file']).startswith(b'id,title')
+
+    assert graph.polls == 3
+    assert session['status'] == 'finished'
+    assert session['items_written'] == 3
+    assert session['num_detected_items'] == 3
+    assert session['errors'] == []
+
+
+def test_feed_is_created_when_missing(standin, manager, tmp_path):
+    graph = standin.handler = GraphFeeds(polls_before_end=0)
+    uploader = FeedUploader(manager, feed_name='Nuovo feed')
+
+    uploader.refresh(products(1), str(tmp_path / 'catalog.tsv'), poll_interval=0.01)
+
+    assert graph.feeds == [{'id': 'FEED1', 'name': 'Nuovo feed'}]
+    assert uploader.feed_id == 'FEED1'
+    assert graph.uploads[0][0] == 'FEED1'
+
+
+def test_processing_errors_are_reported(standin, manager, tmp_path):
+    standin.handler = GraphFeeds(feeds=[{'id': 'FEED1', 'name': 'Catalogo'}], polls_before_end=0, invalid_items=1)
+    uploader = FeedUploader(manager, feed_name='Catalogo')
+
+    session = uploader.refresh(products(), str(tmp_path / 'catalog.xml'), poll_interval=0.01)
+
+    assert session['num_invalid_items'] == 1
+    assert session['errors'][0]['summary'] == 'Prezzo mancante'
+    assert uploader.sessions['SESSION1'] is session
+    assert '/v18.0/SESSION1/errors?limit=100' in standin.paths('GET')
+
+
+def test_unfinished_session_times_out(standin, manager, tmp_path):
+    standin.handler = GraphFeeds(feeds=[{'id': 'FEED1', 'name': 'Catalogo'}], polls_before_end=10 ** 6)
+    uploader = FeedUploader(manager, feed_name='Catalogo')
+
+    session = uploader.refresh(products(1), str(tmp_path / 'catalog.csv'), timeout=0.05, poll_interval=0.01)
+
+    assert session['status'] == 'timeout'
+    assert session['errors'] == []
+
+
+def test_rejected_upload_raises(standin, manager, tmp_path):
+    standin.handler = GraphFeeds(feeds=[{'id': 'FEED1', 'name': 'Catalogo'}], upload_status=400)
+
+    with pytest.raises(MetaAPIException) as error:
+        FeedUploader(manager, feed_name='Catalogo').refresh(products(1), str(tmp_path / 'catalog.csv'))
+
+    assert error.value.status_code == 400
+    assert 'File non valido' in error.value.message
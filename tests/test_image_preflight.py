@@ -0,0 +1,131 @@
+"""
+Test di ImagePreflight contro un server di immagini locale (fixture standin).
+"""
+
+import time
+
+from src.image_preflight import ImagePreflight
+
+MB = 1024 * 1024
+
+
+def image_server(method, path, headers, body):
+    """CDN finto: il path decide il comportamento della risposta."""
+    if path == '/photo.jpg':
+        return 200, {'Content-Type': 'image/jpeg', 'Content-Length': str(200 * 1024)}, b''
+    if path == '/animation.gif':
+        return 200, {'Content-Type': 'image/gif', 'Content-Length': '1024'}, b''
+    if path == '/huge.png':
+        return 200, {'Content-Type': 'image/png', 'Content-Length': str(12 * MB)}, b''
+    if path == '/upload.webp':
+        return 200, {'Content-Type': 'application/octet-stream', 'Content-Length': '2048'}, b''
+    if path == '/no-length.png' and method == 'HEAD':
+        return 200, {'Content-Type': 'image/png'}, b''
+    if path in ('/no-head.png', '/no-length.png'):
+        if method == 'HEAD':
+            return 405, {}, b''
+        assert headers.get('Range') == 'bytes=0-0'
+        return 206, {'Content-Type': 'image/png', 'Content-Range': 'bytes 0-0/4096'}, b'\x89'
+    if path == '/flaky.jpg':
+        return 503, {}, b''
+    return 404, {}, b''
+
+
+def make_preflight(**options):
+    options.setdefault('max_size_mb', 8)
+    options.setdefault('supported_formats', ['jpg', 'jpeg', 'png', 'webp'])
+    options.setdefault('timeout', 5)
+    return ImagePreflight(**options)
+
+
+def test_accepts_supported_content_type(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/photo.jpg'))
+    assert result['valid']
+    assert result['content_type'] == 'image/jpeg'
+    assert result['size'] == 200 * 1024
+    assert standin.paths() == ['/photo.jpg']
+
+
+def test_rejects_unsupported_content_type(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/animation.gif'))
+    assert not result['valid']
+    assert 'Formato non supportato' in result['error']
+
+
+def test_octet_stream_uses_file_extension(standin):
+    standin.handler = image_server
+    assert make_preflight().check_url(standin.url('/upload.webp'))['valid']
+
+
+def test_rejects_images_over_size_limit(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/huge.png'))
+    assert not result['valid']
+    assert result['size'] == 12 * MB
+    assert 'troppo grande' in result['error']
+
+
+def test_range_get_fallback_when_head_not_allowed(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/no-head.png'))
+    assert result['valid']
+    assert result['size'] == 4096
+    assert [m for m, _, _, _ in standin.requests] == ['HEAD', 'GET']
+
+
+def test_range_get_fallback_when_head_has_no_length(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/no-length.png'))
+    assert result['valid']
+    assert result['size'] == 4096
+    assert standin.paths('GET') == ['/no-length.png']
+
+
+def test_missing_image_is_rejected(standin):
+    standin.handler = image_server
+    result = make_preflight().check_url(standin.url('/missing.jpg'))
+    assert not result['valid']
+    assert 'HTTP 404' in result['error']
+
+
+def test_results_are_cached_until_ttl_expires(standin):
+    standin.handler = image_server
+    preflight = make_preflight(cache_ttl=0.2)
+    url = standin.url('/photo.jpg')
+
+    preflight.check_url(url)
+    preflight.check_url(url)
+    assert len(standin.requests) == 1
+    assert (preflight.cache_hits, preflight.cache_misses) == (1, 1)
+
+    time.sleep(0.3)
+    preflight.check_url(url)
+    assert len(standin.requests) == 2
+
+
+def test_transient_errors_use_shorter_ttl(standin):
+    standin.handler = image_server
+    preflight = make_preflight(cache_ttl=60, error_ttl=0.1)
+    url = standin.url('/flaky.jpg')
+
+    assert not preflight.check_url(url)['valid']
+    time.sleep(0.2)
+    preflight.check_url(url)
+    assert len(standin.requests) == 2
+
+
+def test_filter_products_checks_shared_urls_once(standin):
+    standin.handler = image_server
+    products = [
+        {'retailer_id': 'A', 'image_url': standin.url('/photo.jpg')},
+        {'retailer_id': 'B', 'image_url': standin.url('/photo.jpg'),
+         'additional_image_urls': [standin.url('/huge.png')]},
+        {'retailer_id': 'C', 'image_url': standin.url('/photo.jpg')},
+    ]
+    accepted, rejected = make_preflight().filter_products(products)
+
+    assert [p['retailer_id'] for p in accepted] == ['A', 'C']
+    assert [r['retailer_id'] for r in rejected] == ['B']
+    assert sorted(standin.paths()) == ['/huge.png', '/photo.jpg']
@@ -0,0 +1,68 @@
+"""
+Test di ProductIndex.rebuild con un manager finto che simula la proiezione fields della Graph API.
+"""
+
+import pytest
+
+from src.product_index import ProductIndex
+from src.whatsapp_catalog_manager import resolve_fields
+
+CATALOG = [
+    {'id': '1', 'retailer_id': 'SKU1', 'name': 'Scarpa running', 'description': 'Leggera', 'brand': 'Acme',
+     'category': 'scarpe', 'availability': 'in stock', 'price': '89.90 EUR', 'currency': 'EUR'},
+    {'id': '2', 'retailer_id': 'SKU2', 'name': 'Maglia tecnica', 'description': 'Traspirante', 'brand': 'Acme',
+     'category': 'abbigliamento', 'availability': 'out of stock', 'price': '29.00 EUR', 'currency': 'EUR'},
+]
+
+
+class StubManager:
+    """Restituisce solo i campi richiesti; senza fields, come la Graph API, solo id e name."""
+
+    def __init__(self, products):
+        self.products = products
+        self.requested_fields = []
+
+    def iter_products(self, fields=None):
+        resolved = resolve_fields(fields)
+        self.requested_fields.append(resolved)
+        names = resolved.split(',') if resolved else ['id', 'name']
+        for product in self.products:
+            yield {name: product[name] for name in names if name in product}
+
+
+@pytest.fixture
+def index():
+    index = ProductIndex()
+    yield index
+    index.close()
+
+
+def test_rebuild_requests_the_indexed_fields_by_default(index):
+    manager = StubManager(CATALOG)
+
+    assert index.rebuild(manager) == 2
+
+    requested = manager.requested_fields[0].split(',')
+    assert {'retailer_id', 'name', 'brand', 'category', 'availability', 'price', 'currency'} <= set(requested)
+    assert index.query(brand='Acme', availability='in stock', max_price=100) == ['SKU1']
+    assert index.query(category='abbigliamento') == ['SKU2']
+    assert index.get('SKU1')['description'] == 'Leggera'
+
+
+def test_rebuild_with_explicit_fields(index):
+    manager = StubManager(CATALOG)
+
+    index.rebuild(manager, fields=['retailer_id', 'price'])
+
+    assert manager.requested_fields == ['retailer_id,price']
+    assert index.query(order_by='price') == ['SKU2', 'SKU1']
+    assert index.query(brand='Acme') == []
+
+
+def test_rebuild_replaces_previous_content(index):
+    index.upsert([{'retailer_id': 'OLD', 'name': 'Rimosso dal catalogo'}])
+
+    index.rebuild(StubManager(CATALOG))
+
+    assert index.get('OLD') is None
+    assert index.count() == 2
@@ -0,0 +1,135 @@
+"""
+Test della politica di retry: jitter, indicazioni del server e budget.
+"""
+
+import json
+from email.utils import formatdate
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from src.exceptions import MetaAPIException
+from src.retry import RetryBudget, RetryPolicy, possibly_processed, server_retry_delay
+
+
+def response(status=200, **headers):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update({name.replace('_', '-'): value for name, value in headers.items()})
+    return result
+
+
+def usage(*minutes):
+    """Header X-Business-Use-Case-Usage con un'entry per ogni tempo di ripristino."""
+    return json.dumps({'123': [{'type': 'catalog_management', 'estimated_time_to_regain_access': m}
+                               for m in minutes]})
+
+
+def policy(**options):
+    options.setdefault('budget', RetryBudget(min_reserve=100, capacity=100))
+    return RetryPolicy(**{'max_retries': 3, 'base_delay': 0.5, 'max_delay': 30, **options})
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    retry = policy()
+    delay = None
+    for _ in range(200):
+        previous = delay or retry.base_delay
+        delay = retry.next_delay(delay)
+        assert retry.base_delay <= delay <= min(retry.max_delay, previous * 3)
+
+
+def test_decorrelated_jitter_is_capped_by_max_delay():
+    retry = policy(max_delay=2)
+    assert all(retry.next_delay(100) <= 2 for _ in range(50))
+
+
+def test_retry_after_seconds_takes_precedence_over_jitter():
+    assert policy().next_delay(None, response(429, Retry_After='7')) == 7
+
+
+def test_retry_after_http_date():
+    delay = server_retry_delay(response(503, Retry_After=formatdate(usegmt=True)))
+    assert 0 <= delay <= 1
+
+
+def test_server_hint_is_capped_by_max_delay():
+    assert policy(max_delay=10).next_delay(None, response(429, Retry_After='3600')) == 10
+
+
+def test_business_use_case_usage_uses_longest_wait():
+    hinted = response(429, X_Business_Use_Case_Usage=usage(0, 2, None))
+    assert server_retry_delay(hinted) == 120
+
+
+@pytest.mark.parametrize('headers', [
+    {},
+    {'Retry_After': 'presto'},
+    {'X_Business_Use_Case_Usage': 'non json'},
+    {'X_Business_Use_Case_Usage': usage(0)},
+])
+def test_no_server_hint(headers):
+    assert server_retry_delay(response(429, **headers)) is None
+
+
+def test_post_is_retried_only_when_not_processed():
+    retry = policy()
+    assert retry.should_retry(0, idempotent=False, response=response(429))
+    assert not retry.should_retry(0, idempotent=False, response=response(503))
+    assert retry.should_retry(0, idempotent=True, response=response(503))
+
+    refused = requests.ConnectionError(NewConnectionError(None, 'Connection refused'))
+    assert retry.should_retry(0, idempotent=False, exception=refused)
+    assert not retry.should_retry(0, idempotent=False, exception=requests.ReadTimeout())
+    assert retry.should_retry(0, idempotent=True, exception=requests.ReadTimeout())
+
+
+def test_max_retries():
+    retry = policy(max_retries=2)
+    assert retry.should_retry(1, idempotent=True, response=response(500))
+    assert not retry.should_retry(2, idempotent=True, response=response(500))
+
+
+def test_budget_exhaustion_stops_retries():
+    budget = RetryBudget(ratio=0.5, min_reserve=2, capacity=2)
+    retry = policy(budget=budget, max_retries=10)
+
+    assert retry.should_retry(0, idempotent=True, response=response(500))
+    assert retry.should_retry(0, idempotent=True, response=response(500))
+    assert not retry.should_retry(0, idempotent=True, response=response(500))
+
+    # Due richieste riuscite depositano un token: un solo retry in più
+    budget.record_request()
+    budget.record_request()
+    assert retry.should_retry(0, idempotent=True, response=response(500))
+    assert not retry.should_retry(0, idempotent=True, response=response(500))
+
+
+def test_budget_is_not_consumed_by_non_retryable_errors():
+    budget = RetryBudget(min_reserve=1, capacity=1)
+    retry = policy(budget=budget)
+
+    assert not retry.should_retry(0, idempotent=True, response=response(400))
+    assert budget.balance == 1
+
+
+def test_budget_capacity():
+    budget = RetryBudget(ratio=1, min_reserve=0, capacity=3)
+    for _ in range(10):
+        budget.record_request()
+    assert budget.balance == 3
+
+
+def test_possibly_processed():
+    assert possibly_processed(MetaAPIException('errore', status_code=500))
+    assert not possibly_processed(MetaAPIException('errore', status_code=400))
+
+    try:
+        raise MetaAPIException('timeout') from requests.ReadTimeout()
+    except MetaAPIException as e:
+        assert possibly_processed(e)
+    try:
+        raise MetaAPIException('rifiutata') from requests.ConnectTimeout()
+    except MetaAPIException as e:
+        assert not possibly_processed(e)
@@ -0,0 +1,120 @@
+"""
+Test dello scheduler a priorità: quote pesate tra corsie e capacità riservata.
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreakerGroup
+from src.deadline import use_deadline
+from src.exceptions import DeadlineExceeded
+from src.scheduler import BULK, INTERACTIVE, Lane, PriorityScheduler, use_lane
+
+
+def wait_until(condition, timeout=5.0):
+    give_up_at = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < give_up_at, "Condizione non raggiunta"
+        time.sleep(0.001)
+
+
+def grant_order(scheduler, lanes):
+    """
+    Accoda una richiesta per ogni corsia indicata mentre l'unico slot è occupato,
+    poi libera lo slot e restituisce le corsie nell'ordine in cui vengono servite.
+    """
+    order = []
+
+    def request(lane):
+        granted = scheduler.acquire(lane)
+        order.append(granted)
+        scheduler.release(granted)
+
+    holder = scheduler.acquire(INTERACTIVE)
+    threads = [threading.Thread(target=request, args=(lane,)) for lane in lanes]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: sum(lane['waiting'] for lane in scheduler.stats()['lanes'].values()) == len(lanes))
+    scheduler.release(holder)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_interactive_lane_gets_its_weighted_share():
+    scheduler = PriorityScheduler(max_concurrency=1, reserved_concurrency=0, requests_per_hour=0,
+                                  lanes=[Lane(INTERACTIVE, weight=4, reserved=True), Lane(BULK, weight=1)])
+
+    order = grant_order(scheduler, [BULK] * 8 + [INTERACTIVE] * 8)
+
+    # Peso 4 contro 1: quattro richieste interattive per ogni richiesta bulk finché entrambe attendono
+    # (il bulk parte per primo perché lo slot occupato è stato addebitato alla corsia interattiva)
+    assert order[:10] == ([BULK] + [INTERACTIVE] * 4) * 2
+    assert order[10:] == [BULK] * 6
+
+
+def test_single_lane_uses_all_capacity():
+    scheduler = PriorityScheduler(max_concurrency=1, reserved_concurrency=0, requests_per_hour=0)
+    assert grant_order(scheduler, [BULK] * 5) == [BULK] * 5
+
+
+def test_reserved_slots_are_kept_for_interactive_traffic():
+    scheduler = PriorityScheduler(max_concurrency=2, reserved_concurrency=1, requests_per_hour=0)
+
+    bulk = scheduler.acquire(BULK)
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(BULK, timeout=0.05)
+    # Il bulk scaduto non resta in coda e lo slot riservato resta ai messaggi
+    assert scheduler.stats()['lanes'][BULK]['waiting'] == 0
+    interactive = scheduler.acquire(INTERACTIVE, timeout=0.05)
+
+    scheduler.release(interactive)
+    scheduler.release(bulk)
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_reserved_rate_is_kept_for_interactive_traffic():
+    # Burst di 60 richieste, di cui la metà riservata
+    scheduler = PriorityScheduler(max_concurrency=100, reserved_concurrency=0, requests_per_hour=3600,
+                                  reserved_rate=0.5)
+
+    scheduler.release(scheduler.acquire(BULK, cost=30))
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(BULK, cost=5, timeout=0.05)
+    scheduler.release(scheduler.acquire(INTERACTIVE, cost=25, timeout=0.05))
+
+
+def test_lane_comes_from_context():
+    scheduler = PriorityScheduler(max_concurrency=2, reserved_concurrency=0, requests_per_hour=0)
+    with use_lane(BULK):
+        assert scheduler.acquire() == BULK
+    assert scheduler.acquire() == INTERACTIVE
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        PriorityScheduler(max_concurrency=2, reserved_concurrency=2)
+    with pytest.raises(ValueError):
+        Lane(BULK, weight=0)
+
+
+def test_deadline_in_scheduler_queue_hands_back_half_open_probe(standin, manager):
+    standin.handler = lambda method, path, headers, body: (200, {'Content-Type': 'application/json'}, b'{}')
+    manager.scheduler = PriorityScheduler(max_concurrency=1, reserved_concurrency=0, requests_per_hour=0)
+    manager.circuit_breakers = CircuitBreakerGroup(min_calls=1, window_size=1, open_seconds=0)
+    breaker = manager.circuit_breakers.get('catalog_read')
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    url = standin.url('/v18.0/CAT')
+
+    # La prova half-open viene ammessa ma la scadenza arriva in coda allo scheduler
+    holder = manager.scheduler.acquire()
+    with use_deadline(0.05), pytest.raises(DeadlineExceeded):
+        manager._make_request('GET', url, endpoint='catalog_read')
+    manager.scheduler.release(holder)
+
+    manager._make_request('GET', url, endpoint='catalog_read')
+    assert breaker.state == CLOSED
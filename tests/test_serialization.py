@@ -0,0 +1,84 @@
+"""
+Test della decodifica incrementale di JSONArrayStream con chunk spezzati in punti scomodi.
+"""
+
+import json
+
+import pytest
+
+from src.serialization import JSONArrayStream
+
+ITEMS = [
+    {'retailer_id': 'SKU1', 'name': 'Caffè "espresso"', 'description': 'Riga 1\nRiga 2 \\ fine', 'price': 1250},
+    {'retailer_id': 'SKU2', 'name': 'Tè verde 🍵', 'tags': ['€', 'è'], 'price': 3.5e2},
+    {'retailer_id': 'SKU3', 'name': None, 'available': True, 'inventory': 1234567890},
+]
+DOCUMENT = json.dumps({'summary': {'count': 3}, 'data': ITEMS, 'paging': {'cursors': {'after': 'QVFI'}}},
+                      ensure_ascii=False).encode('utf-8')
+
+
+def split_at(data, *positions):
+    bounds = [0, *positions, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def decode(chunks):
+    stream = JSONArrayStream(chunks)
+    return list(stream), stream.extra
+
+
+def test_every_split_point():
+    for position in range(1, len(DOCUMENT)):
+        items, extra = decode(split_at(DOCUMENT, position))
+        assert items == ITEMS, f"Split al byte {position}"
+        assert extra == {'summary': {'count': 3}, 'paging': {'cursors': {'after': 'QVFI'}}}
+
+
+def test_one_byte_chunks():
+    assert decode([DOCUMENT[i:i + 1] for i in range(len(DOCUMENT))])[0] == ITEMS
+
+
+# Sequenze di escape e caratteri UTF-8 da 2, 3 e 4 byte, come compaiono nel documento
+@pytest.mark.parametrize('encoded', [b'\\"', b'\\n', b'\\\\', 'è'.encode('utf-8'), '€'.encode('utf-8'),
+                                     '🍵'.encode('utf-8')])
+def test_split_inside_awkward_sequences(encoded):
+    position = DOCUMENT.index(encoded)
+    # Dentro la sequenza di escape o il carattere multi-byte, e subito dopo
+    for offset in range(1, len(encoded) + 1):
+        assert decode(split_at(DOCUMENT, position + offset))[0] == ITEMS
+
+
+def test_number_split_across_chunks():
+    document = b'{"data": [1234567890, 2.5e3]}'
+    position = document.index(b'567')
+    assert decode(split_at(document, position, position + 1))[0] == [1234567890, 2.5e3]
+
+
+def test_str_chunks_and_empty_chunks():
+    text = DOCUMENT.decode('utf-8')
+    assert decode(['', text[:10], '', text[10:], ''])[0] == ITEMS
+
+
+@pytest.mark.parametrize('document', [b'{}', b'{"data": []}', b' { "data" : [ ] , "paging" : {} } '])
+def test_empty_results(document):
+    assert decode([document])[0] == []
+
+
+def test_items_are_yielded_before_the_body_ends():
+    chunks = iter(split_at(DOCUMENT, DOCUMENT.index(b'"SKU2"')))
+    stream = iter(JSONArrayStream(chunks))
+    assert next(stream) == ITEMS[0]
+    # Il primo elemento arriva con il primo chunk: il secondo chunk non è ancora stato letto
+    assert next(chunks, None) is not None
+
+
+@pytest.mark.parametrize('document', [DOCUMENT[:-3], b'{"data": [1, 2', b'{"data": [{"a": "spezz'])
+def test_truncated_document_raises(document):
+    with pytest.raises(ValueError):
+        decode([document])
+
+
+@pytest.mark.parametrize('document', [b'[1, 2]', b'{"data": [1; 2]}'])
+def test_invalid_document_raises(document):
+    with pytest.raises(ValueError):
+        decode([document])
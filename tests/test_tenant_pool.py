@@ -0,0 +1,77 @@
+"""
+Test di TenantManagerPool: risorse condivise tra i manager dei tenant e loro chiusura.
+"""
+
+import sqlite3
+
+import pytest
+
+from src.idempotency import IdempotencyStore
+from src.tenant_pool import TenantManagerPool
+from src.transport import HTTPXTransport, RequestsTransport
+
+
+def test_idempotency_store_survives_eviction():
+    store = IdempotencyStore(ttl_seconds=600)
+    pool = TenantManagerPool(max_tenants=1, idempotency_store=store)
+
+    first = pool.get('token-a', 'CAT_A')
+    assert first.idempotency_store is store
+    store.complete('order-1', {'messages': [{'id': 'wamid.1'}]})
+
+    pool.get('token-b', 'CAT_B')
+    recreated = pool.get('token-a', 'CAT_A')
+
+    assert recreated is not first
+    assert recreated.idempotency_store is store
+    assert recreated.idempotency_store.reserve('order-1')['status'] == 'sent'
+    pool.close()
+
+
+def test_pool_owns_the_default_store(monkeypatch, tmp_path):
+    monkeypatch.setattr('src.config.Config.MESSAGE_DEDUP_TTL', 600)
+    monkeypatch.setattr('src.config.Config.MESSAGE_DEDUP_DB', str(tmp_path / 'keys.db'))
+    pool = TenantManagerPool(max_tenants=1)
+    backend = pool.idempotency_store.backend
+
+    pool.get('token-a', 'CAT_A')
+    pool.get('token-b', 'CAT_B')
+    # La rimozione di un manager non chiude lo store condiviso
+    backend.put('order-1', {'status': 'sent', 'response': None, 'expires_at': 0})
+
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        backend.put('order-2', {'status': 'sent', 'response': None, 'expires_at': 0})
+
+
+class TrackedTransport(RequestsTransport):
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+def test_managers_share_the_given_transport():
+    transport = TrackedTransport()
+    pool = TenantManagerPool(transport=transport)
+
+    managers = [pool.get('token-a', 'CAT_A'), pool.get('token-b', 'CAT_B')]
+    assert all(manager.transport is transport for manager in managers)
+    # Con più token sulla stessa connessione l'autenticazione viaggia con ogni richiesta
+    assert 'Authorization' not in transport.headers
+    assert managers[0]._request_headers != managers[1]._request_headers
+
+    pool.close()
+    assert not transport.closed
+    transport.close()
+
+
+def test_default_transport_follows_http_transport(monkeypatch):
+    monkeypatch.setattr('src.config.Config.HTTP_TRANSPORT', 'httpx')
+    pool = TenantManagerPool()
+
+    assert isinstance(pool.transport, HTTPXTransport)
+    assert pool.get('token-a', 'CAT_A').transport is pool.transport
+    pool.close()
+    assert pool.transport._loop.is_closed() or not pool.transport._thread.is_alive()
@@ -0,0 +1,42 @@
+"""
+Test del buffer write-behind di update_product contro una Graph API locale (fixture standin).
+"""
+
+import json
+
+from src.config import Config
+
+
+def items_batch(method, path, headers, body):
+    """Graph API locale: accetta ogni items_batch con un handle."""
+    return 200, {'Content-Type': 'application/json'}, json.dumps({'handles': ['H1']}).encode('utf-8')
+
+
+def flushed_requests(standin):
+    """Operazioni items_batch ricevute dalla Graph API locale."""
+    return [json.loads(body)['requests'] for method, path, _, body in standin.requests
+            if method == 'POST' and path.endswith('/items_batch')]
+
+
+def test_price_only_patch_gets_default_currency(standin, manager, monkeypatch):
+    monkeypatch.setattr(Config, 'DEFAULT_CURRENCY', 'EUR')
+    standin.handler = items_batch
+    manager.enable_write_behind(max_age_seconds=60)
+
+    assert manager.update_product('SKU1', {'price': 19.9}) == {'success': True, 'buffered': True}
+    manager.flush()
+
+    assert flushed_requests(standin) == [[{'method': 'UPDATE', 'data': {'id': 'SKU1', 'price': '19.90 EUR'}}]]
+
+
+def test_patch_keeps_explicit_currency(standin, manager):
+    standin.handler = items_batch
+    manager.enable_write_behind(max_age_seconds=60)
+
+    manager.update_product('SKU1', {'price': '5', 'currency': 'usd'})
+    manager.update_product('SKU1', {'inventory': 3})
+    manager.flush()
+
+    data = flushed_requests(standin)[0][0]['data']
+    assert data['price'] == '5.00 USD'
+    assert data['inventory'] == 3